@@ -0,0 +1,841 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the script compiler
+
+Each benchmark runs against a temporary copy of the project so the working tree is never modified.
+
+Syntax:
+	jobs [--scale=N] [--repeat=N] [--max-jobs=N] - Measure how compile.py --jobs scales with core count
+	header [--lines=N] [--files=N] [--repeat=N] [--compiler=PATH] - Time Script.parse on large synthetic headers
+	scriptlet [--functions=N] [--repeat=N] [--compiler=PATH] - Time Scriptlet.parse on lib_ini.sh and synthetic scriptlets
+	build [REPOSITORY OPTIONS] [--repeat=N] [--compiler=PATH] [--output=FILE] [--baseline=FILE] - Time each build phase
+	generate DEST [REPOSITORY OPTIONS] - Write a synthetic repository to DEST, (for manual inspection or builds)
+	imports [--repeat=N] - Measure the startup import time of compiled Python scripts with python -X importtime
+	pyz [--repeat=N] - Compare compiling the source of each Python script against loading its precompiled zipapp bytecode
+	large [--lines=N] [--repeat=N] [--compiler=PATH] - Time compiling a single very large synthetic script
+
+Repository options:
+	--scripts=N - Number of scripts to generate DEFAULT=200
+	--scriptlets=N - Number of scriptlets to generate DEFAULT=60
+	--depth=N - Include depth of the scriptlet tree DEFAULT=3
+	--header-lines=N - Number of entries per header section of each script DEFAULT=10
+	--functions=N - Number of functions per scriptlet DEFAULT=5
+	--mix=SHELL:PYTHON:POWERSHELL - Ratio of script types DEFAULT=6:3:1
+	--seed=N - Random seed, (the same options always generate the same repository) DEFAULT=1
+"""
+
+import argparse
+import ast
+import contextlib
+import importlib.util
+import io
+import json
+import marshal
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from typing import Union
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+PROJECT_FILES = ('compile.py', 'compiler', 'src', 'scriptlets', 'scripts', 'templates', '.supplemental')
+"""
+Files and directories required to run a build
+"""
+
+
+def copy_project(dest: str, scale: int = 1):
+	"""
+	Copy the files required for a build into a destination directory
+
+	:param dest:
+	:param scale: Number of copies of src/ to generate, (to simulate larger repositories)
+	:return:
+	"""
+	for name in PROJECT_FILES:
+		src = os.path.join(ROOT, name)
+		if os.path.isdir(src):
+			shutil.copytree(src, os.path.join(dest, name))
+		elif os.path.isfile(src):
+			shutil.copy(src, os.path.join(dest, name))
+
+	# Duplicate the sources into additional directories, (src/copy2/..., src/copy3/...)
+	for i in range(2, scale + 1):
+		shutil.copytree(os.path.join(ROOT, 'src'), os.path.join(dest, 'src', 'copy%d' % i))
+
+
+def glob_sources(path: str):
+	"""
+	Iterate over all compilable sources within a project
+	:param path:
+	:return:
+	"""
+	for root, dirs, files in os.walk(os.path.join(path, 'src')):
+		for file in files:
+			if file.endswith(('.sh', '.py', '.ps1')):
+				yield os.path.join(root, file)
+
+
+def time_build(cwd: str, args: list) -> float:
+	"""
+	Run a full build and return the wall time in seconds
+	:param cwd:
+	:param args:
+	:return:
+	"""
+	start = time.perf_counter()
+	subprocess.run(
+		[sys.executable, 'compile.py'] + args,
+		cwd=cwd,
+		stdout=subprocess.DEVNULL,
+		stderr=subprocess.DEVNULL,
+		check=True
+	)
+	return time.perf_counter() - start
+
+
+def benchmark_jobs(options):
+	"""
+	Measure the wall time of a clean build with an increasing number of worker processes
+	:param options:
+	:return:
+	"""
+	max_jobs = options.max_jobs if options.max_jobs > 0 else (os.cpu_count() or 1)
+	job_counts = []
+	j = 1
+	while j < max_jobs:
+		job_counts.append(j)
+		j *= 2
+	job_counts.append(max_jobs)
+
+	with tempfile.TemporaryDirectory() as tmp:
+		copy_project(tmp, options.scale)
+		sources = len(list(glob_sources(tmp)))
+		print('Compiling %d scripts, best of %d runs, %d cores available' % (sources, options.repeat, os.cpu_count() or 1))
+		print('')
+		print('| Jobs | Time (s) | Speedup |')
+		print('|------|----------|---------|')
+		baseline = None
+		for jobs in job_counts:
+			best = min([time_build(tmp, ['--force', '--jobs', str(jobs)]) for _ in range(options.repeat)])
+			if baseline is None:
+				baseline = best
+			print('| %4d | %8.3f | %6.2fx |' % (jobs, best, baseline / best))
+
+
+def load_compiler(path: str = None):
+	"""
+	Import compile.py as a module, (optionally from another path to compare against a previous revision)
+	:param path:
+	:return:
+	"""
+	path = path if path is not None else os.path.join(ROOT, 'compile.py')
+	# Import the compiler package next to that compile.py, (not one loaded for another revision)
+	for name in [x for x in sys.modules if x == 'compiler' or x.startswith('compiler.')]:
+		del sys.modules[name]
+	sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+	try:
+		spec = importlib.util.spec_from_file_location('compiler_under_test', path)
+		module = importlib.util.module_from_spec(spec)
+		spec.loader.exec_module(module)
+	finally:
+		sys.path.pop(0)
+	return module
+
+
+def generate_header(type: str, lines: int) -> str:
+	"""
+	Generate a synthetic script with every header section repeated to the requested number of lines
+	:param type: shell, python, or powershell
+	:param lines: Number of entries in each header section
+	:return:
+	"""
+	if type == 'python':
+		prefix, item, open_block, close_block = '', '\t', '#!/usr/bin/env python3\n"""\n', '"""\n'
+	elif type == 'powershell':
+		prefix, item, open_block, close_block = '', '\t', '<#\n', '#>\n'
+	else:
+		prefix, item, open_block, close_block = '# ', '#   ', '#!/bin/bash\n#\n', '#\n'
+
+	out = [open_block, prefix + 'Synthetic %s script\n' % type, prefix.rstrip() + '\n']
+	for i in range(lines):
+		out.append(prefix + 'Description line %d with some $VARIABLES and `commands`\n' % i)
+	for section, fmt in (
+		('Supports', 'Debian %d'),
+		('Syntax', 'VAR_%d=--option-%d=<str> - Some option DEFAULT=value'),
+		('TRMM Arguments', '--option-%d=value'),
+		('TRMM Environment', 'VAR_%d=value'),
+		('Changelog', '2025010%d - Some change'),
+	):
+		out.append(prefix.rstrip() + '\n')
+		out.append(prefix + section + ':\n')
+		for i in range(lines):
+			out.append(item + (fmt % ((i,) * fmt.count('%d'))) + '\n')
+	out.append(prefix.rstrip() + '\n')
+	out.append(prefix + 'Category:\n' + item + 'Benchmarks\n')
+	out.append(prefix + '@AUTHOR  Some Name <some-email@domain.tld>\n')
+	out.append(prefix + '@TRMM-TIMEOUT  120\n')
+	out.append(prefix + '@WARLOCK-TITLE  Synthetic\n')
+	out.append(close_block)
+	out.append('\n')
+	# echo is an alias of Write-Output in PowerShell, so only Python needs a different body
+	body = 'print("Body line %d")\n' if type == 'python' else 'echo "Body line %d"\n'
+	for i in range(lines):
+		out.append(body % i)
+	return ''.join(out)
+
+
+def benchmark_header(options):
+	"""
+	Time Script.parse on synthetic scripts with large headers
+	:param options:
+	:return:
+	"""
+	compiler = load_compiler(options.compiler)
+	extensions = {'shell': 'sh', 'python': 'py', 'powershell': 'ps1'}
+
+	with tempfile.TemporaryDirectory() as tmp:
+		files = []
+		for type, ext in extensions.items():
+			for i in range(options.files):
+				file = os.path.join(tmp, 'src', 'synthetic_%d.%s' % (i, ext))
+				os.makedirs(os.path.dirname(file), exist_ok=True)
+				with open(file, 'w') as f:
+					f.write(generate_header(type, options.lines))
+				files.append((file, type))
+
+		print('Parsing %d scripts with %d lines per header section, best of %d runs' % (
+			len(files), options.lines, options.repeat
+		))
+		print('')
+		print('| Type       | Time (ms) | Lines/s    |')
+		print('|------------|-----------|------------|')
+		for type in extensions:
+			targets = [x for x in files if x[1] == type]
+			total_lines = sum([sum(1 for _ in open(x[0])) for x in targets])
+			best = None
+			for _ in range(options.repeat):
+				start = time.perf_counter()
+				with contextlib.redirect_stdout(io.StringIO()):
+					for file, t in targets:
+						compiler.Script(file, t).parse()
+				elapsed = time.perf_counter() - start
+				best = elapsed if best is None else min(best, elapsed)
+			print('| %-10s | %9.2f | %10d |' % (type, best * 1000, total_lines / best))
+
+
+def generate_scriptlet(type: str, functions: int, prefix: str = 'function') -> str:
+	"""
+	Generate a synthetic scriptlet with the requested number of documented functions
+	:param type: shell, python, or powershell
+	:param functions: Number of functions to generate
+	:param prefix: Prefix of the generated function names
+	:return:
+	"""
+	out = []
+	for i in range(functions):
+		if type == 'python':
+			out.append('def %s_%d(value: str, count: int = 0) -> str:\n' % (prefix, i))
+			out.append('\t"""\n\tSynthetic function %d\n\n\t:param value:\n\t:param count:\n\t:return:\n\t"""\n' % i)
+			out.append('\treturn value * count\n\n\n')
+		elif type == 'powershell':
+			out.append('<#\n.SYNOPSIS\n\tSynthetic function %d\n#>\n' % i)
+			out.append('function %s%d {\n\tparam([string]$Value)\n\treturn $Value\n}\n\n' % (prefix.title().replace('_', ''), i))
+		else:
+			out.append('##\n# Synthetic function %d\n#\n# Arguments:\n#   $1 - Some value\n' % i)
+			out.append('%s_%d() {\n\techo "$1"\n}\n\n' % (prefix, i))
+	return ''.join(out)
+
+
+def benchmark_scriptlet(options):
+	"""
+	Time Scriptlet.parse, (function and documentation extraction), on a real and synthetic scriptlets
+	:param options:
+	:return:
+	"""
+	compiler = load_compiler(options.compiler)
+	extensions = {'shell': 'sh', 'python': 'py', 'powershell': 'ps1'}
+
+	with tempfile.TemporaryDirectory() as tmp:
+		targets = [(os.path.join(ROOT, 'scriptlets', 'io_github_lsferreira42', 'lib_ini.sh'), 'shell')]
+		for type, ext in extensions.items():
+			file = os.path.join(tmp, 'synthetic.%s' % ext)
+			with open(file, 'w') as f:
+				f.write(generate_scriptlet(type, options.functions))
+			targets.append((file, type))
+
+		print('Parsing scriptlets, best of %d runs' % options.repeat)
+		print('')
+		print('| File             | Lines  | Functions | Time (ms) |')
+		print('|------------------|--------|-----------|-----------|')
+		for file, type in targets:
+			lines = sum(1 for _ in open(file))
+			best = None
+			for _ in range(options.repeat):
+				scriptlet = compiler.Scriptlet(file, type)
+				start = time.perf_counter()
+				with contextlib.redirect_stdout(io.StringIO()):
+					scriptlet.parse()
+				elapsed = time.perf_counter() - start
+				best = elapsed if best is None else min(best, elapsed)
+			print('| %-16s | %6d | %9d | %9.2f |' % (
+				os.path.basename(file), lines, len(scriptlet.functions), best * 1000
+			))
+
+
+SCRIPT_TYPES = (('shell', 'sh'), ('python', 'py'), ('powershell', 'ps1'))
+"""
+Script types and their file extensions, (in the order used by --mix)
+"""
+
+BUILD_PHASES = ('scriptlet_docs', 'include_resolution', 'script_parse', 'write', 'readme', 'trmm', 'warlock')
+"""
+Phases of a build timed by the build benchmark, in the order they run
+"""
+
+
+def include_line(type: str, include: str) -> str:
+	"""
+	Get the source line which includes a scriptlet for a given script type
+	:param type:
+	:param include: Path of the scriptlet relative to scriptlets/
+	:return:
+	"""
+	if type == 'python':
+		return 'from scriptlets.%s import *\n' % include[:-3].replace('/', '.')
+	else:
+		return '# scriptlet:%s\n' % include
+
+
+def generate_repository(dest: str, options) -> dict:
+	"""
+	Generate a synthetic repository of scripts and scriptlets
+
+	Scriptlets are arranged in levels; each scriptlet includes two scriptlets of the next level,
+	and each script includes up to three scriptlets of the first level, (so includes nest options.depth deep).
+
+	:param dest:
+	:param options: Repository options, (scripts, scriptlets, depth, header_lines, functions, mix, seed)
+	:return: Summary of the generated repository
+	"""
+	rand = random.Random(options.seed)
+	weights = [int(x) for x in options.mix.split(':')]
+	depth = max(options.depth, 1)
+
+	def split(total: int) -> list:
+		# Distribute a total over the script types according to the mix ratio
+		counts = [total * w // sum(weights) for w in weights]
+		counts[0] += total - sum(counts)
+		return counts
+
+	shutil.copytree(os.path.join(ROOT, '.supplemental'), os.path.join(dest, '.supplemental'))
+	summary = {'scripts': 0, 'scriptlets': 0, 'lines': 0, 'bytes': 0}
+
+	def write(file: str, content: str):
+		os.makedirs(os.path.dirname(file), exist_ok=True)
+		with open(file, 'w') as f:
+			f.write(content)
+		summary['lines'] += content.count('\n')
+		summary['bytes'] += len(content.encode('utf-8'))
+
+	for (type, ext), scriptlet_count, script_count in zip(
+		SCRIPT_TYPES, split(options.scriptlets), split(options.scripts)
+	):
+		# Spread the scriptlets of this type over each level of the include tree
+		levels = [[] for _ in range(depth)]
+		for i in range(scriptlet_count):
+			levels[i * depth // max(scriptlet_count, 1)].append('synthetic/%s/level%d_%d.%s' % (
+				type, i * depth // max(scriptlet_count, 1), i, ext
+			))
+
+		for level, includes in enumerate(levels):
+			for include in includes:
+				content = ''
+				if level + 1 < depth and len(levels[level + 1]) > 0:
+					for child in rand.sample(levels[level + 1], min(2, len(levels[level + 1]))):
+						content += include_line(type, child)
+					content += '\n'
+				name = os.path.basename(include).split('.')[0]
+				content += generate_scriptlet(type, options.functions, name)
+				write(os.path.join(dest, 'scriptlets', include), content)
+				summary['scriptlets'] += 1
+
+		for i in range(script_count):
+			content = generate_header(type, options.header_lines)
+			content, body = content[:content.rindex('\n\n') + 2], content[content.rindex('\n\n') + 2:]
+			if len(levels[0]) > 0:
+				for include in rand.sample(levels[0], min(3, len(levels[0]))):
+					content += include_line(type, include)
+				content += '\n'
+			write(os.path.join(dest, 'src', 'synthetic%d' % (i % 10), 'script_%d.%s' % (i, ext)), content + body)
+			summary['scripts'] += 1
+
+	return summary
+
+
+def time_phases(compiler, path: str) -> dict:
+	"""
+	Run a clean build of a project in-process, timing each phase
+	:param compiler:
+	:param path:
+	:return: Wall time of each phase in seconds
+	"""
+	timings = {}
+	cwd = os.getcwd()
+	os.chdir(path)
+	try:
+		shutil.rmtree('dist', ignore_errors=True)
+		if hasattr(compiler, 'fetcher'):
+			compiler.fetcher.offline = True
+		if hasattr(compiler, 'ScriptletCache'):
+			compiler.scriptlet_cache = compiler.ScriptletCache()
+
+		sources = []
+		for file in sorted(glob_sources('')):
+			type = [x[0] for x in SCRIPT_TYPES if file.endswith('.' + x[1])][0]
+			sources.append((file, type))
+
+		with contextlib.redirect_stdout(io.StringIO()):
+			start = time.perf_counter()
+			scriptlets = compiler.parse_scriptlets()
+			timings['scriptlet_docs'] = time.perf_counter() - start
+
+			# Fetch and parse every scriptlet up front, (otherwise this is paid by the first script to include each)
+			start = time.perf_counter()
+			if hasattr(compiler, 'prefetch_scriptlets'):
+				compiler.scriptlet_cache.downloaded.update(compiler.prefetch_scriptlets(sources))
+			if hasattr(compiler, 'ScriptletCache'):
+				for scriptlet in scriptlets:
+					compiler.scriptlet_cache.get(scriptlet.name[11:], scriptlet.type)
+			timings['include_resolution'] = time.perf_counter() - start
+
+			start = time.perf_counter()
+			scripts = []
+			for file, type in sources:
+				script = compiler.Script(file, type)
+				script.repo = 'UNKNOWN' if type == 'shell' else None
+				script.parse()
+				scripts.append(script)
+			timings['script_parse'] = time.perf_counter() - start
+
+			start = time.perf_counter()
+			for script in scripts:
+				script.write()
+			timings['write'] = time.perf_counter() - start
+
+			start = time.perf_counter()
+			compiler.generate_readme(scripts, scriptlets)
+			timings['readme'] = time.perf_counter() - start
+
+			start = time.perf_counter()
+			compiler.generate_trmm_meta(scripts)
+			timings['trmm'] = time.perf_counter() - start
+
+			start = time.perf_counter()
+			compiler.generate_warlock_meta(scripts, 'UNKNOWN', 'UNKNOWN/TODO')
+			timings['warlock'] = time.perf_counter() - start
+	finally:
+		os.chdir(cwd)
+
+	timings['total'] = sum(timings.values())
+	return timings
+
+
+def get_revision() -> Union[str, None]:
+	"""
+	Get the current git revision of the project, (for labelling results)
+	:return:
+	"""
+	try:
+		return subprocess.run(
+			['git', 'rev-parse', '--short', 'HEAD'],
+			cwd=ROOT,
+			capture_output=True,
+			text=True,
+			check=True
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def benchmark_build(options):
+	"""
+	Time each phase of a clean build of a synthetic repository
+
+	Results are printed as a table and can be saved as JSON with --output,
+	then compared against in a later run, (ie: on another commit), with --baseline.
+
+	:param options:
+	:return:
+	"""
+	compiler = load_compiler(options.compiler)
+	runs = {}
+
+	with tempfile.TemporaryDirectory() as tmp:
+		summary = generate_repository(tmp, options)
+		for _ in range(options.repeat):
+			for phase, elapsed in time_phases(compiler, tmp).items():
+				runs.setdefault(phase, []).append(elapsed)
+
+	results = {
+		'benchmark': 'build',
+		'revision': get_revision() if options.compiler is None else None,
+		'compiler': options.compiler if options.compiler is not None else 'compile.py',
+		'python': sys.version.split()[0],
+		'repository': summary,
+		'options': {
+			'scripts': options.scripts,
+			'scriptlets': options.scriptlets,
+			'depth': options.depth,
+			'header_lines': options.header_lines,
+			'functions': options.functions,
+			'mix': options.mix,
+			'seed': options.seed,
+			'repeat': options.repeat,
+		},
+		'phases': {
+			phase: {'best': min(times), 'mean': sum(times) / len(times), 'runs': times}
+			for phase, times in runs.items()
+		},
+	}
+
+	baseline = None
+	if options.baseline:
+		with open(options.baseline, 'r') as f:
+			baseline = json.load(f)
+		if baseline.get('options') != results['options']:
+			print('WARNING - baseline was generated with different options, results may not be comparable')
+
+	print('Building %d scripts and %d scriptlets, (%d lines), best of %d runs' % (
+		summary['scripts'], summary['scriptlets'], summary['lines'], options.repeat
+	))
+	print('')
+	if baseline is None:
+		print('| Phase              | Time (ms) |')
+		print('|--------------------|-----------|')
+	else:
+		print('| Phase              | Time (ms) | Baseline (ms) | Change   |')
+		print('|--------------------|-----------|---------------|----------|')
+	for phase, data in results['phases'].items():
+		if baseline is None:
+			print('| %-18s | %9.2f |' % (phase, data['best'] * 1000))
+		elif phase in baseline['phases']:
+			previous = baseline['phases'][phase]['best']
+			print('| %-18s | %9.2f | %13.2f | %+7.1f%% |' % (
+				phase, data['best'] * 1000, previous * 1000, (data['best'] - previous) / previous * 100 if previous else 0
+			))
+		else:
+			print('| %-18s | %9.2f | %13s | %8s |' % (phase, data['best'] * 1000, '-', '-'))
+
+	if options.output:
+		with open(options.output, 'w') as f:
+			json.dump(results, f, indent=4)
+		print('')
+		print('Results saved to %s' % options.output)
+
+
+def benchmark_generate(options):
+	"""
+	Write a synthetic repository, (along with the current compiler), to a directory
+	:param options:
+	:return:
+	"""
+	if os.path.exists(options.dest) and os.listdir(options.dest):
+		print('%s is not empty' % options.dest)
+		sys.exit(1)
+	os.makedirs(options.dest, exist_ok=True)
+	summary = generate_repository(options.dest, options)
+	shutil.copy(os.path.join(ROOT, 'compile.py'), os.path.join(options.dest, 'compile.py'))
+	shutil.copytree(
+		os.path.join(ROOT, 'compiler'), os.path.join(options.dest, 'compiler'),
+		ignore=shutil.ignore_patterns('__pycache__')
+	)
+	print('Generated %d scripts and %d scriptlets, (%d lines), in %s' % (
+		summary['scripts'], summary['scriptlets'], summary['lines'], options.dest
+	))
+
+
+IMPORT_VARIANTS = (
+	('default', []),
+	('lazy', ['--lazy-imports']),
+	('lazy + shake', ['--lazy-imports', '--tree-shake']),
+)
+"""
+Compile options compared by the imports benchmark
+"""
+
+
+def get_startup_imports(file: str) -> str:
+	"""
+	Get the import statements a Python script runs at the top level as soon as it starts
+	:param file:
+	:return:
+	"""
+	with open(file, 'r') as f:
+		tree = ast.parse(f.read())
+	return '\n'.join([ast.unparse(x) for x in tree.body if isinstance(x, (ast.Import, ast.ImportFrom))])
+
+
+def time_imports(source: str) -> float:
+	"""
+	Run a block of import statements under python -X importtime and return the cumulative import time in seconds
+	:param source:
+	:return:
+	"""
+	# Only count what is imported after the marker, (the interpreter's own startup imports are the same for every script)
+	result = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', 'import sys\nsys.stderr.write("--start--\\n")\n' + source],
+		capture_output=True,
+		text=True,
+		check=True
+	)
+	total = 0
+	started = False
+	for line in result.stderr.splitlines():
+		if line == '--start--':
+			started = True
+		elif started and line.startswith('import time:'):
+			self_time, cumulative, name = line[12:].split('|')
+			# Top-level imports are not indented; their cumulative time includes everything they import
+			if not name[1:].startswith(' '):
+				total += int(cumulative)
+	return total / 1000000
+
+
+def benchmark_imports(options):
+	"""
+	Compare the startup import time of every compiled Python script with and without lazy imports
+
+	Scripts are not executed; only their top-level import statements are run,
+	(which is what each script pays on every start before doing any work).
+
+	:param options:
+	:return:
+	"""
+	results = {}
+	with tempfile.TemporaryDirectory() as tmp:
+		copy_project(tmp)
+		for variant, args in IMPORT_VARIANTS:
+			time_build(tmp, ['--force', '--offline'] + args)
+			for root, dirs, files in os.walk(os.path.join(tmp, 'dist')):
+				# Python modules are libraries, not scripts
+				if '__init__.py' in files:
+					continue
+				for file in files:
+					if file.endswith('.py'):
+						source = get_startup_imports(os.path.join(root, file))
+						best = min([time_imports(source) for _ in range(options.repeat)])
+						results.setdefault(os.path.relpath(os.path.join(root, file), tmp), {})[variant] = best
+
+	print('Startup import time of compiled Python scripts, best of %d runs' % options.repeat)
+	print('')
+	print('| Script                                                 | ' + ' | '.join(['%-14s' % x[0] for x in IMPORT_VARIANTS]) + ' |')
+	print('|--------------------------------------------------------|' + '|'.join(['-' * 16 for _ in IMPORT_VARIANTS]) + '|')
+	for file, times in sorted(results.items()):
+		print('| %-54s | ' % file + ' | '.join(['%11.2f ms' % (times[x[0]] * 1000) for x in IMPORT_VARIANTS]) + ' |')
+	totals = [sum([x[variant] for x in results.values()]) for variant, args in IMPORT_VARIANTS]
+	print('| %-54s | ' % 'total' + ' | '.join(['%11.2f ms' % (x * 1000) for x in totals]) + ' |')
+
+
+def benchmark_pyz(options):
+	"""
+	Compare the time to compile each Python script from source against loading the bytecode from its zipapp
+
+	This is the work every start of a flat .py script repeats, (Python never caches bytecode for the main script).
+
+	:param options:
+	:return:
+	"""
+	results = []
+	with tempfile.TemporaryDirectory() as tmp:
+		copy_project(tmp)
+		time_build(tmp, ['--force', '--offline', '--pyz'])
+		for root, dirs, files in os.walk(os.path.join(tmp, 'dist')):
+			for file in files:
+				if not file.endswith('.pyz'):
+					continue
+				with zipfile.ZipFile(os.path.join(root, file)) as archive:
+					source = archive.read('__main__.py')
+					pyc = archive.read('__main__.pyc')
+
+				compile_time = None
+				load_time = None
+				for _ in range(options.repeat):
+					start = time.perf_counter()
+					compile(source, file, 'exec')
+					elapsed = time.perf_counter() - start
+					compile_time = elapsed if compile_time is None else min(compile_time, elapsed)
+
+					start = time.perf_counter()
+					# Skip the 16 byte header, (magic, flags, and source hash)
+					marshal.loads(pyc[16:])
+					elapsed = time.perf_counter() - start
+					load_time = elapsed if load_time is None else min(load_time, elapsed)
+				results.append((os.path.relpath(os.path.join(root, file), tmp), len(source), compile_time, load_time))
+
+	print('Compiling source vs loading precompiled bytecode, best of %d runs' % options.repeat)
+	print('')
+	print('| Script                                                  | Source (bytes) | Compile (ms) | Load (ms) | Speedup |')
+	print('|---------------------------------------------------------|----------------|--------------|-----------|---------|')
+	for file, size, compile_time, load_time in sorted(results):
+		print('| %-55s | %14d | %12.3f | %9.3f | %6.1fx |' % (
+			file, size, compile_time * 1000, load_time * 1000, compile_time / load_time
+		))
+
+
+def generate_large_script(path: str, lines: int):
+	"""
+	Generate a very large shell script, (ie: a generated installer), within a project directory
+
+	Half of the lines are in the script itself, the rest are pulled in through a scriptlet,
+	(which itself includes another), and a script template.
+
+	:param path:
+	:param lines:
+	:return: Path of the script, relative to the project
+	"""
+	quarter = max(lines // 4, 1)
+	files = {
+		'scriptlets/large/level1.sh': '# scriptlet:large/level2.sh\n' + ''.join(
+			['echo "Scriptlet line %d"\n' % i for i in range(quarter)]
+		),
+		'scriptlets/large/level2.sh': ''.join(['echo "Nested scriptlet line %d"\n' % i for i in range(quarter // 2)]),
+		'scripts/large/template.conf': ''.join(['setting_%d = "$VALUE"\n' % i for i in range(quarter // 2)]),
+		'src/large/installer.sh': generate_header('shell', 10) + '# scriptlet:large/level1.sh\n' + ''.join(
+			['echo "Installer line %d"\n' % i for i in range(quarter * 2)]
+		) + 'cat > /etc/large.conf <<EOF\n# script:large/template.conf\nEOF\n',
+	}
+	for file, content in files.items():
+		os.makedirs(os.path.join(path, os.path.dirname(file)), exist_ok=True)
+		with open(os.path.join(path, file), 'w') as f:
+			f.write(content)
+	return 'src/large/installer.sh'
+
+
+def benchmark_large(options):
+	"""
+	Time parsing and writing a single very large script, along with the peak memory used
+	:param options:
+	:return:
+	"""
+	compiler = load_compiler(options.compiler)
+	cwd = os.getcwd()
+	with tempfile.TemporaryDirectory() as tmp:
+		file = generate_large_script(tmp, options.lines)
+		os.chdir(tmp)
+		try:
+			if hasattr(compiler, 'fetcher'):
+				compiler.fetcher.offline = True
+
+			def build():
+				if hasattr(compiler, 'ScriptletCache'):
+					compiler.scriptlet_cache = compiler.ScriptletCache()
+				script = compiler.Script(file, 'shell')
+				script.parse()
+				script.write()
+
+			best = None
+			with contextlib.redirect_stdout(io.StringIO()):
+				for _ in range(options.repeat):
+					start = time.perf_counter()
+					build()
+					elapsed = time.perf_counter() - start
+					best = elapsed if best is None else min(best, elapsed)
+
+				# Measure memory separately, (tracing slows everything down)
+				tracemalloc.start()
+				build()
+				peak = tracemalloc.get_traced_memory()[1]
+				tracemalloc.stop()
+
+			with open(os.path.join('dist', file[4:]), 'rb') as f:
+				output = f.read()
+		finally:
+			os.chdir(cwd)
+
+	print('Compiling a %d line script, best of %d runs' % (options.lines, options.repeat))
+	print('')
+	print('| Output (bytes) | Time (ms) | Peak memory (MB) |')
+	print('|----------------|-----------|------------------|')
+	print('| %14d | %9.2f | %16.2f |' % (len(output), best * 1000, peak / 1024 / 1024))
+
+
+def add_repository_arguments(parser: argparse.ArgumentParser):
+	"""
+	Add the options which control the shape of a synthetic repository
+	:param parser:
+	:return:
+	"""
+	parser.add_argument('--scripts', type=int, default=200, help='Number of scripts to generate')
+	parser.add_argument('--scriptlets', type=int, default=60, help='Number of scriptlets to generate')
+	parser.add_argument('--depth', type=int, default=3, help='Include depth of the scriptlet tree')
+	parser.add_argument('--header-lines', type=int, default=10, help='Number of entries per header section of each script')
+	parser.add_argument('--functions', type=int, default=5, help='Number of functions per scriptlet')
+	parser.add_argument('--mix', default='6:3:1', help='Ratio of shell:python:powershell scripts and scriptlets')
+	parser.add_argument('--seed', type=int, default=1, help='Random seed for generating the repository')
+
+
+def main():
+	parser = argparse.ArgumentParser(
+		prog='benchmark.py',
+		description='Benchmark the performance of compile.py')
+	subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+	jobs = subparsers.add_parser('jobs', help='Measure how parallel compilation scales with core count')
+	jobs.add_argument('--scale', type=int, default=4, help='Number of copies of src/ to compile')
+	jobs.add_argument('--repeat', type=int, default=3, help='Number of runs per job count, (best is reported)')
+	jobs.add_argument('--max-jobs', type=int, default=0, help='Maximum number of jobs, (0 for all cores)')
+	jobs.set_defaults(func=benchmark_jobs)
+
+	header = subparsers.add_parser('header', help='Time Script.parse on large synthetic headers')
+	header.add_argument('--lines', type=int, default=2000, help='Number of entries per header section')
+	header.add_argument('--files', type=int, default=5, help='Number of scripts per type')
+	header.add_argument('--repeat', type=int, default=5, help='Number of runs, (best is reported)')
+	header.add_argument('--compiler', help='Path to an alternate compile.py to benchmark, (ie: a previous revision)')
+	header.set_defaults(func=benchmark_header)
+
+	scriptlet = subparsers.add_parser('scriptlet', help='Time Scriptlet.parse on lib_ini.sh and synthetic scriptlets')
+	scriptlet.add_argument('--functions', type=int, default=1000, help='Number of functions per synthetic scriptlet')
+	scriptlet.add_argument('--repeat', type=int, default=5, help='Number of runs, (best is reported)')
+	scriptlet.add_argument('--compiler', help='Path to an alternate compile.py to benchmark, (ie: a previous revision)')
+	scriptlet.set_defaults(func=benchmark_scriptlet)
+
+	build = subparsers.add_parser('build', help='Time each phase of a clean build of a synthetic repository')
+	add_repository_arguments(build)
+	build.add_argument('--repeat', type=int, default=3, help='Number of runs, (best is reported)')
+	build.add_argument('--compiler', help='Path to an alternate compile.py to benchmark, (ie: a previous revision)')
+	build.add_argument('--output', help='Save the results as JSON to this file')
+	build.add_argument('--baseline', help='Compare against results previously saved with --output')
+	build.set_defaults(func=benchmark_build)
+
+	generate = subparsers.add_parser('generate', help='Write a synthetic repository to a directory')
+	generate.add_argument('dest', help='Destination directory, (must be empty or not exist)')
+	add_repository_arguments(generate)
+	generate.set_defaults(func=benchmark_generate)
+
+	imports = subparsers.add_parser('imports', help='Measure the startup import time of compiled Python scripts')
+	imports.add_argument('--repeat', type=int, default=5, help='Number of runs per script, (best is reported)')
+	imports.set_defaults(func=benchmark_imports)
+
+	pyz = subparsers.add_parser('pyz', help='Compare compiling Python scripts from source against loading their bytecode')
+	pyz.add_argument('--repeat', type=int, default=20, help='Number of runs per script, (best is reported)')
+	pyz.set_defaults(func=benchmark_pyz)
+
+	large = subparsers.add_parser('large', help='Time compiling a single very large synthetic script')
+	large.add_argument('--lines', type=int, default=50000, help='Total number of lines, (including scriptlets)')
+	large.add_argument('--repeat', type=int, default=5, help='Number of runs, (best is reported)')
+	large.add_argument('--compiler', help='Path to an alternate compile.py to benchmark, (ie: a previous revision)')
+	large.set_defaults(func=benchmark_large)
+
+	options = parser.parse_args()
+	options.func(options)
+
+
+if __name__ == '__main__':
+	main()
@@ -2,45 +2,434 @@
 
 import re
 import shutil
+import sqlite3
 import uuid
 from glob import glob
 import os
-import stat
+import subprocess
+import sys
+import py_compile
 import json
+import argparse
+import ast
+import contextlib
+import hashlib
+import io
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import urllib.parse
 import urllib.request
-import urllib.error as urllib_error
+import tarfile
+import zipfile
+from typing import Union
 
-def parse_scriptlet_url(include_path: str):
+from compiler import CACHE_DIR, SOURCE_TYPES, TRMM_PLATFORMS
+from compiler.fetch import ScriptletFetcher, get_etag_path, hash_file
+from compiler.fs import DiskFileSystem, FileSystem, MemoryFileSystem
+from compiler.index import MetadataIndex
+from compiler.watch import WATCH_PATHS, create_watcher
+
+
+class Profiler:
+	"""
+	Collects timings and I/O statistics of a build for --profile
+
+	Disabled by default, in which case nothing is recorded.
+	Spans are kept as Chrome trace events,
+	so a build can be inspected in chrome://tracing or Perfetto.
+	"""
+	def __init__(self):
+		self.enabled = False
+		self.start = time.perf_counter()
+		self.events = []
+		self.phases = {}
+		"""
+		Wall time in seconds of each build phase
+		"""
+		self.scripts = {}
+		"""
+		Wall time in seconds to compile each script
+		"""
+		self.includes = {}
+		"""
+		Number of times each scriptlet was included into a script
+		"""
+		self.downloads = 0
+		self.download_time = 0.0
+		"""
+		Time in seconds spent blocked on scriptlet downloads, (summed across threads)
+		"""
+		self.files_read = 0
+		self.bytes_read = 0
+		self.files_written = 0
+		self.bytes_written = 0
+		self.files_unchanged = 0
+		self._lock = threading.Lock()
+
+	def enable(self):
+		self.enabled = True
+		self.start = time.perf_counter()
+
+	@contextlib.contextmanager
+	def span(self, name: str, category: str, **args):
+		"""
+		Time a block of code as a named span
+		:param name:
+		:param category: phase, script, download, or any other label for the trace
+		:param args: Additional data to attach to the trace event
+		:return:
+		"""
+		if not self.enabled:
+			yield
+			return
+
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			elapsed = time.perf_counter() - start
+			with self._lock:
+				self.events.append({
+					'name': name,
+					'cat': category,
+					'ph': 'X',
+					'ts': start * 1000000,
+					'dur': elapsed * 1000000,
+					'pid': os.getpid(),
+					'tid': threading.get_ident(),
+					'args': args,
+				})
+				if category == 'phase':
+					self.phases[name] = self.phases.get(name, 0) + elapsed
+				elif category == 'script':
+					self.scripts[name] = elapsed
+				elif category == 'download':
+					self.downloads += 1
+					self.download_time += elapsed
+
+	def read(self, file: str):
+		"""
+		Record a source file being read
+		:param file:
+		:return:
+		"""
+		if self.enabled:
+			with self._lock:
+				self.files_read += 1
+				self.bytes_read += filesystem.size(file)
+
+	def write(self, size: int, changed: bool = True):
+		"""
+		Record an output file being written, (or skipped as unchanged)
+		:param size:
+		:param changed:
+		:return:
+		"""
+		if self.enabled:
+			with self._lock:
+				if changed:
+					self.files_written += 1
+					self.bytes_written += size
+				else:
+					self.files_unchanged += 1
+
+	def include(self, include: str):
+		"""
+		Record a scriptlet being included into a script
+		:param include:
+		:return:
+		"""
+		if self.enabled:
+			with self._lock:
+				self.includes[include] = self.includes.get(include, 0) + 1
+
+	def collect(self) -> Union[dict, None]:
+		"""
+		Take everything recorded so far, (used to hand a worker's data back to the parent process)
+		:return:
+		"""
+		if not self.enabled:
+			return None
+
+		with self._lock:
+			data = {
+				'events': self.events,
+				'scripts': self.scripts,
+				'includes': self.includes,
+				'downloads': self.downloads,
+				'download_time': self.download_time,
+				'files_read': self.files_read,
+				'bytes_read': self.bytes_read,
+				'files_written': self.files_written,
+				'bytes_written': self.bytes_written,
+				'files_unchanged': self.files_unchanged,
+			}
+			self.events = []
+			self.scripts = {}
+			self.includes = {}
+			self.downloads = 0
+			self.download_time = 0.0
+			self.files_read = self.bytes_read = 0
+			self.files_written = self.bytes_written = self.files_unchanged = 0
+		return data
+
+	def merge(self, data: Union[dict, None]):
+		"""
+		Merge data collected in another process
+		:param data:
+		:return:
+		"""
+		if data is None:
+			return
+
+		with self._lock:
+			self.events += data['events']
+			self.scripts.update(data['scripts'])
+			for include, count in data['includes'].items():
+				self.includes[include] = self.includes.get(include, 0) + count
+			for key in (
+				'downloads', 'download_time', 'files_read', 'bytes_read',
+				'files_written', 'bytes_written', 'files_unchanged'
+			):
+				setattr(self, key, getattr(self, key) + data[key])
+
+	def summary(self, top: int = 10) -> dict:
+		"""
+		Get the summary of the build as a dictionary
+		:param top: Number of slowest scripts and most included scriptlets to list
+		:return:
+		"""
+		slowest = sorted(self.scripts.items(), key=lambda x: x[1], reverse=True)[:top]
+		included = sorted(self.includes.items(), key=lambda x: (-x[1], x[0]))
+		return {
+			'total': time.perf_counter() - self.start,
+			'phases': self.phases,
+			'downloads': self.downloads,
+			'download_time': self.download_time,
+			'files_read': self.files_read,
+			'bytes_read': self.bytes_read,
+			'files_written': self.files_written,
+			'bytes_written': self.bytes_written,
+			'files_unchanged': self.files_unchanged,
+			'scripts_compiled': len(self.scripts),
+			'slowest_scripts': [{'file': x[0], 'time': x[1]} for x in slowest],
+			'includes': dict(included),
+		}
+
+	def print_summary(self, top: int = 10):
+		"""
+		Print the summary of the build as tables
+		:param top: Number of slowest scripts and most included scriptlets to list
+		:return:
+		"""
+		summary = self.summary(top)
+		print('')
+		print('| Phase                    | Time (ms) |')
+		print('|--------------------------|-----------|')
+		for name, elapsed in summary['phases'].items():
+			print('| %-24s | %9.2f |' % (name, elapsed * 1000))
+		print('| %-24s | %9.2f |' % ('total', summary['total'] * 1000))
+		print('')
+		print('Downloads: %d in %.2f ms, (blocked time summed across threads)' % (
+			summary['downloads'], summary['download_time'] * 1000
+		))
+		print('Read: %d bytes from %d files' % (summary['bytes_read'], summary['files_read']))
+		print('Written: %d bytes to %d files, %d files unchanged' % (
+			summary['bytes_written'], summary['files_written'], summary['files_unchanged']
+		))
+
+		if len(summary['slowest_scripts']) > 0:
+			print('')
+			print(
+				'| Slowest scripts (%3d compiled)                       | Time (ms) |'
+				% summary['scripts_compiled']
+			)
+			print('|------------------------------------------------------|-----------|')
+			for script in summary['slowest_scripts']:
+				print('| %-52s | %9.2f |' % (script['file'], script['time'] * 1000))
+
+		if len(summary['includes']) > 0:
+			print('')
+			print('| Most included scriptlets                             | Includes  |')
+			print('|------------------------------------------------------|-----------|')
+			for include, count in list(summary['includes'].items())[:top]:
+				print('| %-52s | %9d |' % (include, count))
+
+	def save(self, filename: str, top: int = 10):
+		"""
+		Save all recorded spans as a Chrome trace-event file,
+		(with the summary attached as metadata)
+		:param filename:
+		:param top:
+		:return:
+		"""
+		events = sorted(self.events, key=lambda x: x['ts'])
+		offset = events[0]['ts'] if len(events) > 0 else 0
+		trace = []
+		for pid in sorted(set([x['pid'] for x in events])):
+			trace.append({
+				'name': 'process_name',
+				'ph': 'M',
+				'pid': pid,
+				'args': {'name': 'compile.py' if pid == os.getpid() else 'worker %d' % pid},
+			})
+		for event in events:
+			event = dict(event)
+			event['ts'] = round(event['ts'] - offset, 3)
+			event['dur'] = round(event['dur'], 3)
+			trace.append(event)
+
+		with open(filename, 'w') as f:
+			data = {'traceEvents': trace, 'displayTimeUnit': 'ms', 'otherData': self.summary(top)}
+			json.dump(data, f, indent=1)
+
+
+profiler = Profiler()
+
+
+class BuildOptions:
+	"""
+	Options which change the compiled output of scripts
+
+	Recorded in the build cache, so changing any of them recompiles every script.
+	"""
+	def __init__(self):
+		self.tree_shake = False
+		"""
+		Drop functions and classes of included Python scriptlets which are never used by the script
+		"""
+		self.lazy_imports = False
+		"""
+		Move imports of heavy standard library modules into the functions which use them
+		"""
+		self.pyz = False
+		"""
+		Also write each Python script as a zipapp with precompiled bytecode
+		"""
+		self.pyz_optimize = 2
+		"""
+		Optimization level of the bytecode within zipapps, (as per python -O)
+		"""
+
+	def asdict(self) -> dict:
+		return dict(vars(self))
+
+	def update(self, data: dict):
+		for key, value in data.items():
+			setattr(self, key, value)
+
+
+build_options = BuildOptions()
+
+
+filesystem = DiskFileSystem()
+
+build_lock = threading.RLock()
+"""
+Held by compile_tree() while it swaps the global filesystem and build options,
+so concurrent builds from other threads wait their turn,
+(nested builds on the same thread are allowed)
+"""
+
+
+def write_if_changed(dest_file: str, content: Union[str, bytes], mode: int = 0o664) -> bool:
+	"""
+	Write a file only if its content differs from what is already there
+
+	:param dest_file:
+	:param content:
+	:param mode: Permissions of the written file
+	:return: True if the file was written, False if it was already up to date
+	"""
+	if isinstance(content, str):
+		content = content.encode('utf-8')
+
+	changed = filesystem.write(dest_file, content, mode)
+	profiler.write(len(content), changed)
+	return changed
+
+
+def build_pyz(source: str, name: str, optimize: int = 2) -> bytes:
 	"""
-	Open compile.sources (if it's available) and parse scriptlet URLs to download them locally
-	:param include_path:
+	Build an executable zipapp of a Python script, containing its source and precompiled bytecode
+
+	The bytecode is only used by the same version of Python it was compiled with;
+	any other version falls back to the source within the archive.
+	Builds are reproducible: the bytecode is validated by hash instead of timestamp,
+	and every archive entry has fixed metadata, (dated SOURCE_DATE_EPOCH if set).
+
+	:param source:
+	:param name: Filename of the zipapp, (used in tracebacks)
+	:param optimize: Optimization level of the bytecode, (as per python -O)
 	:return:
 	"""
-	lookup = include_path.split('/')[0]
-	source = 'github:eVAL-Agency/ScriptsCollection:main'
-	# Default source
+	source = source.encode('utf-8')
+	pyc = None
+	with tempfile.TemporaryDirectory() as tmp:
+		source_file = os.path.join(tmp, '__main__.py')
+		with open(source_file, 'wb') as f:
+			f.write(source)
+		try:
+			py_compile.compile(
+				source_file,
+				cfile=os.path.join(tmp, '__main__.pyc'),
+				dfile=name + '/__main__.py',
+				doraise=True,
+				optimize=optimize,
+				invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH
+			)
+			with open(os.path.join(tmp, '__main__.pyc'), 'rb') as f:
+				pyc = f.read()
+		except py_compile.PyCompileError as e:
+			print(
+				'WARNING - could not precompile %s, only including the source: %s' % (name, e.msg)
+			)
 
-	if os.path.exists('compile.sources'):
-		with open('compile.sources', 'r') as f:
-			for line in f:
-				line = line.strip()
-				if line.startswith('%s=' % lookup):
-					source = line[len(lookup)+1:].strip()
-					break
+	date_time = (1980, 1, 1, 0, 0, 0)
+	if os.environ.get('SOURCE_DATE_EPOCH', '').isdigit():
+		date_time = max(date_time, time.gmtime(int(os.environ['SOURCE_DATE_EPOCH']))[0:6])
 
-	source_data = source.split(':')
+	f = io.BytesIO()
+	f.write(b'#!/usr/bin/env python3\n')
+	with zipfile.ZipFile(f, 'w') as archive:
+		for filename, data in (('__main__.py', source), ('__main__.pyc', pyc)):
+			if data is None:
+				continue
+			info = zipfile.ZipInfo(filename, date_time)
+			info.compress_type = zipfile.ZIP_DEFLATED
+			info.external_attr = 0o644 << 16
+			info.create_system = 3
+			archive.writestr(info, data)
+	return f.getvalue()
 
-	if source_data[0] == 'github':
-		repo = source_data[1]
-		branch = 'main' if len(source_data) == 2 else source_data[2]
-		url = 'https://raw.githubusercontent.com/%s/refs/heads/%s/scriptlets/%s' % (repo, branch, include_path)
-		return url
-	else:
-		print('Unknown source type: %s' % source_data[0])
-		return None
+
+def prune_dist(outputs: list):
+	"""
+	Remove any file in dist/ which is not a current output of the build,
+	(along with any emptied directories)
+	:param outputs:
+	:return:
+	"""
+	outputs = set([os.path.normpath(x) for x in outputs])
+	for root, dirs, files in os.walk('dist', topdown=False):
+		# Leave packaging metadata and bytecode caches alone
+		if '.egg-info' in root or '__pycache__' in root:
+			continue
+		for file in files:
+			path = os.path.normpath(os.path.join(root, file))
+			if path not in outputs:
+				print('Removing %s' % path)
+				os.remove(path)
+		if root != 'dist' and len(os.listdir(root)) == 0:
+			os.rmdir(root)
+
+
+fetcher = ScriptletFetcher()
 
 
-def maybe_download_scriptlet(filename, url):
+def maybe_download_scriptlet(filename, url, conditional: bool = True):
 	"""
 	Check if a scriptlet is already downloaded AND has not been modified.
 
@@ -49,133 +438,1951 @@ def maybe_download_scriptlet(filename, url):
 	Returns True if successful or no download required.
 	Returns False if unsuccessful.
 
-	:param filename:
-	:param url:
-	:return:
-	"""
+	:param filename:
+	:param url:
+	:param conditional: Set to False to always download the file, (ignoring the stored ETag)
+	:return:
+	"""
+	with profiler.span(filename, 'download', url=url):
+		return fetcher.fetch(filename, url, conditional)
+
+
+class ScriptletSource:
+	"""
+	Location scriptlets are retrieved from, as defined in compile.sources
+	"""
+	remote = False
+	"""
+	Set if scriptlets are retrieved over the network, (and thus pinned in scriptlets.lock)
+	"""
+
+	def __init__(self, spec: str):
+		self.spec = spec
+
+	def fetch(self, include: str, filename: str) -> bool:
+		"""
+		Ensure the local copy of a scriptlet is up to date with this source
+
+		Returns True if successful or no download required.
+		Returns False if unsuccessful.
+
+		:param include: Path of the scriptlet relative to the scriptlets directory
+		:param filename: Local destination of the scriptlet
+		:return:
+		"""
+		raise NotImplementedError()
+
+	def describe(self, include: str) -> str:
+		"""
+		Get a human-readable description of where a scriptlet would be retrieved from,
+		(without retrieving it)
+		:param include:
+		:return:
+		"""
+		raise NotImplementedError()
+
+	def lock(self, include: str, filename: str) -> Union[dict, None]:
+		"""
+		Retrieve the current revision of a scriptlet,
+		(bypassing any cached ETag), to pin in scriptlets.lock
+		:param include: Path of the scriptlet relative to the scriptlets directory
+		:param filename: Local destination of the scriptlet
+		:return: Source, revision, and URL of the exact revision,
+			(if it can be downloaded directly), or None on failure
+		"""
+		if not self.fetch(include, filename):
+			return None
+		return {'source': self.spec, 'revision': None, 'url': None}
+
+
+class UrlSource(ScriptletSource):
+	"""
+	Web server hosting individual scriptlet files, (one request per scriptlet)
+
+	Format: https://example.tld/path/scriptlets
+	"""
+	remote = True
+
+	def get_url(self, include: str) -> str:
+		return '%s/%s' % (self.spec.rstrip('/'), include)
+
+	def get_pinned_url(self, include: str) -> tuple:
+		"""
+		Get the URL serving the current revision of a scriptlet and never changing afterwards,
+		(if possible)
+		:param include:
+		:return: (revision, url), revision is None if the URL is not pinned to one
+		"""
+		return None, self.get_url(include)
+
+	def fetch(self, include: str, filename: str) -> bool:
+		return maybe_download_scriptlet(filename, self.get_url(include))
+
+	def describe(self, include: str) -> str:
+		return self.get_url(include)
+
+	def lock(self, include: str, filename: str) -> Union[dict, None]:
+		revision, url = self.get_pinned_url(include)
+		if not maybe_download_scriptlet(filename, url, False):
+			return None
+		if revision is None:
+			# Plain web servers have no revisions; the ETag at least identifies what was locked
+			etag_path = get_etag_path(filename)
+			if os.path.exists(etag_path):
+				with open(etag_path, 'r') as f:
+					revision = f.read().strip() or None
+		return {'source': self.spec, 'revision': revision, 'url': url}
+
+
+class GithubSource(UrlSource):
+	"""
+	Scriptlets directory of a GitHub repository, (one request per scriptlet)
+
+	Format: github:repo_owner/repo_name[:branch]
+	"""
+	def __init__(self, spec: str):
+		super().__init__(spec)
+		source_data = spec.split(':')
+		self.repo = source_data[1]
+		self.branch = 'main' if len(source_data) == 2 else source_data[2]
+		self._commit = None
+		self._lock = threading.Lock()
+
+	def get_url(self, include: str) -> str:
+		return 'https://raw.githubusercontent.com/%s/refs/heads/%s/scriptlets/%s' % (
+			self.repo, self.branch, include
+		)
+
+	def get_commit(self) -> Union[str, None]:
+		"""
+		Resolve the branch to its current commit, (once per build)
+		:return:
+		"""
+		with self._lock:
+			if self._commit is None:
+				self._commit = ''
+				url = 'https://api.github.com/repos/%s/commits/%s' % (self.repo, self.branch)
+				headers = {'Accept': 'application/vnd.github.sha', 'User-Agent': 'compile.py'}
+				try:
+					status, etag, body = fetcher.request(url, headers)
+					if status == 200 and re.match(r'^[0-9a-f]{40}$', body.decode('utf-8').strip()):
+						self._commit = body.decode('utf-8').strip()
+					else:
+						print('Could not resolve %s to a commit, (HTTP %d)' % (self.spec, status))
+				except Exception as e:
+					print('Could not resolve %s to a commit: %s' % (self.spec, e))
+		return self._commit or None
+
+	def get_pinned_url(self, include: str) -> tuple:
+		commit = self.get_commit()
+		if commit is None:
+			return super().get_pinned_url(include)
+		url = 'https://raw.githubusercontent.com/%s/%s/scriptlets/%s' % (self.repo, commit, include)
+		return commit, url
+
+
+class DirectorySource(ScriptletSource):
+	"""
+	Local directory containing a scriptlets tree, (or a project with a scriptlets/ directory)
+
+	Scriptlets are copied from the directory whenever they differ from the local copy.
+
+	Format: file:///path/to/directory or /path/to/directory
+	"""
+	def __init__(self, spec: str, path: str = None):
+		super().__init__(spec)
+		self.path = path if path is not None else source_path(spec)
+
+	def get_root(self) -> Union[str, None]:
+		"""
+		Get the directory containing the scriptlets within this source
+		:return:
+		"""
+		if os.path.isdir(os.path.join(self.path, 'scriptlets')):
+			return os.path.join(self.path, 'scriptlets')
+		return self.path
+
+	def describe(self, include: str) -> str:
+		return os.path.join(self.get_root(), include)
+
+	def fetch(self, include: str, filename: str) -> bool:
+		root = self.get_root()
+		src = os.path.join(root, include) if root is not None else None
+		if src is None or not os.path.isfile(src):
+			print('Could not locate %s in %s' % (include, self.spec))
+			return False
+
+		if hash_file(src) != hash_file(filename):
+			os.makedirs(os.path.dirname(filename), exist_ok=True)
+			shutil.copyfile(src, filename)
+			# Any ETag from a previous remote source no longer applies to this content
+			etag_path = get_etag_path(filename)
+			if os.path.exists(etag_path):
+				os.remove(etag_path)
+			print('Copied %s from %s' % (filename, self.spec))
+		return True
+
+
+class ArchiveSource(DirectorySource):
+	"""
+	Tarball or zip archive containing a scriptlets tree, downloaded and extracted once per build
+
+	Archives are cached and extracted within the build cache directory;
+	every include from this source is then resolved from the extracted tree.
+
+	Format: https://example.tld/scriptlets.tar.gz or file:///path/to/bundle.zip
+	"""
+	def __init__(self, spec: str):
+		key = hashlib.sha256(spec.encode('utf-8')).hexdigest()[:16]
+		super().__init__(spec, os.path.join(CACHE_DIR, 'sources', key))
+		self.archive = self.path + ARCHIVE_EXTENSIONS[self._get_extension()]
+		self.remote = re.match(r'^https?://', spec) is not None
+		self._lock = threading.Lock()
+		self._ready = None
+
+	def describe(self, include: str) -> str:
+		return '%s from %s, (extracted to %s)' % (include, self.archive, self.path)
+
+	def lock(self, include: str, filename: str) -> Union[dict, None]:
+		if not self.fetch(include, filename):
+			return None
+		# The archive as a whole is the revision; its scriptlets cannot be downloaded individually
+		return {'source': self.spec, 'revision': 'sha256:%s' % hash_file(self.archive), 'url': None}
+
+	def _get_extension(self) -> str:
+		for ext in ARCHIVE_EXTENSIONS:
+			if urllib.parse.urlsplit(self.spec).path.lower().endswith(ext):
+				return ext
+		return '.zip'
+
+	def get_root(self) -> Union[str, None]:
+		with self._lock:
+			if self._ready is None:
+				self._ready = self._prepare()
+		if not self._ready:
+			return None
+
+		if os.path.isdir(os.path.join(self.path, 'scriptlets')):
+			return os.path.join(self.path, 'scriptlets')
+
+		# Repository archives generally contain a single top-level directory,
+		# (ie: GitHub's "repo-branch/")
+		entries = os.listdir(self.path)
+		if len(entries) == 1 and os.path.isdir(os.path.join(self.path, entries[0], 'scriptlets')):
+			return os.path.join(self.path, entries[0], 'scriptlets')
+
+		# Otherwise the archive itself is a scriptlets tree
+		return self.path
+
+	def _prepare(self) -> bool:
+		"""
+		Retrieve the archive and extract it if it has changed since the last extraction
+		:return:
+		"""
+		if self.spec.startswith('file://') or not re.match(r'^https?://', self.spec):
+			src = source_path(self.spec)
+			if not os.path.isfile(src):
+				print('Could not locate archive %s' % self.spec)
+				return False
+			os.makedirs(os.path.dirname(self.archive), exist_ok=True)
+			if hash_file(src) != hash_file(self.archive):
+				shutil.copyfile(src, self.archive)
+		elif not maybe_download_scriptlet(self.archive, self.spec):
+			return False
+
+		marker = self.path + '.sha256'
+		archive_hash = hash_file(self.archive)
+		if os.path.isdir(self.path) and os.path.exists(marker):
+			with open(marker, 'r') as f:
+				if f.read().strip() == archive_hash:
+					return True
+
+		if os.path.exists(self.path):
+			shutil.rmtree(self.path)
+		os.makedirs(self.path)
+		try:
+			if self.archive.endswith('.zip'):
+				with zipfile.ZipFile(self.archive) as z:
+					z.extractall(self.path)
+			else:
+				with tarfile.open(self.archive) as t:
+					if hasattr(tarfile, 'data_filter'):
+						t.extractall(self.path, filter='data')
+					else:
+						t.extractall(self.path)
+		except (tarfile.TarError, zipfile.BadZipFile, OSError) as e:
+			print('Could not extract %s: %s' % (self.spec, e))
+			return False
+
+		with open(marker, 'w') as f:
+			f.write(archive_hash)
+		print('Extracted %s' % self.spec)
+		return True
+
+
+ARCHIVE_EXTENSIONS = {
+	'.tar.gz': '.tar.gz',
+	'.tgz': '.tar.gz',
+	'.tar.bz2': '.tar.bz2',
+	'.tar.xz': '.tar.xz',
+	'.tar': '.tar',
+	'.zip': '.zip',
+}
+"""
+Recognized archive extensions and the extension used for the cached copy
+"""
+
+DEFAULT_SOURCE = 'github:eVAL-Agency/ScriptsCollection:main'
+
+def source_path(spec: str) -> str:
+	"""
+	Get the local filesystem path of a file:// or bare path source
+	:param spec:
+	:return:
+	"""
+	if spec.startswith('file://'):
+		return urllib.request.url2pathname(urllib.parse.urlsplit(spec).path)
+	return os.path.expanduser(spec)
+
+
+def create_scriptlet_source(spec: str) -> Union[ScriptletSource, None]:
+	"""
+	Create the source handler for a source definition from compile.sources
+	:param spec:
+	:return:
+	"""
+	path = urllib.parse.urlsplit(spec).path.lower()
+	is_archive = any([path.endswith(x) for x in ARCHIVE_EXTENSIONS])
+
+	if re.match(r'^https?://', spec):
+		return ArchiveSource(spec) if is_archive else UrlSource(spec)
+	elif spec.startswith('github:'):
+		return GithubSource(spec)
+	elif spec.startswith(('file://', '/', '.', '~')):
+		if os.path.isdir(source_path(spec)):
+			return DirectorySource(spec)
+		return ArchiveSource(spec) if is_archive else DirectorySource(spec)
+	else:
+		print('Unknown source type: %s' % spec.split(':')[0])
+		return None
+
+
+class ScriptletResolver:
+	"""
+	Map of scriptlet path prefixes to the sources they are retrieved from
+
+	compile.sources is loaded once and reused for every include in the build.
+	Each line maps a path prefix to a source; the longest matching prefix wins,
+	and repeating a prefix defines fallback mirrors which are tried in order.
+
+	Example:
+	```
+	steam=github:repo_owner/repo_name
+	steam/steamcmd_parse_manifest.py=/path/to/other/project
+	_common=https://mirror1.tld/scriptlets
+	_common=https://mirror2.tld/scriptlets
+	```
+	"""
+	def __init__(self, path: str = 'compile.sources'):
+		self.path = path
+		self.prefixes = None
+		self._sources = {}
+		self._lock = threading.Lock()
+
+	def load(self):
+		"""
+		Load the prefix map from compile.sources, (if it's available)
+		:return:
+		"""
+		self.prefixes = {}
+		if not os.path.exists(self.path):
+			return
+
+		with open(self.path, 'r') as f:
+			for line in f:
+				line = line.strip()
+				if line == '' or line.startswith('#') or '=' not in line:
+					continue
+				prefix, spec = line.split('=', 1)
+				prefix = prefix.strip().strip('/')
+				if prefix not in self.prefixes:
+					self.prefixes[prefix] = []
+				self.prefixes[prefix].append(spec.strip())
+
+	def match(self, include: str) -> tuple:
+		"""
+		Get the longest prefix matching an include and its list of source specs
+		:param include:
+		:return: (prefix, [spec, ...]), prefix is None when the default source is used
+		"""
+		with self._lock:
+			if self.prefixes is None:
+				self.load()
+
+		best = None
+		for prefix in self.prefixes:
+			if include == prefix or include.startswith(prefix + '/'):
+				if best is None or len(prefix) > len(best):
+					best = prefix
+
+		if best is None:
+			return None, [DEFAULT_SOURCE]
+		return best, self.prefixes[best]
+
+	def get_sources(self, include: str) -> list:
+		"""
+		Get the sources an include can be retrieved from, in order of preference
+		:param include:
+		:return:
+		"""
+		sources = []
+		for spec in self.match(include)[1]:
+			with self._lock:
+				# Sources are shared for the entire build, (so archives are only retrieved once)
+				if spec not in self._sources:
+					self._sources[spec] = create_scriptlet_source(spec)
+			if self._sources[spec] is not None:
+				sources.append(self._sources[spec])
+		return sources
+
+	def fetch(self, include: str) -> bool:
+		"""
+		Retrieve a scriptlet from the first available source
+		if the local copy is missing or outdated
+		:param include:
+		:return:
+		"""
+		filename = os.path.join('scriptlets', include)
+		if scriptlet_lock.get(include) is not None:
+			return scriptlet_lock.fetch(include, filename)
+
+		sources = self.get_sources(include)
+		if scriptlet_lock.exists() and any([x.remote for x in sources]):
+			print('WARNING - %s is not pinned in %s, (run compile.py --update-lock)' % (
+				include, scriptlet_lock.path
+			))
+		for source in sources:
+			if source.fetch(include, filename):
+				return True
+		return False
+
+	def describe(self, include: str) -> list:
+		"""
+		Describe which sources and local paths would serve an include
+		:param include:
+		:return:
+		"""
+		prefix, specs = self.match(include)
+		filename = os.path.join('scriptlets', include)
+		etag_path = get_etag_path(filename)
+		lines = [
+			'Include:  %s' % include,
+			'Prefix:   %s' % (prefix if prefix is not None else '(default)'),
+			'Local:    %s%s' % (filename, '' if os.path.exists(filename) else ', (not downloaded)'),
+		]
+		if os.path.exists(etag_path):
+			lines.append('ETag:     %s' % etag_path)
+		entry = scriptlet_lock.get(include)
+		if entry is not None:
+			lines.append('Locked:   %s @ %s' % (entry['source'], entry['revision']))
+			lines.append('  SHA256: %s' % entry['sha256'])
+		for i, source in enumerate(self.get_sources(include)):
+			lines.append('Source %d: %s' % (i + 1, source.spec))
+			lines.append('  Serves: %s' % source.describe(include))
+		return lines
+
+
+resolver = ScriptletResolver()
+
+
+class ScriptletLock:
+	"""
+	Pinned source, revision, and sha256 of every remote scriptlet, as recorded in scriptlets.lock
+
+	Once a scriptlet is pinned, every build serves it from a local content-addressed cache,
+	(.compile-cache/objects/), without any network requests.
+	Cached objects, downloads, and the local copy in scriptlets/ are all verified
+	against the pinned hash; a mismatching cache entry is discarded
+	and retrieved again from the pinned revision.
+	"""
+	def __init__(
+		self, path: str = 'scriptlets.lock', objects: str = os.path.join(CACHE_DIR, 'objects')
+	):
+		self.path = path
+		self.objects = objects
+		self.entries = None
+		self._lock = threading.Lock()
+
+	def load(self):
+		"""
+		Load the pinned scriptlets from scriptlets.lock, (if it's available)
+		:return:
+		"""
+		self.entries = {}
+		if not os.path.exists(self.path):
+			return
+
+		with open(self.path, 'r') as f:
+			data = json.load(f)
+		self.entries = data.get('scriptlets', {})
+
+	def save(self):
+		"""
+		Write all pinned scriptlets to scriptlets.lock
+		:return:
+		"""
+		data = {'version': 1, 'scriptlets': dict(sorted(self.entries.items()))}
+		write_if_changed(self.path, json.dumps(data, indent=4) + '\n')
+
+	def exists(self) -> bool:
+		"""
+		Check if scriptlets are pinned for this project
+		:return:
+		"""
+		return os.path.exists(self.path)
+
+	def get(self, include: str) -> Union[dict, None]:
+		"""
+		Get the pinned entry of a scriptlet, or None if it is not pinned
+		:param include:
+		:return:
+		"""
+		with self._lock:
+			if self.entries is None:
+				self.load()
+		return self.entries.get(include)
+
+	def get_object(self, sha256: str) -> str:
+		"""
+		Get the path of the cached content with a given sha256
+		:param sha256:
+		:return:
+		"""
+		return os.path.join(self.objects, sha256[0:2], sha256)
+
+	def store(self, content: bytes) -> str:
+		"""
+		Add content to the content-addressed cache
+		:param content:
+		:return: sha256 of the content
+		"""
+		sha256 = hashlib.sha256(content).hexdigest()
+		filename = self.get_object(sha256)
+		if hash_file(filename) != sha256:
+			os.makedirs(os.path.dirname(filename), exist_ok=True)
+			fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+			with os.fdopen(fd, 'wb') as f:
+				f.write(content)
+			os.replace(tmp_file, filename)
+		return sha256
+
+	def read_object(self, sha256: str) -> Union[bytes, None]:
+		"""
+		Read cached content, discarding it if it no longer matches its hash
+		:param sha256:
+		:return: The content, or None if it is not cached, (or was corrupted)
+		"""
+		filename = self.get_object(sha256)
+		if not os.path.exists(filename):
+			return None
+
+		with open(filename, 'rb') as f:
+			content = f.read()
+		if hashlib.sha256(content).hexdigest() != sha256:
+			print(
+				'ERROR - cached scriptlet %s is corrupted or was tampered with, discarding it'
+				% filename
+			)
+			os.remove(filename)
+			return None
+		return content
+
+	def _download(self, include: str, entry: dict, filename: str) -> Union[bytes, None]:
+		"""
+		Retrieve the pinned revision of a scriptlet from its source
+		:param include:
+		:param entry:
+		:param filename:
+		:return:
+		"""
+		if fetcher.offline:
+			print('Could not retrieve %s, (offline and not in %s)' % (filename, self.objects))
+			return None
+
+		if entry['url'] is not None:
+			with profiler.span(filename, 'download', url=entry['url']):
+				try:
+					status, etag, body = fetcher.request(entry['url'], {})
+				except Exception:
+					print('Could not download %s' % filename)
+					return None
+			if status != 200:
+				print('Could not download %s, (HTTP %d)' % (filename, status))
+				return None
+			return body
+
+		# Sources without individually addressable revisions, (ie: archives), are retrieved as usual
+		source = create_scriptlet_source(entry['source'])
+		if source is None or not source.fetch(include, filename):
+			return None
+		with open(filename, 'rb') as f:
+			return f.read()
+
+	def fetch(self, include: str, filename: str) -> bool:
+		"""
+		Ensure the local copy of a pinned scriptlet matches scriptlets.lock
+
+		Served from the content-addressed cache when possible,
+		otherwise the pinned revision is retrieved.
+
+		:param include:
+		:param filename:
+		:return:
+		"""
+		entry = self.get(include)
+		content = self.read_object(entry['sha256'])
+		if content is None:
+			content = self._download(include, entry, filename)
+			if content is None:
+				return False
+			sha256 = hashlib.sha256(content).hexdigest()
+			if sha256 != entry['sha256']:
+				print('ERROR - %s does not match %s, (expected sha256 %s, got %s)' % (
+					filename, self.path, entry['sha256'], sha256
+				))
+				print('  run compile.py --update-lock if the source was intentionally changed')
+				return False
+			self.store(content)
+
+		if hash_file(filename) != entry['sha256']:
+			if os.path.exists(filename):
+				print('WARNING - %s differs from %s, restoring the pinned revision' % (
+					filename, self.path
+				))
+			os.makedirs(os.path.dirname(filename), exist_ok=True)
+			with open(filename, 'wb') as f:
+				f.write(content)
+		return True
+
+	def _lock_include(self, include: str) -> tuple:
+		"""
+		Retrieve the current revision of a scriptlet from the first available source and pin it
+		:param include:
+		:return: (retrieved, entry), entry is None for scriptlets from local sources
+		"""
+		filename = os.path.join('scriptlets', include)
+		for source in resolver.get_sources(include):
+			if not source.remote:
+				if source.fetch(include, filename):
+					return True, None
+				continue
+
+			entry = source.lock(include, filename)
+			if entry is not None:
+				with open(filename, 'rb') as f:
+					entry['sha256'] = self.store(f.read())
+				return True, entry
+		return False, None
+
+	def update(self, sources: list):
+		"""
+		Retrieve the current revision of every remote scriptlet
+		included by a list of (file, type) sources, and pin them all in scriptlets.lock
+
+		Scriptlets are retrieved concurrently, one batch per level of include depth.
+
+		:param sources:
+		:return:
+		"""
+		self.load()
+		previous = self.entries
+		entries = {}
+		failed = []
+		checked = set()
+		pending = []
+		for file, type in sources:
+			for include in find_scriptlet_includes(file, type):
+				pending.append((include, type))
+
+		with ThreadPoolExecutor(max_workers=fetcher.workers) as executor:
+			while len(pending) > 0:
+				batch = []
+				for include, type in pending:
+					if include not in checked:
+						checked.add(include)
+						batch.append((include, type))
+
+				results = list(executor.map(self._lock_include, [x[0] for x in batch]))
+
+				pending = []
+				for (include, type), (retrieved, entry) in zip(batch, results):
+					if not retrieved:
+						failed.append(include)
+						# Keep the previous pin rather than silently dropping it
+						if include in previous:
+							entries[include] = previous[include]
+					elif entry is not None:
+						entries[include] = entry
+					# Any local copy is still scanned, (as it will be included in the build)
+					file = os.path.join('scriptlets', include)
+					for nested in find_scriptlet_includes(file, type):
+						pending.append((nested, type))
+
+		changed = [x for x in entries if previous.get(x, {}).get('sha256') != entries[x]['sha256']]
+		removed = [x for x in previous if x not in entries]
+		self.entries = entries
+		self.save()
+		print('Pinned %d scriptlets in %s, (%d changed, %d removed)' % (
+			len(entries), self.path, len(changed), len(removed)
+		))
+		for include in sorted(changed):
+			print('  updated %s @ %s' % (include, entries[include]['revision']))
+		for include in sorted(failed):
+			print('  ERROR - could not retrieve %s' % include)
+
+
+scriptlet_lock = ScriptletLock()
+
+
+def fetch_scriptlet(include: str) -> bool:
+	"""
+	Retrieve a scriptlet from its source if the local copy is missing or outdated
+	:param include:
+	:return:
+	"""
+	return resolver.fetch(include)
+
+
+def find_scriptlet_includes(file: str, type: str) -> list:
+	"""
+	Scan a source file for all scriptlets it includes, (without parsing it)
+	:param file:
+	:param type:
+	:return:
+	"""
+	includes = []
+	if not filesystem.exists(file):
+		return includes
+
+	with io.StringIO(filesystem.read_text(file)) as f:
+		for line in f:
+			if line.startswith('# scriptlet:'):
+				includes.append(line[12:].strip())
+			elif type == 'python' and line.startswith('from scriptlets.') and ' import' in line:
+				line = line[16:].strip()
+				includes.append(line[:line.index(' import')].replace('.', '/') + '.py')
+			elif type == 'python' and line.startswith('# import:'):
+				includes.append(line[9:].strip())
+	return includes
+
+
+def prefetch_scriptlets(sources: list) -> set:
+	"""
+	Download every scriptlet referenced by a list of (file, type) sources before parsing starts
+
+	Downloaded scriptlets are scanned in turn so nested includes are fetched as well,
+	one concurrent batch per level of include depth.
+
+	:param sources:
+	:return: Set of scriptlet files which were checked
+	"""
+	checked = set()
+	pending = []
+	for file, type in sources:
+		for include in find_scriptlet_includes(file, type):
+			pending.append((include, type))
+
+	# The same threads, (and thus the same keep-alive connections), are reused for every batch
+	with ThreadPoolExecutor(max_workers=fetcher.workers) as executor:
+		while len(pending) > 0:
+			batch = []
+			for include, type in pending:
+				file = os.path.join('scriptlets', include)
+				if file not in checked:
+					checked.add(file)
+					batch.append((include, type))
+
+			list(executor.map(fetch_scriptlet, [x[0] for x in batch]))
+
+			pending = []
+			for include, type in batch:
+				for nested in find_scriptlet_includes(os.path.join('scriptlets', include), type):
+					pending.append((nested, type))
+
+	return checked
+
+
+def find_script_templates(file: str) -> list:
+	"""
+	Scan a source file for all script templates it includes via "# script:", (without parsing it)
+	:param file:
+	:return:
+	"""
+	templates = []
+	if not os.path.exists(file):
+		return templates
+
+	with open(file, 'r') as f:
+		for line in f:
+			if line.startswith('# script:'):
+				templates.append(line[9:].strip())
+	return templates
+
+
+def get_file_size(file: str) -> tuple:
+	"""
+	Get the number of lines and bytes of a file, (0, 0 if it does not exist)
+	:param file:
+	:return:
+	"""
+	if not os.path.exists(file):
+		return 0, 0
+	with open(file, 'rb') as f:
+		data = f.read()
+	return data.count(b'\n'), len(data)
+
+
+def build_include_graph() -> dict:
+	"""
+	Build the graph of every script, the scriptlets and templates it includes,
+	and what those include in turn
+
+	Sources are only scanned, not compiled, and nothing is downloaded;
+	scriptlets which have not been retrieved yet are flagged as missing.
+
+	:return: Graph with nodes, edges, per-script transitive include sizes,
+		and the scripts depending on each include
+	"""
+	nodes = {}
+	edges = []
+	direct = {}
+	"""
+	Direct includes of every node
+	"""
+
+	def add_node(file: str, kind: str, type: str):
+		if file in nodes:
+			return False
+		lines, size = get_file_size(file)
+		nodes[file] = {
+			'kind': kind,
+			'type': type,
+			'lines': lines,
+			'bytes': size,
+			'missing': not os.path.exists(file),
+		}
+		return True
+
+	pending = []
+	for file in sorted(glob('src/**/*', recursive=True)):
+		extension = os.path.splitext(file)[1]
+		if extension in SOURCE_TYPES:
+			file = os.path.normpath(file)
+			add_node(file, 'script', SOURCE_TYPES[extension])
+			pending.append((file, SOURCE_TYPES[extension]))
+
+	while len(pending) > 0:
+		file, type = pending.pop()
+		direct[file] = []
+		includes = []
+		for x in find_scriptlet_includes(file, type):
+			includes.append((os.path.join('scriptlets', x), 'scriptlet'))
+		for x in find_script_templates(file):
+			includes.append((os.path.join('scripts', x), 'template'))
+		for include, kind in includes:
+			include = os.path.normpath(include)
+			if include in direct[file]:
+				continue
+			direct[file].append(include)
+			edges.append({'from': file, 'to': include, 'kind': kind})
+			if add_node(include, kind, type) and kind == 'scriptlet':
+				pending.append((include, type))
+			elif include not in direct:
+				direct.setdefault(include, [])
+
+	scripts = {}
+	dependents = {}
+	for file, node in nodes.items():
+		if node['kind'] != 'script':
+			continue
+		# Every include is only inlined once per script, no matter how many times it is included
+		includes = []
+		stack = list(reversed(direct.get(file, [])))
+		while len(stack) > 0:
+			include = stack.pop()
+			if include in includes:
+				continue
+			includes.append(include)
+			dependents.setdefault(include, []).append(file)
+			stack += reversed(direct.get(include, []))
+		scripts[file] = {
+			'includes': includes,
+			'include_lines': sum([nodes[x]['lines'] for x in includes]),
+			'include_bytes': sum([nodes[x]['bytes'] for x in includes]),
+			'total_lines': node['lines'] + sum([nodes[x]['lines'] for x in includes]),
+			'total_bytes': node['bytes'] + sum([nodes[x]['bytes'] for x in includes]),
+		}
+
+	return {'nodes': nodes, 'edges': edges, 'scripts': scripts, 'dependents': dependents}
+
+
+def include_graph_as_dot(graph: dict) -> str:
+	"""
+	Render an include graph in Graphviz DOT format
+	:param graph:
+	:return:
+	"""
+	f = io.StringIO()
+	f.write('digraph includes {\n')
+	f.write('\trankdir=LR;\n')
+	f.write('\tnode [fontname="sans-serif", fontsize=10];\n')
+	for file, node in graph['nodes'].items():
+		if node['kind'] == 'script':
+			label = '%s\\n+%d lines included' % (file, graph['scripts'][file]['include_lines'])
+			shape = 'box'
+		else:
+			dependents = len(graph['dependents'].get(file, []))
+			label = '%s\\n%d lines, %d scripts' % (file, node['lines'], dependents)
+			shape = 'note' if node['kind'] == 'template' else 'ellipse'
+		style = ', style=dashed, color=red' if node['missing'] else ''
+		f.write('\t"%s" [label="%s", shape=%s%s];\n' % (file, label, shape, style))
+	for edge in graph['edges']:
+		f.write('\t"%s" -> "%s";\n' % (edge['from'], edge['to']))
+	f.write('}\n')
+	return f.getvalue()
+
+
+def get_include_chain(graph: dict, script: str, include: str) -> list:
+	"""
+	Get the shortest chain of includes from a script to one of its (transitive) includes
+	:param graph:
+	:param script:
+	:param include:
+	:return:
+	"""
+	direct = {}
+	for edge in graph['edges']:
+		direct.setdefault(edge['from'], []).append(edge['to'])
+	previous = {script: None}
+	queue = [script]
+	while len(queue) > 0:
+		file = queue.pop(0)
+		if file == include:
+			break
+		for child in direct.get(file, []):
+			if child not in previous:
+				previous[child] = file
+				queue.append(child)
+
+	chain = []
+	file = include
+	while file is not None and file in previous:
+		chain.insert(0, file)
+		file = previous[file]
+	return chain
+
+
+def who_includes(graph: dict, include: str) -> list:
+	"""
+	Describe every script which includes a given scriptlet or template,
+	directly or via other scriptlets
+	:param graph:
+	:param include: Path of the scriptlet, (relative to scriptlets/ or the project), or template
+	:return: Lines to print
+	"""
+	include = os.path.normpath(include)
+	prefixes = ('scriptlets' + os.sep, 'scripts' + os.sep)
+	if include not in graph['nodes'] and not include.startswith(prefixes):
+		include = os.path.join('scriptlets', include)
+
+	scripts = graph['dependents'].get(include, [])
+	lines = ['%s is included by %d script(s)' % (include, len(scripts))]
+	for script in sorted(scripts):
+		chain = get_include_chain(graph, script, include)
+		if len(chain) > 2:
+			lines.append('  %s (via %s)' % (script, ' -> '.join(chain[1:-1])))
+		else:
+			lines.append('  %s' % script)
+	return lines
+
+
+def print_include_sizes(graph: dict, top: int = 10):
+	"""
+	Print the scripts with the most included content
+	and the includes contributing the most to all outputs
+	:param graph:
+	:param top:
+	:return:
+	"""
+	print(
+		'| Script                                               '
+		'| Includes | Incl. lines | Incl. bytes |'
+	)
+	print(
+		'|------------------------------------------------------'
+		'|----------|-------------|-------------|'
+	)
+	scripts = sorted(graph['scripts'].items(), key=lambda x: x[1]['include_bytes'], reverse=True)
+	for file, data in scripts[:top]:
+		print('| %-52s | %8d | %11d | %11d |' % (
+			file, len(data['includes']), data['include_lines'], data['include_bytes']
+		))
+
+	print('')
+	print(
+		'| Include                                              '
+		'| Scripts  | Lines       | Total bytes |'
+	)
+	print(
+		'|------------------------------------------------------'
+		'|----------|-------------|-------------|'
+	)
+	includes = sorted(
+		graph['dependents'].items(),
+		key=lambda x: graph['nodes'][x[0]]['bytes'] * len(x[1]),
+		reverse=True
+	)
+	for file, dependents in includes[:top]:
+		node = graph['nodes'][file]
+		print('| %-52s | %8d | %11d | %11d |' % (
+			file, len(dependents), node['lines'], node['bytes'] * len(dependents)
+		))
+
+
+SHELL_FUNCTION = re.compile(r'^(?:function\s+)?(\w+)\s*\(\)\s*(\{)?')
+"""
+Bash function definition, (the opening brace may be on a following line)
+"""
+
+POWERSHELL_FUNCTION = re.compile(r'^\s*function\s+(\w+)\s*(\{)?')
+"""
+PowerShell function definition, (the opening brace may be on a following line)
+"""
+
+PYTHON_BLOCK_NODES = (ast.stmt, ast.excepthandler) + (
+	(ast.match_case,) if hasattr(ast, 'match_case') else ()
+)
+"""
+Python nodes which may contain definitions, (match statements only exist from Python 3.10)
+"""
+
+PYTHON_DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+"""
+Python nodes defining a named function or class
+"""
+
+
+class Scriptlet:
+	def __init__(self, name: str, type: str):
+		self.name = name
+		self.type = type
+		self.functions = []
+
+	def parse(self):
+		"""
+		Parse a scriptlet file to retrieve the contained functions and documentation
+		:return:
+		"""
+		file_path = self.name
+		if not filesystem.exists(file_path):
+			return
+		profiler.read(file_path)
+		content = filesystem.read_text(file_path)
+
+		if self.type == 'python':
+			self._parse_python(content)
+		elif self.type == 'shell':
+			self._parse_shell(content)
+		elif self.type == 'powershell':
+			self._parse_powershell(content)
+
+	def _add_function(self, name: str, body: str, type: str = 'function'):
+		func = ScriptletFunction()
+		func.name = name
+		func.body = body
+		func.type = type
+		self.functions.append(func)
+
+	def _parse_python(self, content: str):
+		"""
+		Python: Find functions, classes, and methods along with their docstrings
+		in a single walk of the syntax tree
+		:param content:
+		:return:
+		"""
+		try:
+			tree = ast.parse(content, filename=self.name)
+		except SyntaxError as e:
+			print('Could not parse %s: %s' % (self.name, e))
+			return
+
+		self._walk_python(content.splitlines(keepends=True), tree, '')
+
+	def _walk_python(self, lines: list, node, prefix: str):
+		for child in ast.iter_child_nodes(node):
+			# Definitions only live in statements, so expressions do not need to be walked
+			if not isinstance(child, PYTHON_BLOCK_NODES):
+				continue
+			if isinstance(child, PYTHON_DEFINITIONS):
+				name = prefix + child.name
+				self._add_function(
+					name,
+					self._get_python_docstring(lines, child),
+					'class' if isinstance(child, ast.ClassDef) else 'function'
+				)
+				# Methods and nested definitions are named after their parent
+				self._walk_python(lines, child, name + '.')
+			else:
+				self._walk_python(lines, child, prefix)
+
+	def _get_python_docstring(self, lines: list, node) -> str:
+		"""
+		Get the triple-quoted docstring of a definition as written in the source, left-aligned
+		:param lines:
+		:param node:
+		:return:
+		"""
+		if (
+			len(node.body) == 0 or
+			not isinstance(node.body[0], ast.Expr) or
+			not isinstance(node.body[0].value, ast.Constant) or
+			not isinstance(node.body[0].value.value, str)
+		):
+			return ''
+
+		# Read the raw source of the string, (offsets are in UTF-8 bytes)
+		value = node.body[0].value
+		first = lines[value.lineno - 1].encode('utf-8')
+		if value.lineno == value.end_lineno:
+			raw = first[value.col_offset:value.end_col_offset].decode('utf-8')
+		else:
+			raw = first[value.col_offset:].decode('utf-8')
+			raw += ''.join(lines[value.lineno:value.end_lineno - 1])
+			last = lines[value.end_lineno - 1].encode('utf-8')
+			raw += last[:value.end_col_offset].decode('utf-8')
+
+		raw = raw.lstrip('rRuU')
+		if not (raw.startswith('"""') or raw.startswith("'''")):
+			return ''
+
+		lines = raw[3:-3].splitlines()
+		# Remove first line if empty
+		if lines and lines[0].strip() == '':
+			lines = lines[1:]
+		# Find minimum indentation (ignore empty lines)
+		min_indent = None
+		for line in lines:
+			stripped = line.lstrip()
+			if stripped:
+				indent = len(line) - len(stripped)
+				if min_indent is None or indent < min_indent:
+					min_indent = indent
+		# Remove min_indent from all lines
+		if min_indent is not None and min_indent > 0:
+			lines = [line[min_indent:] if len(line) >= min_indent else line for line in lines]
+		return '\n'.join([line.rstrip() for line in lines])
+
+	def _has_brace(self, lines: list, index: int, match) -> bool:
+		"""
+		Check if a function definition is followed by its opening brace,
+		(on the same line or the next non-empty line)
+		:param lines:
+		:param index:
+		:param match:
+		:return:
+		"""
+		if match.group(2) is not None:
+			return True
+		if lines[index][match.end():].strip() != '':
+			return False
+		for line in lines[index + 1:]:
+			if line.strip() != '':
+				return line.lstrip().startswith('{')
+		return False
+
+	def _parse_shell(self, content: str):
+		"""
+		Bash: Find function <name> or <name>() {,
+		capture contiguous preceding # comments (no blank lines)
+
+		Performed as a single scan over the lines of the file.
+		:param content:
+		:return:
+		"""
+		lines = content.splitlines()
+		comments = []
+		for index, line in enumerate(lines):
+			if line.startswith('#'):
+				comments.append(line.strip('#').strip())
+				continue
+
+			match = SHELL_FUNCTION.match(line)
+			if match is not None and self._has_brace(lines, index, match):
+				self._add_function(match.group(1), '\n'.join(comments))
+			comments = []
+
+	def _parse_powershell(self, content: str):
+		"""
+		PowerShell: Find function <name>, capture the immediately preceding <# ... #> or # comments
+
+		Performed as a single scan over the lines of the file.
+		:param content:
+		:return:
+		"""
+		lines = content.splitlines()
+		comment = None
+		line_comments = []
+		block = None
+		for index, line in enumerate(lines):
+			stripped = line.strip()
+			if block is not None:
+				# Inside a <# ... #> block comment
+				if '#>' in line:
+					block.append(line[:line.index('#>')])
+					comment = '\n'.join(block).strip()
+					block = None
+				else:
+					block.append(line)
+				continue
+
+			if stripped.startswith('<#'):
+				rest = stripped[2:]
+				if '#>' in rest:
+					comment = rest[:rest.index('#>')].strip()
+				else:
+					block = [rest]
+				line_comments = []
+			elif stripped.startswith('#'):
+				line_comments.append(stripped.strip('#').strip())
+				comment = '\n'.join(line_comments)
+			elif stripped == '':
+				# Whitespace is allowed between a comment and its function
+				continue
+			else:
+				match = POWERSHELL_FUNCTION.match(line)
+				if match is not None and self._has_brace(lines, index, match):
+					self._add_function(match.group(1), comment if comment is not None else '')
+				comment = None
+				line_comments = []
+
+
+class ScriptletFunction:
+	def __init__(self):
+		self.name = None
+		self.body = ''
+		self.type = 'function'
+		"""
+		Either 'function' or 'class'
+		"""
+
+
+class ScriptletInclude:
+	"""
+	Include recorded while parsing a cached scriptlet
+
+	Resolution is deferred to the script the scriptlet is included in,
+	so that script's include and import deduplication still applies.
+	"""
+	def __init__(self, src_file: str, src_line: int, include: str):
+		self.src_file = src_file
+		self.src_line = src_line
+		self.include = include
+
+	def resolve(self, script) -> str:
+		return script._parse_include(self.src_file, self.src_line, self.include)
+
+
+class ScriptletCache:
+	"""
+	In-process cache of parsed scriptlets, shared by every script compiled in a build
+
+	Each scriptlet is downloaded, (if necessary), and parsed once per modification;
+	every subsequent include only replays the recorded content, includes, and imports.
+	"""
+	def __init__(self):
+		self.entries = {}
+		self.definitions = {}
+		self.downloaded = set()
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, include: str, type: str):
+		"""
+		Get the parsed scriptlet for a given include, or None if it does not exist
+		:param include:
+		:param type:
+		:return:
+		"""
+		file = os.path.join('scriptlets', include)
+		if file not in self.downloaded and filesystem.local:
+			self.downloaded.add(file)
+			fetch_scriptlet(include)
+
+		if not filesystem.exists(file):
+			return None
+
+		key = (file, type, filesystem.signature(file))
+		if key in self.entries:
+			self.hits += 1
+		else:
+			self.misses += 1
+			script = Script(file, type)
+			script._events = []
+			script.parse()
+			self.entries[key] = script
+		return self.entries[key]
+
+	def get_definitions(self, include: str, type: str) -> set:
+		"""
+		Get the names of all top-level functions, (and classes for Python), defined in a scriptlet
+		:param include:
+		:param type:
+		:return:
+		"""
+		file = os.path.join('scriptlets', include)
+		if not filesystem.exists(file):
+			return set()
+
+		key = (file, type, filesystem.signature(file))
+		if key not in self.definitions:
+			self.definitions[key] = get_definitions(file, type)
+		return self.definitions[key]
+
+
+scriptlet_cache = ScriptletCache()
+
+
+def get_definitions(file: str, type: str) -> set:
+	"""
+	Get the names of all top-level functions, (and classes for Python), defined in a file
+	:param file:
+	:param type:
+	:return:
+	"""
+	scriptlet = Scriptlet(file, type)
+	scriptlet.parse()
+	# Methods and nested definitions are qualified with their parent's name
+	return set([x.name for x in scriptlet.functions if '.' not in x.name])
+
+
+def python_names(node) -> set:
+	"""
+	Get every name referenced anywhere within a syntax tree node
+	:param node:
+	:return:
+	"""
+	return set([x.id for x in ast.walk(node) if isinstance(x, ast.Name)])
+
+
+def python_alias(alias: ast.alias) -> str:
+	"""
+	Get the source of a single name within an import statement, (ie: "path as p")
+	:param alias:
+	:return:
+	"""
+	return alias.name + (' as ' + alias.asname if alias.asname else '')
+
+
+def tree_shake_python(content: str, candidates: set) -> tuple:
+	"""
+	Remove top-level functions and classes which can never be reached
+	from the rest of a Python script
+
+	Only definitions named in candidates, (ie: those pulled in from scriptlets),
+	are considered for removal.
+	Everything else at the top level of the script is a root, and definitions are reachable
+	if they are referenced by name from a root or from another reachable definition.
+	Imports which were only used by removed definitions are removed as well;
+	imports which were never used at all are kept, as they may be imported for their side effects.
+
+	Names referenced dynamically, (ie: via globals() or getattr on the module), are not detected.
+
+	:param content: Compiled Python source
+	:param candidates: Names of definitions which may be removed
+	:return: (content, list of removed names)
+	"""
+	try:
+		tree = ast.parse(content)
+	except SyntaxError:
+		return content, []
+
+	definitions = {}
+	roots = []
+	for node in tree.body:
+		if isinstance(node, PYTHON_DEFINITIONS) and node.name in candidates:
+			definitions.setdefault(node.name, []).append(node)
+		else:
+			roots.append(node)
+
+	# Walk the references from every root to find all reachable definitions
+	reachable = set()
+	pending = set()
+	for node in roots:
+		pending |= python_names(node)
+	while len(pending) > 0:
+		name = pending.pop()
+		if name in definitions and name not in reachable:
+			reachable.add(name)
+			for node in definitions[name]:
+				pending |= python_names(node)
+
+	removed = [name for name in definitions if name not in reachable]
+	if len(removed) == 0:
+		return content, []
+
+	lines = content.splitlines(keepends=True)
+	replacements = {}
+	"""
+	Replacement text for each line number to change, (0-indexed, None to remove the line)
+	"""
+	used_before = set()
+	used_after = set()
+	for node in tree.body:
+		names = python_names(node)
+		used_before |= names
+		if isinstance(node, PYTHON_DEFINITIONS) and node.name in removed:
+			start = min([node.lineno] + [x.lineno for x in node.decorator_list]) - 1
+			end = node.end_lineno
+			# Take the blank lines following the definition with it
+			while end < len(lines) and lines[end].strip() == '':
+				end += 1
+			for i in range(start, end):
+				replacements[i] = None
+		else:
+			used_after |= names
+
+	for node in tree.body:
+		if not isinstance(node, (ast.Import, ast.ImportFrom)):
+			continue
+		keep = []
+		for alias in node.names:
+			if isinstance(node, ast.Import):
+				bound = alias.asname if alias.asname else alias.name.split('.')[0]
+			else:
+				bound = alias.asname if alias.asname else alias.name
+			if alias.name == '*' or bound not in used_before or bound in used_after:
+				keep.append(alias)
+		if len(keep) == len(node.names):
+			continue
+
+		for i in range(node.lineno - 1, node.end_lineno):
+			replacements[i] = None
+		if len(keep) > 0:
+			names = ', '.join([python_alias(x) for x in keep])
+			if isinstance(node, ast.Import):
+				line = 'import %s\n' % names
+			else:
+				line = 'from %s%s import %s\n' % ('.' * node.level, node.module or '', names)
+			replacements[node.lineno - 1] = ' ' * node.col_offset + line
+
+	out = []
+	for i, line in enumerate(lines):
+		if i not in replacements:
+			out.append(line)
+		elif replacements[i] is not None:
+			out.append(replacements[i])
+	return ''.join(out), removed
+
+
+def normalize_python_imports(imports: list) -> list:
+	"""
+	Merge and deduplicate the import statements collected for a Python script
+
+	"from X import a" and "from X import a, b" become a single "from X import a, b",
+	and "import a, b" is split so each module is only imported once.
+	Statements are kept in order of first appearance; anything which cannot be parsed is kept as-is.
+
+	:param imports:
+	:return:
+	"""
+	out = []
+	seen = set()
+	merged = {}
+	"""
+	Index in out and list of names of each "from X import ..." statement
+	"""
+	for line in imports:
+		try:
+			tree = ast.parse(line)
+		except SyntaxError:
+			tree = None
+		if (
+			tree is None or len(tree.body) != 1
+			or not isinstance(tree.body[0], (ast.Import, ast.ImportFrom))
+		):
+			if line not in seen:
+				seen.add(line)
+				out.append(line)
+			continue
+
+		node = tree.body[0]
+		names = [python_alias(x) for x in node.names]
+		if isinstance(node, ast.Import):
+			for name in names:
+				if 'import ' + name not in seen:
+					seen.add('import ' + name)
+					out.append('import ' + name)
+		elif names == ['*']:
+			statement = 'from %s%s import *' % ('.' * node.level, node.module or '')
+			if statement not in seen:
+				seen.add(statement)
+				out.append(statement)
+		else:
+			module = '.' * node.level + (node.module or '')
+			if module not in merged:
+				merged[module] = (len(out), [])
+				out.append(None)
+			for name in names:
+				if name not in merged[module][1]:
+					merged[module][1].append(name)
+
+	for module, (index, names) in merged.items():
+		out[index] = 'from %s import %s' % (module, ', '.join(names))
+	return out
+
+
+HEAVY_MODULES = (
+	'ctypes',
+	'email',
+	'http.client',
+	'logging',
+	'readline',
+	'sqlite3',
+	'ssl',
+	'urllib.error',
+	'urllib.request',
+	'xml',
+)
+"""
+Standard library modules which are slow to import, (including their dependencies),
+and are moved into the functions which use them with --lazy-imports
+"""
+
+
+def is_heavy_module(module: str) -> bool:
+	return any([module == x or module.startswith(x + '.') for x in HEAVY_MODULES])
+
+
+def get_lazy_import_target(path: list, name: str):
+	"""
+	Find the block a top-level import can be moved into for a single use of its name
+
+	Uses within a top-level function, (or a method of a top-level class),
+	are moved into that function;
+	uses within a block of a top-level statement, (ie: an "except" handler),
+	are moved into that block.
+	Anything evaluated when the module is loaded, (decorators, defaults, class bodies),
+	cannot be moved.
+
+	:param path: (parent, field, child) from the module down to the use
+	:param name:
+	:return: (parent, field) of the target block, or None if the import cannot be moved
+	"""
+	for parent, field, child in path:
+		if isinstance(parent, ast.Module):
+			continue
+		if isinstance(parent, (ast.FunctionDef, ast.AsyncFunctionDef)):
+			if field != 'body':
+				return None
+			# The name must not be a local of the function, (the import would replace it)
+			for node in ast.walk(parent):
+				if (
+					isinstance(node, ast.Name) and node.id == name
+					and not isinstance(node.ctx, ast.Load)
+				):
+					return None
+				if isinstance(node, ast.arg) and node.arg == name:
+					return None
+				if isinstance(node, (ast.Global, ast.Nonlocal)) and name in node.names:
+					return None
+			return parent, field
+		if isinstance(parent, ast.ClassDef):
+			if field == 'body' and isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+				continue
+			return None
+		if isinstance(parent, ast.Try) and field == 'handlers':
+			continue
+		blocks = ('body', 'orelse', 'finalbody')
+		if isinstance(parent, (ast.stmt, ast.excepthandler)) and field in blocks:
+			return parent, field
+		return None
+	return None
+
+
+def lazy_import_python(content: str) -> tuple:
+	"""
+	Move top-level imports of heavy modules into the functions or blocks which use them
+
+	A name is only moved if every use of it can be moved;
+	names which are never used are kept,
+	as they may be imported for their side effects, (ie: readline).
+
+	:param content: Compiled Python source
+	:return: (content, list of moved modules)
+	"""
+	try:
+		tree = ast.parse(content)
+	except SyntaxError:
+		return content, []
+
+	lines = content.splitlines(keepends=True)
+	candidates = {}
+	"""
+	Import statement and alias of each heavy module imported at the top level, by the name it binds
+	"""
+	for node in tree.body:
+		if not isinstance(node, (ast.Import, ast.ImportFrom)):
+			continue
+		if isinstance(node, ast.ImportFrom) and (node.level != 0 or node.module is None):
+			continue
+		# The statement must be alone on its lines
+		before = lines[node.lineno - 1][:node.col_offset].strip()
+		rest = lines[node.end_lineno - 1][node.end_col_offset:].strip()
+		if before != '' or (rest != '' and not rest.startswith('#')):
+			continue
+
+		for alias in node.names:
+			if isinstance(node, ast.Import):
+				module = alias.name
+				bound = alias.asname if alias.asname else alias.name.split('.')[0]
+			else:
+				module = node.module + '.' + alias.name
+				bound = alias.asname if alias.asname else alias.name
+			if alias.name == '*':
+				continue
+			if not (is_heavy_module(module) or is_heavy_module(module.rsplit('.', 1)[0])):
+				continue
+			if bound in candidates:
+				# Bound more than once, (ie: "import urllib.error" and "import urllib.request");
+				# leave these alone
+				candidates[bound] = None
+			else:
+				candidates[bound] = (node, alias)
+
+	candidates = {k: v for k, v in candidates.items() if v is not None}
+
+	# Names the script binds again, (by a def, class, or another import), cannot be moved safely
+	for node in ast.walk(tree):
+		if isinstance(node, PYTHON_DEFINITIONS):
+			candidates.pop(node.name, None)
+		elif isinstance(node, (ast.Import, ast.ImportFrom)):
+			for alias in node.names:
+				bound = alias.asname if alias.asname else alias.name.split('.')[0]
+				if bound in candidates and candidates[bound][0] is not node:
+					del candidates[bound]
+
+	if len(candidates) == 0:
+		return content, []
+
+	# Find every use of each candidate name along with its path from the module
+	uses = {}
+	stack = [(tree, [])]
+	while len(stack) > 0:
+		node, path = stack.pop()
+		if isinstance(node, ast.Name) and node.id in candidates:
+			uses.setdefault(node.id, []).append(path)
+		for field, value in ast.iter_fields(node):
+			for child in (value if isinstance(value, list) else [value]):
+				if isinstance(child, ast.AST):
+					stack.append((child, path + [(node, field, child)]))
+
+	insertions = {}
+	"""
+	Lines to insert before each line number, (0-indexed)
+	"""
+	moved = {}
+	"""
+	Aliases moved out of each import statement
+	"""
+	for bound, (node, alias) in candidates.items():
+		if bound not in uses:
+			continue
+		targets = []
+		for path in uses[bound]:
+			target = get_lazy_import_target(path, bound)
+			if target is None:
+				targets = None
+				break
+			if target not in targets:
+				targets.append(target)
+		if targets is None:
+			continue
+
+		# Locate where the import goes in each target block
+		positions = []
+		for parent, field in targets:
+			body = getattr(parent, field)
+			first = body[0]
+			if (
+				isinstance(parent, (ast.FunctionDef, ast.AsyncFunctionDef))
+				and isinstance(first, ast.Expr)
+				and isinstance(first.value, ast.Constant)
+				and isinstance(first.value.value, str)
+			):
+				# Keep the docstring first
+				if len(body) == 1:
+					positions = None
+					break
+				first = body[1]
+			decorators = getattr(first, 'decorator_list', [])
+			lineno = min([first.lineno] + [x.lineno for x in decorators]) - 1
+			indent = lines[lineno][:first.col_offset]
+			if indent.strip() != '' or lineno <= parent.lineno - 1:
+				# Block is on the same line as its header
+				positions = None
+				break
+			positions.append((lineno, indent))
+		if positions is None:
+			continue
+
+		name = python_alias(alias)
+		if isinstance(node, ast.Import):
+			statement = 'import %s' % name
+		else:
+			statement = 'from %s import %s' % (node.module, name)
+		for lineno, indent in positions:
+			if indent + statement + '\n' not in insertions.get(lineno, []):
+				insertions.setdefault(lineno, []).append(indent + statement + '\n')
+		moved.setdefault(node, []).append(alias)
+
+	if len(moved) == 0:
+		return content, []
+
+	replacements = {}
+	for node, aliases in moved.items():
+		for i in range(node.lineno - 1, node.end_lineno):
+			replacements[i] = None
+		keep = [python_alias(x) for x in node.names if x not in aliases]
+		if len(keep) > 0:
+			if isinstance(node, ast.Import):
+				replacements[node.lineno - 1] = 'import %s\n' % ', '.join(keep)
+			else:
+				statement = 'from %s import %s\n' % (node.module, ', '.join(keep))
+				replacements[node.lineno - 1] = statement
+
+	out = []
+	for i, line in enumerate(lines):
+		out += insertions.get(i, [])
+		if i not in replacements:
+			out.append(line)
+		elif replacements[i] is not None:
+			out.append(replacements[i])
+
+	names = []
+	for node, aliases in moved.items():
+		for alias in aliases:
+			if isinstance(node, ast.Import):
+				names.append(alias.name)
+			else:
+				names.append(node.module + '.' + alias.name)
+	return ''.join(out), names
+
+
+SHELL_HEREDOC = re.compile(r'<<-?\s*[\'"]?(\w+)[\'"]?')
+"""
+Start of a heredoc, (its content may contain anything, including closing braces)
+"""
+
+SHELL_FUNCTION_END = re.compile(r'^\}\s*(#.*)?$')
+"""
+Closing brace of a top-level function
+"""
+
+SHELL_WORD = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+"""
+Words which may be a reference to a function,
+(commands, arguments to trap, variables holding a function name, etc)
+"""
+
+
+def tree_shake_shell(content: str, candidates: set) -> tuple:
+	"""
+	Remove top-level functions which can never be called from the rest of a shell script
+
+	Only functions named in candidates, (ie: those pulled in from scriptlets),
+	are considered for removal.
+	The script is tokenized into words, and a function is kept if its name appears as a word
+	anywhere outside of the candidate functions, or within another kept function.
+	This errs on the side of keeping functions;
+	names only mentioned in strings or comments are kept too.
+
+	Functions are expected to start at the beginning of a line and end with a closing brace
+	at the beginning of a line;
+	if any candidate function cannot be delimited, the script is left untouched.
+
+	:param content: Compiled shell source
+	:param candidates: Names of functions which may be removed
+	:return: (content, list of removed names)
+	"""
+	lines = content.splitlines(keepends=True)
+	functions = {}
+	"""
+	Line range of each candidate function,
+	(start including its documentation comments, end exclusive)
+	"""
+	i = 0
+	while i < len(lines):
+		match = SHELL_FUNCTION.match(lines[i])
+		if match is None or match.group(1) not in candidates:
+			i += 1
+			continue
+
+		line = lines[i]
+		end = None
+		if (
+			match.group(2) is not None
+			and line.rstrip().endswith('}')
+			and line.count('{') == line.count('}')
+		):
+			# Single line function
+			end = i + 1
+		else:
+			heredoc = None
+			for j in range(i + 1, len(lines)):
+				if heredoc is not None:
+					if lines[j].strip() == heredoc:
+						heredoc = None
+				elif SHELL_FUNCTION_END.match(lines[j]):
+					end = j + 1
+					break
+				elif SHELL_FUNCTION.match(lines[j]):
+					# Another top-level function before this one closed
+					break
+				else:
+					heredoc_match = SHELL_HEREDOC.search(lines[j])
+					if heredoc_match is not None:
+						heredoc = heredoc_match.group(1)
+
+		if end is None or match.group(1) in functions:
+			return content, []
+
+		# Comments directly above the function only belong to it if they are its own "##" doc block,
+		# or if a blank line separates them from everything before,
+		# (ie: not the tail of a file header)
+		start = i
+		while (
+			start > 0 and lines[start - 1].startswith('#') and not lines[start - 1].startswith('#!')
+		):
+			start -= 1
+			if lines[start].startswith('##'):
+				break
+		if start > 0 and not lines[start].startswith('##') and lines[start - 1].strip() != '':
+			start = i
+		functions[match.group(1)] = (start, end)
+		i = end
+
+	if len(functions) == 0:
+		return content, []
 
-	# Translate the file to the cache file; it should be in the same directory
-	# but with '.etag.(filename)' instead.
-	etag_path = os.path.join(os.path.dirname(filename), '.etag.' + os.path.basename(filename))
-	headers = {}
-	if os.path.exists(etag_path) and os.path.exists(filename):
-		with open(etag_path, 'r') as f:
-			etag = f.read().strip()
-			headers['If-None-Match'] = etag
+	# Words used outside of the candidate functions are the roots
+	owner = {}
+	for name, (start, end) in functions.items():
+		for i in range(start, end):
+			owner[i] = name
+	words = {}
+	roots = set()
+	for i, line in enumerate(lines):
+		if i in owner:
+			words.setdefault(owner[i], set()).update(SHELL_WORD.findall(line))
+		else:
+			roots.update(SHELL_WORD.findall(line))
 
-	# Try to auto-download scripts from the repository
-	if not os.path.exists(os.path.dirname(filename)):
-		os.makedirs(os.path.dirname(filename))
+	reachable = set()
+	pending = set([x for x in roots if x in functions])
+	while len(pending) > 0:
+		name = pending.pop()
+		if name not in reachable:
+			reachable.add(name)
+			pending |= set([x for x in words[name] if x in functions and x not in reachable])
 
-	try:
-		req = urllib.request.Request(url, headers=headers)
-		with urllib.request.urlopen(req, timeout=5) as response:
-			if response.status == 304:
-				return True
+	removed = [name for name in functions if name not in reachable]
+	if len(removed) == 0:
+		return content, []
 
-			with open(filename, 'wb') as f:
-				f.write(response.read())
-			# Store the ETag for future caching
-			with open(etag_path, 'w') as f:
-				f.write(response.getheader('ETag', ''))
-			print('Downloaded %s scriptlet' % filename)
-			return True
-	except urllib_error.HTTPError as e:
-		if e.code == 304:
-			return True
-	except Exception as e:
-		print('Could not download %s' % filename)
-		return False
+	drop = set()
+	for name in removed:
+		start, end = functions[name]
+		# Take the blank lines following the function with it
+		while end < len(lines) and lines[end].strip() == '':
+			end += 1
+		drop.update(range(start, end))
+	return ''.join([line for i, line in enumerate(lines) if i not in drop]), removed
 
 
-class Scriptlet:
-	def __init__(self, name: str, type: str):
-		self.name = name
-		self.type = type
-		self.functions = []
+LINE_DIRECTIVES = re.compile(
+	r'(?P<scriptlet># scriptlet:)|' +
+	r'(?P<script># script:)|' +
+	r'(?P<import>import )|' +
+	r'(?P<from_scriptlets>from scriptlets\.)|' +
+	r'(?P<from_import>from .* import )|' +
+	r'(?P<import_include># import:)'
+)
+"""
+Directives recognized at the start of a script line, (matched in order of precedence)
+"""
 
-	def parse(self):
-		"""
-		Parse a scriptlet file to retrieve the contained functions and documentation
-		:return:
-		"""
-		file_path = self.name
-		if not os.path.exists(file_path):
-			return
-		with open(file_path, 'r', encoding='utf-8') as f:
-			content = f.read()
+PYTHON_DIRECTIVES = ('import', 'from_scriptlets', 'from_import', 'import_include')
+"""
+Line directives which are only handled within Python scripts
+"""
 
-		if self.type == 'python':
-			# Python: Find def <name>(...) and docstrings, handle indented docstrings and left-align
-			func_pattern = re.compile(r'^\s*def\s+(\w+)\s*\(.*?\):', re.MULTILINE)
-			# Match triple-quoted docstrings, possibly indented
-			doc_pattern = re.compile(r'^\s*def\s+(\w+)\s*\(.*?\):\s*(?:\n\s*)?("""|\'\'\')([\s\S]*?)(\2)', re.MULTILINE)
-			for match in func_pattern.finditer(content):
-				name = match.group(1)
-				# Find docstring after function definition
-				doc_match = doc_pattern.search(content, match.start())
-				body = ''
-				if doc_match and doc_match.group(1) == name:
-					body_raw = doc_match.group(3)
-					lines = body_raw.splitlines()
-					# Remove first line if empty
-					if lines and lines[0].strip() == '':
-						lines = lines[1:]
-					# Find minimum indentation (ignore empty lines)
-					min_indent = None
-					for line in lines:
-						stripped = line.lstrip()
-						if stripped:
-							indent = len(line) - len(stripped)
-							if min_indent is None or indent < min_indent:
-								min_indent = indent
-					# Remove min_indent from all lines
-					if min_indent is not None and min_indent > 0:
-						lines = [line[min_indent:] if len(line) >= min_indent else line for line in lines]
-					body = '\n'.join([line.rstrip() for line in lines])
-				func = ScriptletFunction()
-				func.name = name
-				func.body = body
-				self.functions.append(func)
+COMPILE_DIRECTIVES = {
+	'# compile:usage': 'usage',
+	'# compile:argparse': 'argparse',
+}
+"""
+Directives recognized as a line on their own, (surrounding whitespace is ignored)
+"""
 
-		elif self.type == 'shell':
-			# Bash: Find function <name> or <name>() {, capture contiguous preceding # comments (no blank lines)
-			func_pattern = re.compile(r'(?:^|\n)((?:#.*\n)+)?(?:function\s+)?(\w+)\s*\(\)\s*\{', re.MULTILINE)
-			for match in func_pattern.finditer(content):
-				name = match.group(2)
-				comments = match.group(1) or ''
-				# Only include contiguous comment block (no blank lines)
-				comment_lines = []
-				for line in comments.splitlines():
-					if line.strip().startswith('#'):
-						comment_lines.append(line.strip('#').strip())
-					elif line.strip() == '':
-						break  # Stop at first blank line
-				body = '\n'.join(comment_lines)
-				func = ScriptletFunction()
-				func.name = name
-				func.body = body
-				self.functions.append(func)
+HEADER_SECTION_PATTERN = re.compile(
+	r'^(?:# |\.|)(trmm arguments|trmm environment|syntax|supports|category|title|draft|author):?$'
+)
+"""
+Header lines which start a multi-line section, (matched against the lowercase, stripped line)
+"""
 
-		elif self.type == 'powershell':
-			# PowerShell: Find function <name>, capture preceding <# ... #> or # comments
-			func_pattern = re.compile(r'(?:<#[\s\S]*?#>|(?:#.*\n)*)\s*function\s+(\w+)\s*\{', re.MULTILINE)
-			for match in func_pattern.finditer(content):
-				name = match.group(1)
-				# Extract preceding block comment or line comments
-				block_comment = re.search(r'<#([\s\S]*?)#>', content[:match.start()])
-				line_comments = '\n'.join([line.strip('#').strip() for line in content[:match.start()].splitlines() if line.strip().startswith('#')])
-				body = block_comment.group(1).strip() if block_comment else line_comments
-				func = ScriptletFunction()
-				func.name = name
-				func.body = body
-				self.functions.append(func)
+HEADER_SECTIONS = {
+	'trmm arguments': 'trmm_args',
+	'trmm environment': 'trmm_env',
+	'syntax': 'syntax',
+	'supports': 'supports',
+	'category': 'category',
+	'title': 'title',
+	'draft': 'draft',
+	'author': 'author',
+}
 
+HEADER_SECTION_HANDLERS = {
+	'trmm_args': lambda script, line: script._parse_arg(line),
+	'trmm_env': lambda script, line: script._parse_env(line),
+	'syntax': lambda script, line: script._parse_syntax(line),
+	'supports': lambda script, line: script._parse_supports(line),
+	'category': lambda script, line: setattr(script, 'category', line[1:].strip()),
+	'title': lambda script, line: setattr(script, 'title', line[1:].strip()),
+	'draft': lambda script, line: setattr(
+		script, 'draft', line[1:].strip().lower() in ('1', 'true', 'yes')
+	),
+	'author': lambda script, line: script._parse_author(line[1:].strip()),
+}
+"""
+Handlers for each line within a header section, (may return a replacement for the line)
+"""
 
-class ScriptletFunction:
-	def __init__(self):
-		self.name = None
-		self.body = ''
+HEADER_TAGS = (
+	('@AUTHOR', lambda script, line: script._parse_author(line[9:].strip())),
+	('@SUPPORTS', lambda script, line: script._parse_supports(line)),
+	('@CATEGORY', lambda script, line: setattr(script, 'category', line[11:].strip())),
+	('@TRMM-TIMEOUT', lambda script, line: setattr(script, 'trmm_timeout', int(line[15:].strip()))),
+	('@WARLOCK-TITLE', lambda script, line: setattr(script, 'warlock_title', line[16:].strip())),
+	('@WARLOCK-IMAGE', lambda script, line: setattr(script, 'warlock_image', line[16:].strip())),
+	('@WARLOCK-ICON', lambda script, line: setattr(script, 'warlock_icon', line[15:].strip())),
+	('@WARLOCK-THUMBNAIL', lambda script, line: setattr(
+		script, 'warlock_thumbnail', line[20:].strip()
+	)),
+)
+"""
+Single-line "@TAG value" header tags, (checked in order of precedence)
+"""
 
 
 class Script:
@@ -198,21 +2405,39 @@ class Script:
 		self.supports_detailed = []
 		self.scriptlets = []
 		self.imports = []
+		self.dependencies = []
+		"""
+		List of all files pulled into this script via scriptlets and scripts,
+		(used for the build cache).
+		"""
 		self.args = []
 		self.env = []
 		self.syntax = []
 		self.syntax_arg_map = []
 		self.description = ''
-		self.content_header = ''
-		self.content_body = ''
+		self.content_header = []
+		"""
+		Chunks of compiled output within the file header, (joined once when written)
+		"""
+		self.content_body = []
+		"""
+		Chunks of compiled output after the file header, (joined once when written)
+		"""
 		self.is_python_module = False
 		"""
-		Set to True if this script is located within a Python module, (generally indicates that it's not a self-contained script).
+		Set to True if this script is located within a Python module,
+		(generally indicates that it's not a self-contained script).
 		"""
 		self._generated_usage = False
 		self._argparser_var = None
 		"""
-		Argument parser variable name in Python, used to know what variable to use for parsing arguments
+		Argument parser variable name in Python,
+		used to know what variable to use for parsing arguments
+		"""
+		self._events = None
+		"""
+		When set, content, includes, and imports are recorded here instead of being resolved,
+		(used for cached scriptlets)
 		"""
 
 	def parse(self):
@@ -229,41 +2454,56 @@ class Script:
 
 		self._parse_guid()
 
-		if os.path.exists(os.path.join(os.path.dirname(self.file), 'README.md')):
+		if filesystem.exists(os.path.join(os.path.dirname(self.file), 'README.md')):
 			self.readme = os.path.join(os.path.dirname(self.file), 'README.md')
 
 		# Check if this file is __init__.py or __init__.py is contained within the path.
 		if self.type == 'python':
 			self.is_python_module = (
 				os.path.basename(self.file) == '__init__.py' or
-				os.path.exists(os.path.join(os.path.dirname(self.file), '__init__.py'))
+				filesystem.exists(os.path.join(os.path.dirname(self.file), '__init__.py'))
 			)
 
-		with open(self.file, 'r') as f:
+		is_python = self.type == 'python'
+		is_powershell = self.type == 'powershell'
+
+		profiler.read(self.file)
+		with io.StringIO(filesystem.read_text(self.file)) as f:
 			for line in f:
 				line_number += 1
 				write = True
+				stripped = line.strip()
+
+				# Classify the line once; directives are only ever found at the start of a line
+				directive = None
+				match = LINE_DIRECTIVES.match(line)
+				if match is not None and (is_python or match.lastgroup not in PYTHON_DIRECTIVES):
+					directive = match.lastgroup
+				elif stripped in COMPILE_DIRECTIVES:
+					directive = COMPILE_DIRECTIVES[stripped]
 
-				if line.startswith('# scriptlet:'):
+				if directive == 'scriptlet':
 					"""
-					Most common command; load a script content in its entirety and integrate it into the parent script
+					Most common command; load a script content in its entirety
+					and integrate it into the parent script
 					
-					The loaded script is parsed and supports its own includes, imports, and so forth.
+					The loaded script is parsed and supports its own includes, imports,
+					and so forth.
 					"""
 					# Check for "# scriptlet:..." replacements
 					in_header = False
 					include = line[12:].strip()
 					line = self._parse_include(self.file, line_number, include)
-				elif line.startswith('# script:'):
+				elif directive == 'script':
 					# Check for "# script:..." replacements
 					in_header = False
 					include = line[9:].strip()
 					line = self._parse_script(self.file, line_number, include)
-				elif line.startswith('import ') and self.type == 'python':
+				elif directive == 'import':
 					in_header = False
 					self._parse_import(line)
 					write = False
-				elif line.startswith('from scriptlets.') and self.type == 'python':
+				elif directive == 'from_scriptlets':
 					in_header = False
 					# Treat this as a scriptlet include
 					# Trim "from scriptlets." off the beginning to get the filename
@@ -272,36 +2512,37 @@ class Script:
 					line = line[:line.index(' import')]
 					line = line.replace('.', '/') + '.py'
 					line = self._parse_include(self.file, line_number, line)
-				elif re.match(r'^from .* import .*', line) and self.type == 'python':
+				elif directive == 'from_import':
 					in_header = False
 					self._parse_import(line)
 					write = False
-				elif line.startswith('# import:') and self.type == 'python':
+				elif directive == 'import_include':
 					in_header = False
 					include = line[9:].strip()
 					line = self._parse_include(self.file, line_number, include)
 					self._parse_import(line)
 					write = False
-				elif line.strip() == '# compile:usage':
+				elif directive == 'usage':
 					in_header = False
 					line = self.generate_usage()
-				elif line.strip() == '# compile:argparse':
+				elif directive == 'argparse':
 					in_header = False
 					line = self.generate_argparse()
-				elif self.type == 'python' and re.match(r'.* = argparse\.ArgumentParser.*', line):
+				elif is_python and ' = argparse.ArgumentParser' in line:
 					in_header = False
 					self._argparser_var = line.split('=')[0].strip()
-				elif in_header and self.type == 'python' and line.strip() == '"""':
+				elif in_header and is_python and stripped == '"""':
 					multiline_header = not multiline_header
-				elif in_header and self.type == 'powershell' and line.strip() == '<#':
+				elif in_header and is_powershell and stripped == '<#':
 					multiline_header = True
-				elif in_header and self.type == 'powershell' and line.strip() == '#>':
+				elif in_header and is_powershell and stripped == '#>':
 					multiline_header = False
 					in_header = False
 
 				if line_number > 1 and in_header and not multiline_header:
-					if self.type == 'python':
-						# Lines that do not start with '"""' indicate that we are no longer in the file header
+					if is_python:
+						# Lines that do not start with '"""' indicate
+						# that we are no longer in the file header
 						in_header = line.startswith('"""') or line.startswith('#')
 					elif not line.startswith('#'):
 						# End of '#' lines indicate an end of the header
@@ -309,124 +2550,117 @@ class Script:
 
 				if in_header:
 					att_start = '\t' if multiline_header else '#  '
+					section = HEADER_SECTION_PATTERN.match(stripped.lower())
+					tag = None
+					if '@' in line:
+						for key, handler in HEADER_TAGS:
+							if key in line:
+								tag = handler
+								break
 
 					# Process header tags
-					if self.title is None and self.type == 'python' and multiline_header and line.strip() != '':
+					if self.title is None and is_python and multiline_header and stripped != '':
 						if line.startswith('"""'):
 							# Allow the title to be placed on the first line of the docstring block
 							t = line[3:].strip()
 							self.title =  t if len(t) > 0 else None
 						else:
-							self.title = line.strip()
-					elif self.title is None and line.strip() != '#' and not multiline_header and line_number > 1:
+							self.title = stripped
+					elif (
+						self.title is None and stripped != '#'
+						and not multiline_header and line_number > 1
+					):
 						self.title = line[1:].strip()
-					elif '@AUTHOR' in line:
-						parse_description = False
-						self._parse_author(line[9:].strip())
-					elif '@SUPPORTS' in line:
-						parse_description = False
-						self._parse_supports(line)
-					elif '@CATEGORY' in line:
-						parse_description = False
-						self.category = line[11:].strip()
-					elif '@TRMM-TIMEOUT' in line:
-						parse_description = False
-						self.trmm_timeout = int(line[15:].strip())
-					elif '@WARLOCK-TITLE' in line:
-						parse_description = False
-						self.warlock_title = line[16:].strip()
-					elif '@WARLOCK-IMAGE' in line:
-						parse_description = False
-						self.warlock_image = line[16:].strip()
-					elif '@WARLOCK-ICON' in line:
+					elif tag is not None:
 						parse_description = False
-						self.warlock_icon = line[15:].strip()
-					elif '@WARLOCK-THUMBNAIL' in line:
+						tag(self, line)
+					elif section is not None:
 						parse_description = False
-						self.warlock_thumbnail = line[20:].strip()
-					elif re.match(r'^(# |\.|)trmm arguments(:|)$', line.lower().strip()):
-						parse_description = False
-						header_section = 'trmm_args'
-					elif re.match(r'^(# |\.|)trmm environment(:|)$', line.lower().strip()):
-						parse_description = False
-						header_section = 'trmm_env'
-					elif re.match(r'^(# |\.|)syntax(:|)$', line.lower().strip()):
-						parse_description = False
-						header_section = 'syntax'
-					elif re.match(r'^(# |\.|)supports(:|)$', line.lower().strip()):
-						parse_description = False
-						header_section = 'supports'
-					elif re.match(r'^(# |\.|)category(:|)$', line.lower().strip()):
-						parse_description = False
-						header_section = 'category'
-					elif re.match(r'^(# |\.|)title(:|)$', line.lower().strip()):
-						parse_description = False
-						header_section = 'title'
-					elif re.match(r'^(# |\.|)draft(:|)$', line.lower().strip()):
-						parse_description = False
-						header_section = 'draft'
-					elif re.match(r'^(# |\.|)author(:|)$', line.lower().strip()):
-						parse_description = False
-						header_section = 'author'
-					elif line[0:len(att_start)] == att_start and header_section == 'trmm_args':
-						self._parse_arg(line)
-					elif line[0:len(att_start)] == att_start and header_section == 'trmm_env':
-						self._parse_env(line)
-					elif line[0:len(att_start)] == att_start and header_section == 'syntax':
-						line = self._parse_syntax(line)
-					elif line[0:len(att_start)] == att_start and header_section == 'supports':
-						self._parse_supports(line)
-					elif line[0:len(att_start)] == att_start and header_section == 'category':
-						self.category = line[1:].strip()
-					elif line[0:len(att_start)] == att_start and header_section == 'title':
-						self.title = line[1:].strip()
-					elif line[0:len(att_start)] == att_start and header_section == 'draft':
-						val = line[1:].strip().lower()
-						self.draft = (val == '1' or val == 'true' or val == 'yes')
-					elif line[0:len(att_start)] == att_start and header_section == 'author':
-						self._parse_author(line[1:].strip())
+						header_section = HEADER_SECTIONS[section.group(1)]
+					elif header_section is not None and line.startswith(att_start):
+						# Handlers may return a replacement for the line
+						replacement = HEADER_SECTION_HANDLERS[header_section](self, line)
+						if replacement is not None:
+							line = replacement
 					elif line.lower().startswith('# category: '):
 						parse_description = False
 						header_section = None
 						self.category = line[12:].strip()
-					elif line.strip() == '#' and header_section is not None:
+					elif stripped == '#' and header_section is not None:
 						header_section = None
 						parse_description = False
-					elif line.strip() == '' and header_section is not None:
+					elif stripped == '' and header_section is not None:
 						header_section = None
 						parse_description = False
 					elif parse_description and line_number > 1:
-						if line.strip() == '#':
+						if stripped == '#':
 							self.description += '\n'
 						else:
 							self.description += line[2:]
 
 				if write:
-					if in_header:
-						self.content_header += line
+					if self._events is not None:
+						self._events.append(('header' if in_header else 'body', line))
+					elif in_header:
+						self.content_header.append(line)
 					else:
-						self.content_body += line
+						self.content_body.append(line)
 
 		# Post-parsing operations
 		self.description = self.description.strip()
 
 	def write(self):
 		"""
-		Write generated script to the filesystem
+		Write generated script to the filesystem, (if it has changed)
 		:return:
 		"""
-		dest_file = 'dist/' + self.file[4:]
-		if not os.path.exists(os.path.dirname(dest_file)):
-			os.makedirs(os.path.dirname(dest_file))
-
 		# Generate the compiled file
-		with open(dest_file, 'w') as dest_f:
-			dest_f.write(self.content_header)
-			if self.type == 'python':
-				dest_f.write('\n'.join(self.imports))
-			dest_f.write(self.content_body)
+		if self.type == 'python':
+			imports = '\n'.join(normalize_python_imports(self.imports))
+			content = ''.join(self.content_header + [imports] + self.content_body)
+		else:
+			content = ''.join(self.content_header + self.content_body)
+		if (
+			self.type in ('python', 'shell') and build_options.tree_shake
+			and not self.is_python_module
+		):
+			content = self._tree_shake(content)
+		if self.type == 'python' and build_options.lazy_imports and not self.is_python_module:
+			content, moved = lazy_import_python(content)
+			if len(moved) > 0:
+				print('Moved imports of %s into the functions using them in %s' % (
+					', '.join(moved), self.file
+				))
 		# Ensure new file is executable
-		os.chmod(dest_file, 0o775)
+		changed = write_if_changed(self.get_dest_file(), content, 0o775)
+
+		outputs = self.get_outputs()
+		if len(outputs) > 1:
+			pyz = build_pyz(content, os.path.basename(outputs[1]), build_options.pyz_optimize)
+			changed = write_if_changed(outputs[1], pyz, 0o775) or changed
+		return changed
+
+	def _tree_shake(self, content: str) -> str:
+		"""
+		Remove functions, (and classes), from included scriptlets which this script never uses
+		:param content:
+		:return:
+		"""
+		extension = '.py' if self.type == 'python' else '.sh'
+		candidates = set()
+		for include in self.scriptlets:
+			if include.endswith(extension):
+				candidates |= scriptlet_cache.get_definitions(include, self.type)
+		# Anything the script defines itself is always kept
+		candidates -= get_definitions(self.file, self.type)
+
+		if self.type == 'python':
+			content, removed = tree_shake_python(content, candidates)
+		else:
+			content, removed = tree_shake_shell(content, candidates)
+		if len(removed) > 0:
+			print('Removed unused %s from %s' % (', '.join(removed), self.file))
+		return content
 
 	def _parse_import(self, line: str):
 		"""
@@ -438,6 +2672,10 @@ class Script:
 		:param line:
 		:return:
 		"""
+		if self._events is not None:
+			self._events.append(('import', line))
+			return
+
 		# import blah
 		if not line.strip() in self.imports:
 			self.imports.append(line.strip())
@@ -463,13 +2701,16 @@ class Script:
 		:return:
 		"""
 		file = os.path.join('scripts', include)
-		if not os.path.exists(file):
+		if file not in self.dependencies:
+			self.dependencies.append(file)
+		if not filesystem.exists(file):
 			print('ERROR - script %s not found' % include)
 			print('  in file %s at line %d' % (src_file, src_line))
 			return '# ERROR - script ' + include + ' not found\n\n'
 
-		out = ''
-		with open(file, 'r') as f:
+		out = []
+		profiler.read(file)
+		with io.StringIO(filesystem.read_text(file)) as f:
 			escape = True
 			for line in f:
 				# Provide options for escaping or not escaping lines
@@ -485,28 +2726,26 @@ class Script:
 				if escape:
 					line = line.replace('$', '\\$')
 					line = line.replace('`', '\\`')
-				out += line
+				out.append(line)
 
-		if not out.endswith('\n'):
-			out += '\n'
-		return out
+		if len(out) == 0 or not out[-1].endswith('\n'):
+			out.append('\n')
+		return ''.join(out)
 
 	def _parse_include(self, src_file: str, src_line: int, include: str):
+		if self._events is not None:
+			# Cached scriptlets defer their includes to the script they are included in
+			return ScriptletInclude(src_file, src_line, include)
+
 		if include not in self.scriptlets:
 			self.scriptlets.append(include)
 			file = os.path.join('scriptlets', include)
-			maybe_download_scriptlet(file, parse_scriptlet_url(include))
-
-			if os.path.exists(file):
-				script = Script(file, self.type)
-				script.scriptlets = self.scriptlets
-				script.imports = self.imports
-				# Parse the source
-				script.parse()
-				# Scripts must end with an empty newline.
-				if not script.content_body.endswith('\n'):
-					script.content_body += '\n'
-				return script.content_header + script.content_body
+			self.dependencies.append(file)
+			profiler.include(include)
+
+			script = scriptlet_cache.get(include, self.type)
+			if script is not None:
+				return script.include_into(self)
 			else:
 				print('ERROR - script %s not found' % include)
 				print('  in file %s at line %d' % (src_file, src_line))
@@ -514,11 +2753,41 @@ class Script:
 		else:
 			return ''
 
+	def include_into(self, parent) -> str:
+		"""
+		Replay the recorded contents of this scriptlet into a parent script
+		and return its compiled content
+		:param parent:
+		:return:
+		"""
+		header = []
+		body = []
+		for section, value in self._events:
+			if isinstance(value, ScriptletInclude):
+				value = value.resolve(parent)
+
+			if section == 'import':
+				parent._parse_import(value)
+			elif section == 'header':
+				header.append(value)
+			elif value != '':
+				body.append(value)
+
+		for dependency in self.dependencies:
+			if dependency not in parent.dependencies:
+				parent.dependencies.append(dependency)
+
+		# Scripts must end with an empty newline.
+		if len(body) == 0 or not body[-1].endswith('\n'):
+			body.append('\n')
+		return ''.join(header + body)
+
 	def _parse_syntax(self, line: str) -> str:
 		"""
 		Parse a syntax line and extract any arguments
 
-		Supports `SOMEVAR=--some-arg` syntax for generating the usage() and parse argument functionality
+		Supports `SOMEVAR=--some-arg` syntax
+		for generating the usage() and parse argument functionality
 
 		:param line:
 		:return:
@@ -763,13 +3032,17 @@ class Script:
 			if arg['type'] == '=':
 				# --version=*) VERSION="${1#*=}"
 				code.append('\t\t%s=*|%s)' % (arg['name'], arg['name']))
-				code.append('\t\t\t[ "$1" == "%s" ] && shift 1 && %s="$1" || %s="${1#*=}"' % (arg['name'], arg['var'], arg['var']))
+				code.append(
+					'\t\t\t[ "$1" == "%s" ] && shift 1 && %s="$1" || %s="${1#*=}"' %
+					(arg['name'], arg['var'], arg['var'])
+				)
 				code.append(
 					'\t\t\t[ "${%s:0:1}" == "\'" ] && [ "${%s:0-1}" == "\'" ] && %s="${%s:1:-1}"' %
 					(arg['var'], arg['var'], arg['var'], arg['var'])
 				)
 				code.append(
-					'\t\t\t[ "${%s:0:1}" == \'"\' ] && [ "${%s:0-1}" == \'"\' ] && %s="${%s:1:-1}"' %
+					'\t\t\t[ "${%s:0:1}" == \'"\' ] && [ "${%s:0-1}" == \'"\' ] '
+					'&& %s="${%s:1:-1}"' %
 					(arg['var'], arg['var'], arg['var'], arg['var'])
 				)
 				code.append('\t\t\t;;')
@@ -798,244 +3071,707 @@ class Script:
 		code.append('')
 		return '\n'.join(code)
 
-	def _generate_argparse_python(self) -> str:
-		code = []
+	def _generate_argparse_python(self) -> str:
+		code = []
+
+		if len(self.syntax_arg_map) == 0 and not self._generated_usage:
+			# No arguments to parse, just return
+			return ''
+
+		code.append('# Parse arguments')
+		for arg in self.syntax_arg_map:
+			fn = self._argparser_var + '.add_argument'
+			comment = arg['comment'].replace("'", "\\'")
+			if arg['var_type'] == 'int':
+				default = int(arg['default'])
+			else:
+				default = "'" + arg['default'].replace("'", "\\'") + "'"
+			code.append(
+				f"{fn}('--{arg['var']}', type={arg['var_type']}, "
+				f"help='{comment}', default={default})"
+			)
+		code.append('')
+		code.append('')
+		return '\n'.join(code)
+
+
+	def __str__(self):
+		return 'Script: %s' % self.file
+
+	def get_dest_file(self) -> str:
+		"""
+		Get the compiled destination of this script within dist/
+		:return:
+		"""
+		return 'dist/' + self.file[4:]
+
+	def get_outputs(self) -> list:
+		"""
+		Get all files written to dist/ for this script, (the compiled destination first)
+		:return:
+		"""
+		outputs = [self.get_dest_file()]
+		if self.type == 'python' and build_options.pyz and not self.is_python_module:
+			outputs.append(outputs[0][:-3] + '.pyz')
+		return outputs
+
+	def get_full_author(self) -> str:
+		if self.author is None:
+			return ''
+		elif self.author['email']:
+			return '%s <%s>' % (self.author['name'], self.author['email'])
+		else:
+			return self.author['name']
+
+	def asdict(self):
+		return {
+			'file': self.file,
+			'title': self.title,
+			'readme': self.readme,
+			'author': self.author,
+			'supports': self.supports,
+			'supports_detailed': self.supports_detailed,
+			'category': self.category,
+			'trmm_timeout': self.trmm_timeout,
+			'guid': self.guid,
+			'syntax': self.syntax,
+			'args': self.args,
+			'env': self.env,
+			'draft': self.draft
+		}
+
+	def as_cache(self) -> dict:
+		"""
+		Get all parsed metadata of this script,
+		(used to restore it from the build cache without re-parsing)
+		:return:
+		"""
+		data = self.asdict()
+		data.update({
+			'repo': self.repo,
+			'type': self.type,
+			'warlock_title': self.warlock_title,
+			'warlock_image': self.warlock_image,
+			'warlock_icon': self.warlock_icon,
+			'warlock_thumbnail': self.warlock_thumbnail,
+			'scriptlets': self.scriptlets,
+			'dependencies': self.dependencies,
+			'syntax_arg_map': self.syntax_arg_map,
+			'description': self.description,
+			'is_python_module': self.is_python_module,
+		})
+		return data
+
+	@classmethod
+	def from_cache(cls, data: dict):
+		"""
+		Restore a script from its cached metadata, as generated by as_cache()
+		:param data:
+		:return:
+		"""
+		script = cls(data['file'], data['type'])
+		for key, value in data.items():
+			setattr(script, key, value)
+		# JSON does not preserve tuples
+		script.supports_detailed = [tuple(x) for x in data['supports_detailed']]
+		return script
+
+	def as_trmm_meta(self):
+		platforms = []
+
+		for platform, distros in TRMM_PLATFORMS:
+			if any([x in self.supports for x in distros]):
+				platforms.append(platform)
+
+		filename = os.path.basename(self.file)
+		# Fix windows-style directory separators
+		filename = filename.replace('\\', '/')
+
+		return {
+			'$schema': 'https://raw.githubusercontent.com/amidaware/community-scripts/main/'
+				'community_scripts.schema.json',
+			'guid': self.guid,
+			'filename': filename,
+			'args': self.args,
+			'env': self.env,
+			'submittedBy': self.get_full_author(),
+			'name': self.title,
+			'syntax': self.syntax,
+			'default_timeout': str(self.trmm_timeout),
+			'shell': self.type,
+			'supported_platforms': platforms,
+			'category': self.category,
+		}
+
+
+def get_compiler_hash() -> str:
+	"""
+	Get the sha256 hash of the compiler itself,
+	(compile.py and every module of the compiler package)
+	:return:
+	"""
+	root = os.path.dirname(os.path.abspath(__file__))
+	h = hashlib.sha256()
+	for file in [__file__] + sorted(glob(os.path.join(root, 'compiler', '*.py'))):
+		h.update(('%s:%s\n' % (os.path.relpath(file, root), hash_file(file))).encode('utf-8'))
+	return h.hexdigest()
+
+
+class BuildCache:
+	"""
+	Persistent record of the inputs used to compile each script
+
+	Every compiled script records the sha256 of its source along with every scriptlet and script
+	pulled in through includes.  On the next build, scripts whose inputs are unchanged
+	are restored from the cache instead of being parsed and written again.
+	"""
+	def __init__(self, path: str = CACHE_DIR):
+		self.path = path
+		self.manifest = os.path.join(path, 'manifest.json')
+		self.metadata = os.path.join(path, 'metadata.json')
+		self.compiler = get_compiler_hash()
+		self.entries = {}
+		self._hashes = {}
+
+	def load(self):
+		"""
+		Load the cache manifest from disk,
+		(if available and generated by this version of the compiler)
+		:return:
+		"""
+		if not os.path.exists(self.manifest):
+			return
+		try:
+			with open(self.manifest, 'r') as f:
+				data = json.load(f)
+		except (OSError, ValueError):
+			print('Build cache is corrupt, ignoring')
+			return
+
+		if data.get('compiler') == self.compiler and data.get('options') == build_options.asdict():
+			self.entries = data.get('scripts', {})
+
+	def save(self):
+		"""
+		Write the cache manifest to disk
+		:return:
+		"""
+		if not os.path.exists(self.path):
+			os.makedirs(self.path)
+		with open(self.manifest, 'w') as f:
+			json.dump(
+				{
+					'compiler': self.compiler,
+					'options': build_options.asdict(),
+					'scripts': self.entries,
+				},
+				f,
+				indent=1
+			)
+
+	def load_metadata(self) -> dict:
+		"""
+		Load the metadata of every script as of the previous build,
+		(regardless of compiler or options)
+		:return: Script metadata, as generated by as_cache(), keyed by source file
+		"""
+		if not os.path.exists(self.metadata):
+			return {}
+		try:
+			with open(self.metadata, 'r') as f:
+				return json.load(f).get('scripts', {})
+		except (OSError, ValueError):
+			print('Metadata index is corrupt, ignoring')
+			return {}
+
+	def save_metadata(self, scripts: list):
+		"""
+		Write the metadata of every script in this build,
+		(used by targeted builds to fill in the other scripts)
+		:param scripts:
+		:return:
+		"""
+		if not os.path.exists(self.path):
+			os.makedirs(self.path)
+		with open(self.metadata, 'w') as f:
+			json.dump({'scripts': {x.file: x.as_cache() for x in scripts}}, f, indent=1)
+
+	def hash(self, filename: str) -> Union[str, None]:
+		"""
+		Get the hash of an input file, (memoized for the duration of the build)
+		:param filename:
+		:return:
+		"""
+		if filename not in self._hashes:
+			self._hashes[filename] = hash_file(filename)
+		return self._hashes[filename]
+
+	def get_inputs(self, script: Script) -> list:
+		"""
+		Get all files which affect the compiled output and metadata of a script
+		:param script:
+		:return:
+		"""
+		inputs = [
+			script.file,
+			os.path.join(os.path.dirname(script.file), 'README.md'),
+		]
+		if script.type == 'python':
+			inputs.append(os.path.join(os.path.dirname(script.file), '__init__.py'))
+		for dependency in script.dependencies:
+			if dependency not in inputs:
+				inputs.append(dependency)
+		return inputs
+
+	def get(self, file: str, type: str, repo: Union[str, None]) -> Union[Script, None]:
+		"""
+		Get a script from the cache if none of its inputs have changed since it was last compiled
+		:param file:
+		:param type:
+		:param repo:
+		:return:
+		"""
+		entry = self.entries.get(file)
+		if entry is None:
+			return None
+
+		script = Script.from_cache(entry['script'])
+		if script.type != type or script.repo != repo:
+			return None
+		for output in script.get_outputs():
+			if not os.path.exists(output):
+				return None
+		for filename, file_hash in entry['inputs'].items():
+			if self.hash(filename) != file_hash:
+				return None
+		return script
+
+	def set(self, script: Script):
+		"""
+		Record a freshly compiled script and the current state of its inputs
+		:param script:
+		:return:
+		"""
+		self.entries[script.file] = {
+			'inputs': {x: self.hash(x) for x in self.get_inputs(script)},
+			'script': script.as_cache(),
+		}
+
+	def prune(self, files: list):
+		"""
+		Drop any cached script not contained in the list of sources
+		:param files:
+		:return:
+		"""
+		for file in list(self.entries.keys()):
+			if file not in files:
+				del self.entries[file]
+
+	def invalidate(self, files: set):
+		"""
+		Forget the memoized hashes of files which have changed since they were hashed
+		:param files:
+		:return:
+		"""
+		for file in files:
+			self._hashes.pop(file, None)
+
+	def get_dependents(self) -> dict:
+		"""
+		Get the reverse include graph; every input file mapped to the scripts compiled from it
+		:return:
+		"""
+		dependents = {}
+		for file, entry in self.entries.items():
+			for input_file in entry['inputs']:
+				dependents.setdefault(os.path.normpath(input_file), []).append(file)
+		return dependents
+
+
+metadata_index = MetadataIndex()
+
+
+def query_main(argv: list):
+	"""
+	Command line interface of compile.py query
+	:param argv:
+	:return:
+	"""
+	parser = argparse.ArgumentParser(
+		prog='compile.py query',
+		description='Search the metadata index of scripts and scriptlet functions, '
+		'(built by every compile)'
+	)
+	parser.add_argument(
+		'text', nargs='*',
+		help='Full-text search over titles, descriptions, and function documentation'
+	)
+	parser.add_argument(
+		'--supports',
+		help='Only scripts supporting this OS, (ie: rocky, debian, windows)'
+	)
+	parser.add_argument('--category', help='Only scripts within this category, (ie: Firewall)')
+	parser.add_argument(
+		'--type', choices=('shell', 'python', 'powershell'),
+		help='Only scripts of this type'
+	)
+	parser.add_argument(
+		'--function',
+		help='Show a scriptlet function and only scripts which include it'
+	)
+	parser.add_argument('--json', action='store_true', help='Print results as JSON')
+	parser.add_argument('--index', default=metadata_index.path, help='Path of the metadata index')
+	options = parser.parse_args(argv)
+
+	try:
+		results = MetadataIndex(options.index).query(
+			' '.join(options.text),
+			options.supports,
+			options.category,
+			options.type,
+			options.function
+		)
+	except (FileNotFoundError, sqlite3.Error) as e:
+		print('ERROR - %s' % e)
+		sys.exit(1)
+
+	if options.json:
+		print(json.dumps(results, indent=4))
+		return
+
+	if len(results['functions']) > 0:
+		print('Functions (%d):' % len(results['functions']))
+		for function in results['functions']:
+			print('  %s %s in %s' % (function['kind'], function['name'], function['scriptlet']))
+			for line in function['doc'].split('\n')[0:3]:
+				print('    %s' % line)
+			print('    included by %d script(s)' % len(function['included_by']))
+		print('')
+
+	print('Scripts (%d):' % len(results['scripts']))
+	for script in results['scripts']:
+		print('  %s' % script['file'])
+		print('    %s / %s, (%s)' % (
+			script['category'] or 'Uncategorized',
+			script['title'] or script['file'],
+			', '.join(script['supports'])
+		))
+
+
+def get_source_repo() -> tuple:
+	"""
+	Determine source repository URL from the local git configuration
+	:return: (source_type, source_repo, repo_url)
+	"""
+	source_type = 'UNKNOWN'
+	source_repo = 'UNKNOWN/TODO'
+	repo_url = 'UNKNOWN'
+	if filesystem.exists('.git/config'):
+		with io.StringIO(filesystem.read_text('.git/config')) as f:
+			for line in f:
+				if line.strip().startswith('url = '):
+					repo_url = line.strip()[6:]
+					if 'github.com' in repo_url:
+						source_type = 'github'
+						source_repo = repo_url.strip()[repo_url.index('github.com') + 11:-4]
+					break
+	return source_type, source_repo, repo_url
+
+
+def parse_scriptlets() -> list:
+	"""
+	Parse all available scriptlets for their function documentation
+	:return:
+	"""
+	scriptlets = []
+	for file in filesystem.glob('scriptlets/**/*.sh'):
+		scriptlet = Scriptlet(file, 'shell')
+		scriptlet.parse()
+		scriptlets.append(scriptlet)
+
+	for file in filesystem.glob('scriptlets/**/*.py'):
+		scriptlet = Scriptlet(file, 'python')
+		scriptlet.parse()
+		scriptlets.append(scriptlet)
+
+	for file in filesystem.glob('scriptlets/**/*.ps1'):
+		scriptlet = Scriptlet(file, 'powershell')
+		scriptlet.parse()
+		scriptlets.append(scriptlet)
+
+	return scriptlets
 
-		if len(self.syntax_arg_map) == 0 and not self._generated_usage:
-			# No arguments to parse, just return
-			return ''
 
-		code.append('# Parse arguments')
-		for arg in self.syntax_arg_map:
-			fn = self._argparser_var + '.add_argument'
-			comment = arg['comment'].replace("'", "\\'")
-			if arg['var_type'] == 'int':
-				default = int(arg['default'])
-			else:
-				default = "'" + arg['default'].replace("'", "\\'") + "'"
-			code.append(f"{fn}('--{arg['var']}', type={arg['var_type']}, help='{comment}', default={default})")
-		code.append('')
-		code.append('')
-		return '\n'.join(code)
+def compile_script(file: str, type: str, repo: Union[str, None]) -> dict:
+	"""
+	Parse and write a single script, returning its metadata
 
+	Used as the unit of work for parallel builds, so the returned data must be picklable.
+	The scriptlet cache hits and misses incurred by this script, and any profiling data,
+	are returned along with the metadata.
 
-	def __str__(self):
-		return 'Script: %s' % self.file
+	:param file:
+	:param type:
+	:param repo:
+	:return:
+	"""
+	hits, misses = scriptlet_cache.hits, scriptlet_cache.misses
+	with profiler.span(file, 'script'):
+		script = Script(file, type)
+		script.repo = repo
+		# Parse the source
+		script.parse()
+		script.write()
+	return (
+		script.as_cache(),
+		scriptlet_cache.hits - hits,
+		scriptlet_cache.misses - misses,
+		profiler.collect()
+	)
 
-	def get_full_author(self) -> str:
-		if self.author is None:
-			return ''
-		elif self.author['email']:
-			return '%s <%s>' % (self.author['name'], self.author['email'])
-		else:
-			return self.author['name']
 
-	def asdict(self):
-		return {
-			'file': self.file,
-			'title': self.title,
-			'readme': self.readme,
-			'author': self.author,
-			'supports': self.supports,
-			'supports_detailed': self.supports_detailed,
-			'category': self.category,
-			'trmm_timeout': self.trmm_timeout,
-			'guid': self.guid,
-			'syntax': self.syntax,
-			'args': self.args,
-			'env': self.env,
-			'draft': self.draft
-		}
+def init_worker(
+	downloaded: set,
+	offline: bool,
+	profile: bool = False,
+	options: Union[dict, None] = None
+):
+	"""
+	Initialize a worker process with the scriptlets already fetched by the parent
+	:param downloaded:
+	:param offline:
+	:param profile:
+	:param options: Build options of the parent
+	:return:
+	"""
+	scriptlet_cache.downloaded.update(downloaded)
+	fetcher.offline = offline
+	if options is not None:
+		build_options.update(options)
+	if profile:
+		profiler.enable()
 
-	def as_trmm_meta(self):
-		# TRMM treats all *nix distros as just "linux"
-		all_platforms = (
-			('linux', ('tux', 'archlinux', 'centos', 'debian', 'fedora', 'linuxmint', 'redhat', 'rocky', 'suse', 'ubuntu')),
-			('macos', ('macos',)),
-			('windows', ('windows',)),
-		)
-		platforms = []
 
-		for platform, distros in all_platforms:
-			if any([x in self.supports for x in distros]):
-				platforms.append(platform)
+def compile_scripts(
+	repo_url: str,
+	cache: Union[BuildCache, None],
+	jobs: int = 1,
+	targets: Union[list, None] = None
+) -> list:
+	"""
+	Parse and compile all script files, skipping any which have not changed since the last build
+	:param repo_url:
+	:param cache: Build cache to skip unchanged scripts with, or None to compile every script
+	:param jobs: Number of worker processes to compile with
+	:param targets: Only compile these source files;
+		every other script is restored from the metadata index
+	:return:
+	"""
+	scripts = []
+	sources = []
+	pending = []
+	index = {}
 
-		filename = os.path.basename(self.file)
-		# Fix windows-style directory separators
-		filename = filename.replace('\\', '/')
+	for file in filesystem.glob('src/**/*.sh'):
+		sources.append((file, 'shell', repo_url))
 
-		return {
-			'$schema': 'https://raw.githubusercontent.com/amidaware/community-scripts/main/community_scripts.schema.json',
-			'guid': self.guid,
-			'filename': filename,
-			'args': self.args,
-			'env': self.env,
-			'submittedBy': self.get_full_author(),
-			'name': self.title,
-			'syntax': self.syntax,
-			'default_timeout': str(self.trmm_timeout),
-			'shell': self.type,
-			'supported_platforms': platforms,
-			'category': self.category,
-		}
+	for file in filesystem.glob('src/**/*.py'):
+		sources.append((file, 'python', None))
 
+	for file in filesystem.glob('src/**/*.ps1'):
+		sources.append((file, 'powershell', None))
 
-# Clean the dist directory
-if os.path.exists('dist'):
-	shutil.rmtree('dist')
+	if targets is not None:
+		targets = [os.path.normpath(x) for x in targets]
+		missing = [x for x in targets if x not in [os.path.normpath(y[0]) for y in sources]]
+		if len(missing) > 0:
+			raise ValueError('Not a script within src/: %s' % ', '.join(missing))
+		with profiler.span('load metadata index', 'phase'):
+			index = cache.load_metadata() if cache is not None else {}
+		# Scripts missing from the index, (ie: added since the previous build), are compiled as well
+		restored = [x for x in sources if os.path.normpath(x[0]) not in targets and x[0] in index]
+		untracked = len(sources) - len(restored) - len(targets)
+		print('Compiling %d target(s), restoring %d script(s) from the metadata index%s' % (
+			len(targets),
+			len(restored),
+			(', compiling %d missing from it' % untracked) if untracked else ''
+		))
+		index = {x[0]: index[x[0]] for x in restored}
 
-scripts = []
-scriptlets = []
+	# Refresh all remote scriptlets up front so the cache sees their current state
+	if filesystem.local:
+		with profiler.span('prefetch scriptlets', 'phase'):
+			scriptlet_cache.downloaded.update(
+				prefetch_scriptlets([(x[0], x[1]) for x in sources if x[0] not in index])
+			)
 
-#s = Script('src/github/linux_install_github_runner.sh', 'shell')
-#s.parse()
-#s.write()
-#pprint(s.asdict())
-#exit(1)
+	with profiler.span('check build cache', 'phase'):
+		for file, type, repo in sources:
+			if file in index:
+				script = Script.from_cache(index[file])
+			else:
+				script = cache.get(file, type, repo) if cache is not None else None
+			if script is None:
+				pending.append((file, type, repo))
+			# Add to stack to update project docs, (pending scripts are filled in once compiled)
+			scripts.append(script)
 
-# Determine source repository URL
-source_type = 'UNKNOWN'
-source_repo = 'UNKNOWN/TODO'
-repo_url = 'UNKNOWN'
-if os.path.exists('.git/config'):
-	with open('.git/config', 'r') as f:
-		for line in f:
-			if line.strip().startswith('url = '):
-				repo_url = line.strip()[6:]
-				if 'github.com' in repo_url:
-					source_type = 'github'
-					source_repo = repo_url.strip()[repo_url.index('github.com') + 11:-4]
-				break
+	with profiler.span('compile scripts', 'phase', scripts=len(pending), jobs=jobs):
+		if jobs > 1 and len(pending) > 1:
+			with ProcessPoolExecutor(
+				max_workers=jobs,
+				initializer=init_worker,
+				initargs=(
+					scriptlet_cache.downloaded,
+					fetcher.offline,
+					profiler.enabled,
+					build_options.asdict()
+				)
+			) as executor:
+				results = list(executor.map(compile_script, *zip(*pending)))
+			# Workers each have their own scriptlet cache; merge their statistics into this process
+			for data, hits, misses, profile in results:
+				scriptlet_cache.hits += hits
+				scriptlet_cache.misses += misses
+		else:
+			results = [compile_script(*x) for x in pending]
 
-for file in glob('scriptlets/**/*.sh', recursive=True):
-	scriptlet = Scriptlet(file, 'shell')
-	scriptlet.parse()
-	scriptlets.append(scriptlet)
+	# Profiling data is handed back with each result,
+	# (including serial builds, as it is taken on collection)
+	for result in results:
+		profiler.merge(result[3])
 
-for file in glob('scriptlets/**/*.py', recursive=True):
-	scriptlet = Scriptlet(file, 'python')
-	scriptlet.parse()
-	scriptlets.append(scriptlet)
+	# Merge the compiled results back into the stack in their original order
+	results.reverse()
+	for i in range(len(scripts)):
+		if scripts[i] is None:
+			scripts[i] = Script.from_cache(results.pop()[0])
+			if cache is not None:
+				cache.set(scripts[i])
 
-for file in glob('scriptlets/**/*.ps1', recursive=True):
-	scriptlet = Scriptlet(file, 'powershell')
-	scriptlet.parse()
-	scriptlets.append(scriptlet)
-
-# Parse and compile any script files
-for file in glob('src/**/*.sh', recursive=True):
-	script = Script(file, 'shell')
-	script.repo = repo_url
-	# Parse the source
-	script.parse()
-	script.write()
-	# Add to stack to update project docs
-	scripts.append(script)
-
-for file in glob('src/**/*.py', recursive=True):
-	script = Script(file, 'python')
-	# Parse the source
-	script.parse()
-	script.write()
-	# Add to stack to update project docs
-	scripts.append(script)
-
-for file in glob('src/**/*.ps1', recursive=True):
-	script = Script(file, 'powershell')
-	# Parse the source
-	script.parse()
-	script.write()
-	# Add to stack to update project docs
-	scripts.append(script)
-
-# Locate and copy any README files
-for file in glob('src/**/README.md', recursive=True):
-	print('Copying README %s' % file)
-	dest_file = 'dist/' + file[4:]
-	if not os.path.exists(os.path.dirname(dest_file)):
-		os.makedirs(os.path.dirname(dest_file))
-
-	shutil.copy(file, dest_file)
-
-# Generate list of scripts for the README, sorted by category and then title
-scripts.sort(key=lambda x: '-'.join([x.category if x.category else 'ZZZ', x.title if x.title else x.file]))
-scripts_table = []
-scripts_table.append('| Category / Script | Supports |')
-scripts_table.append('|-------------------|----------|')
-for script in scripts:
-	if script.draft:
-		continue
-	if script.is_python_module:
-		continue
-	title = script.title if script.title else script.file
-	readme = script.readme if script.readme else None
-	if readme is not None:
+	if cache is not None:
+		cache.prune([x[0] for x in sources])
+	return scripts
+
+
+def copy_readmes() -> list:
+	"""
+	Locate and copy any README files
+	:return: List of copied files
+	"""
+	copied = []
+	for file in filesystem.glob('src/**/README.md'):
+		print('Copying README %s' % file)
+		dest_file = 'dist/' + file[4:]
+		profiler.read(file)
+		write_if_changed(dest_file, filesystem.read(file), filesystem.mode(file))
+		copied.append(dest_file)
+	return copied
+
+
+def generate_readme(scripts: list, scriptlets: list):
+	"""
+	Generate the project README from the template with the list of scripts and scriptlets
+	:param scripts:
+	:param scriptlets:
+	:return:
+	"""
+	# Generate list of scripts for the README, sorted by category and then title
+	scripts.sort(key=lambda x: '-'.join([
+		x.category if x.category else 'ZZZ',
+		x.title if x.title else x.file
+	]))
+	scripts_table = []
+	scripts_table.append('| Category / Script | Supports |')
+	scripts_table.append('|-------------------|----------|')
+	for script in scripts:
+		if script.draft:
+			continue
+		if script.is_python_module:
+			continue
+		title = script.title if script.title else script.file
+		readme = script.readme if script.readme else None
+		if readme is not None:
+			# Fix windows-style directory separators
+			readme = readme.replace('\\', '/')
+			# Swap src/ with dist/ for the href target,
+			# (folks usually want to see the compiled version, not the source)
+			readme = readme.replace('src/', 'dist/')
+			# Markdown-ify it
+			readme = '[![README](.supplemental/images/icons/readme.svg "README")](%s)' % readme
+		else:
+			readme = ''
+
+		href = script.file
 		# Fix windows-style directory separators
-		readme = readme.replace('\\', '/')
-		# Swap src/ with dist/ for the href target, (folks usually want to see the compiled version, not the source)
-		readme = readme.replace('src/', 'dist/')
-		# Markdown-ify it
-		readme = '[![README](.supplemental/images/icons/readme.svg "README")](%s)' % readme
-	else:
-		readme = ''
-
-	href = script.file
-	# Fix windows-style directory separators
-	href = href.replace('\\', '/')
-	# Swap src/ with dist/ for the href target, (folks usually want to see the compiled version, not the source)
-	href = href.replace('src/', 'dist/')
-
-	if script.type == 'shell':
-		type = '![Bash/Shell](.supplemental/images/icons/bash.svg "Bash/Shell")'
-	elif script.type == 'powershell':
-		type = '![PowerShell](.supplemental/images/icons/powershell.svg "PowerShell")'
-	elif script.type == 'python':
-		type = '![Python](.supplemental/images/icons/python.svg "Python")'
-	else:
-		type = script.type[0].upper() + script.type[1:]
-
-	category = script.category if script.category else 'Uncategorized'
-	os_support = []
-	supported = script.supports_detailed
-	supported.sort(key = lambda x: x[0])
-	for support in supported:
-		os_support.append('![%s](.supplemental/images/icons/%s.svg "%s")' % (support[0], support[0], support[1]))
-	scripts_table.append('| %s [%s / %s](%s) %s | %s |' % (type, category, title, href, readme, ' '.join(os_support)))
-
-# Iterate through scriptlets to generate documentation about the included scriptlet functions available
-scriptlets_text = ''
-for scriptlet in scriptlets:
-	scriptlets_text += '### [%s](%s)\n\n' % (scriptlet.name[11:], scriptlet.name)
-	scriptlets_text += 'To include this scriptlet:\n\n'
-
-	if scriptlet.type == 'shell':
-		scriptlets_text += '```bash\n# scriptlet:%s\n```\n\n' % scriptlet.name[11:]
-	elif scriptlet.type == 'powershell':
-		scriptlets_text += '```powershell\n# scriptlet:%s\n```\n\n' % scriptlet.name[11:]
-	elif scriptlet.type == 'python':
-		scriptlets_text += '```python\n# from scriptlets.%s import *\n```\n\n' % scriptlet.name[11:-3].replace('/', '.')
-	#if scriptlet.description:
-	#	scriptlets_text += '%s\n\n' % scriptlet.description
-	if len(scriptlet.functions) > 0:
-		for function in scriptlet.functions:
-			scriptlets_text += '#### function %s:\n\n%s\n\n' % (function.name, function.body.strip())
-		scriptlets_text += '\n'
-
-if os.path.exists('.supplemental/README-template.md'):
-	replacements = {
-		'%%SCRIPTS_TABLE%%': '\n'.join(scripts_table),
-		'%%SCRIPTLETS%%': scriptlets_text
-	}
-	with open('.supplemental/README-template.md', 'r') as f:
-		template = f.read()
+		href = href.replace('\\', '/')
+		# Swap src/ with dist/ for the href target,
+		# (folks usually want to see the compiled version, not the source)
+		href = href.replace('src/', 'dist/')
+
+		if script.type == 'shell':
+			type = '![Bash/Shell](.supplemental/images/icons/bash.svg "Bash/Shell")'
+		elif script.type == 'powershell':
+			type = '![PowerShell](.supplemental/images/icons/powershell.svg "PowerShell")'
+		elif script.type == 'python':
+			type = '![Python](.supplemental/images/icons/python.svg "Python")'
+		else:
+			type = script.type[0].upper() + script.type[1:]
+
+		category = script.category if script.category else 'Uncategorized'
+		os_support = []
+		supported = script.supports_detailed
+		supported.sort(key = lambda x: x[0])
+		for support in supported:
+			os_support.append('![%s](.supplemental/images/icons/%s.svg "%s")' % (
+				support[0], support[0], support[1]
+			))
+		scripts_table.append('| %s [%s / %s](%s) %s | %s |' % (
+			type, category, title, href, readme, ' '.join(os_support)
+		))
+
+	# Iterate through scriptlets to generate documentation
+	# about the included scriptlet functions available
+	scriptlets_text = ''
+	for scriptlet in scriptlets:
+		scriptlets_text += '### [%s](%s)\n\n' % (scriptlet.name[11:], scriptlet.name)
+		scriptlets_text += 'To include this scriptlet:\n\n'
+
+		if scriptlet.type == 'shell':
+			scriptlets_text += '```bash\n# scriptlet:%s\n```\n\n' % scriptlet.name[11:]
+		elif scriptlet.type == 'powershell':
+			scriptlets_text += '```powershell\n# scriptlet:%s\n```\n\n' % scriptlet.name[11:]
+		elif scriptlet.type == 'python':
+			module = scriptlet.name[11:-3].replace('/', '.')
+			scriptlets_text += '```python\n# from scriptlets.%s import *\n```\n\n' % module
+		#if scriptlet.description:
+		#	scriptlets_text += '%s\n\n' % scriptlet.description
+		if len(scriptlet.functions) > 0:
+			for function in scriptlet.functions:
+				scriptlets_text += '#### %s %s:\n\n%s\n\n' % (
+					function.type, function.name, function.body.strip()
+				)
+			scriptlets_text += '\n'
+
+	if filesystem.exists('.supplemental/README-template.md'):
+		replacements = {
+			'%%SCRIPTS_TABLE%%': '\n'.join(scripts_table),
+			'%%SCRIPTLETS%%': scriptlets_text
+		}
+		profiler.read('.supplemental/README-template.md')
+		template = filesystem.read_text('.supplemental/README-template.md')
 		for key, value in replacements.items():
 			template = template.replace(key, value)
 
-	with open('README.md', 'w') as f:
-		f.write(template)
+		write_if_changed('README.md', template)
 
-# Generate TRMM metafile
-with open('dist/community_scripts.json', 'w') as f:
+
+def generate_trmm_meta(scripts: list):
+	"""
+	Generate TRMM metafile
+	:param scripts:
+	:return:
+	"""
 	meta = []
 	for script in scripts:
 		if script.draft:
@@ -1044,11 +3780,88 @@ with open('dist/community_scripts.json', 'w') as f:
 			continue
 		data = script.as_trmm_meta()
 		data['filename'] = script.file[4:]
+		# Fingerprint of the compiled script, so consumers only need to push scripts which changed
+		dest = script.get_dest_file()
+		content = filesystem.read(dest) if filesystem.exists(dest) else b''
+		data['sha256'] = hashlib.sha256(content).hexdigest()
+		data['size'] = len(content)
 		meta.append(data)
-	f.write(json.dumps(meta, indent=4))
 
-# Generate Warlock metafile
-with open('dist/warlock.yaml', 'w') as f:
+	previous = None
+	if filesystem.exists('dist/community_scripts.json'):
+		profiler.read('dist/community_scripts.json')
+		try:
+			previous = json.loads(filesystem.read_text('dist/community_scripts.json'))
+		except ValueError:
+			print(
+				'WARNING - Unable to parse previous dist/community_scripts.json, '
+				'treating all scripts as added'
+			)
+
+	write_if_changed('dist/community_scripts.json', json.dumps(meta, indent=4))
+	# A rebuild without changes, (including every rebuild in --watch),
+	# keeps the delta of the last one with changes
+	changes = get_trmm_changes(previous, meta)
+	if any([len(x) > 0 for x in changes.values()]):
+		write_if_changed('dist/changes.json', json.dumps(changes, indent=4))
+
+
+def get_trmm_changes(previous: Union[list, None], meta: list) -> dict:
+	"""
+	Get the scripts added, changed, and removed between two TRMM metafiles, keyed by GUID
+
+	An entry is changed when its compiled content, (sha256), or any of its metadata differs;
+	entries from metafiles generated before content hashes were recorded are always considered
+	changed.
+
+	:param previous: Previous contents of community_scripts.json,
+		or None if there was no previous build
+	:param meta: New contents of community_scripts.json
+	:return:
+	"""
+	old = {x['guid']: x for x in (previous or []) if isinstance(x, dict) and 'guid' in x}
+	new = {x['guid']: x for x in meta}
+	changes = {'added': [], 'changed': [], 'removed': []}
+
+	for guid, data in new.items():
+		entry = {
+			'guid': guid,
+			'filename': data['filename'],
+			'sha256': data['sha256'],
+			'size': data['size'],
+		}
+		if guid not in old:
+			changes['added'].append(entry)
+			continue
+
+		fields = sorted([
+			key for key in set(data) | set(old[guid]) if data.get(key) != old[guid].get(key)
+		])
+		if fields:
+			entry['previous_sha256'] = old[guid].get('sha256')
+			entry['fields'] = fields
+			changes['changed'].append(entry)
+
+	for guid, data in old.items():
+		if guid not in new:
+			changes['removed'].append({
+				'guid': guid,
+				'filename': data.get('filename'),
+				'sha256': data.get('sha256'),
+			})
+
+	return changes
+
+
+def generate_warlock_meta(scripts: list, source_type: str, source_repo: str):
+	"""
+	Generate Warlock metafile
+	:param scripts:
+	:param source_type:
+	:param source_repo:
+	:return:
+	"""
+	f = io.StringIO()
 	for script in scripts:
 		if script.warlock_title is not None:
 			f.write('- guid: %s\n' % script.guid)
@@ -1066,6 +3879,639 @@ with open('dist/warlock.yaml', 'w') as f:
 				f.write('    - "%s"\n' % syntax)
 			f.write('  image: %s\n' % (script.warlock_image if script.warlock_image else ''))
 			f.write('  icon: %s\n' % (script.warlock_icon if script.warlock_icon else ''))
-			f.write('  thumbnail: %s\n' % (script.warlock_thumbnail if script.warlock_thumbnail else ''))
+			f.write('  thumbnail: %s\n' % (
+				script.warlock_thumbnail if script.warlock_thumbnail else ''
+			))
 			f.write('\n')
+	write_if_changed('dist/warlock.yaml', f.getvalue())
+
+
+def write_outputs(scripts: list, scriptlets: list, source_type: str, source_repo: str) -> list:
+	"""
+	Copy READMEs and generate the project README, TRMM, and Warlock metafiles
+
+	Files are only rewritten when their content changes.
+
+	:param scripts:
+	:param scriptlets:
+	:param source_type:
+	:param source_repo:
+	:return: All files in dist/ produced by the build
+	"""
+	outputs = []
+	for script in scripts:
+		outputs += script.get_outputs()
+	with profiler.span('copy readmes', 'phase'):
+		outputs += copy_readmes()
+	with profiler.span('generate readme', 'phase'):
+		generate_readme(scripts, scriptlets)
+	with profiler.span('generate trmm', 'phase'):
+		generate_trmm_meta(scripts)
+	with profiler.span('generate warlock', 'phase'):
+		generate_warlock_meta(scripts, source_type, source_repo)
+	outputs += ['dist/community_scripts.json', 'dist/changes.json', 'dist/warlock.yaml']
+	return outputs
+
+
+class BuildResult:
+	"""
+	Compiled scripts, scriptlet documentation, and outputs of a build, as returned by compile_tree()
+	"""
+	def __init__(self, fs: FileSystem, scripts: list, scriptlets: list, outputs: list):
+		self.filesystem = fs
+		"""
+		Filesystem the build was written to
+		"""
+		self.scripts = scripts
+		"""
+		Metadata of every compiled script
+		"""
+		self.scriptlets = scriptlets
+		"""
+		Functions and documentation of every scriptlet
+		"""
+		self.outputs = outputs
+		"""
+		All files in dist/ produced by the build
+		"""
+		self.source_type = 'UNKNOWN'
+		self.source_repo = 'UNKNOWN/TODO'
+		self.repo_url = 'UNKNOWN'
+
+	def read(self, path: str) -> bytes:
+		"""
+		Read a file produced by the build, (ie: dist/ufw/linux_install_ufw.sh)
+		:param path:
+		:return:
+		"""
+		return self.filesystem.read(path)
+
+	def get_files(self) -> dict:
+		"""
+		Get the content of every file produced by the build, keyed by path
+		:return:
+		"""
+		return {x: self.filesystem.read(x) for x in self.outputs}
+
+	def get_script(self, file: str) -> Union[Script, None]:
+		"""
+		Get a compiled script by its source file, (ie: src/ufw/linux_install_ufw.sh)
+		:param file:
+		:return:
+		"""
+		for script in self.scripts:
+			if os.path.normpath(script.file) == os.path.normpath(file):
+				return script
+		return None
+
+	def get_trmm_meta(self) -> list:
+		"""
+		Get the TRMM metadata of every script, (as written to community_scripts.json)
+		:return:
+		"""
+		return json.loads(self.filesystem.read('dist/community_scripts.json'))
+
+
+def compile_tree(
+	src: Union[str, dict] = 'src',
+	scriptlets: Union[str, dict] = 'scriptlets',
+	options: Union[BuildOptions, dict, None] = None,
+	fs: Union[FileSystem, None] = None,
+	cache: Union[BuildCache, None] = None,
+	jobs: int = 1,
+	targets: Union[list, None] = None
+) -> BuildResult:
+	"""
+	Compile a tree of scripts and scriptlets, returning the compiled outputs and metadata
+
+	By default everything is compiled in memory; src and scriptlets are only read,
+	and nothing is written to dist/, (read the outputs from the returned BuildResult).
+	Remote scriptlets are not fetched when compiling in memory.
+
+	The filesystem and options are swapped in for the duration of the build and always restored
+	afterwards, (even if the build fails); builds from multiple threads run one at a time.
+
+	Example:
+
+		result = compile_tree('src', 'scriptlets', {'tree_shake': True})
+		print(result.read('dist/ufw/linux_install_ufw.sh').decode())
+
+		result = compile_tree(
+			{'demo/linux_hello.sh': '...'},
+			{'_common/hello.sh': 'hello() { echo hi; }\\n'}
+		)
+
+	:param src: Directory of scripts, or a dictionary of their content keyed by path within src/
+	:param scriptlets: Directory of scriptlets,
+		or a dictionary of their content keyed by path within scriptlets/
+	:param options: Build options,
+		(BuildOptions or a dictionary of them), or None to use the current options
+	:param fs: Filesystem to compile with, (src and scriptlets are mounted into it unless they are
+		the defaults); None to compile in memory with src and scriptlets always mounted
+	:param cache: Build cache, (only supported when compiling on local disk)
+	:param jobs: Number of worker processes, (only supported when compiling on local disk)
+	:param targets: Only compile these source files, restoring every other script from the metadata
+		index of the previous build, (requires the build cache)
+	:return:
+	"""
+	global filesystem
+
+	if fs is None:
+		# Directories on disk are only read; every output is kept in memory
+		fs = MemoryFileSystem()
+		fs.mount('src', src)
+		fs.mount('scriptlets', scriptlets)
+	else:
+		if src != 'src':
+			fs.mount('src', src)
+		if scriptlets != 'scriptlets':
+			fs.mount('scriptlets', scriptlets)
+	if not fs.local and (cache is not None or jobs > 1):
+		raise ValueError(
+			'The build cache and worker processes are only supported when compiling on local disk'
+		)
+
+	with build_lock:
+		previous_filesystem = filesystem
+		previous_options = build_options.asdict()
+		try:
+			filesystem = fs
+			if options is not None:
+				if isinstance(options, BuildOptions):
+					options = options.asdict()
+				build_options.update(options)
+			return _compile_tree(fs, cache, jobs, targets)
+		finally:
+			filesystem = previous_filesystem
+			vars(build_options).clear()
+			build_options.update(previous_options)
+
+
+def _compile_tree(
+	fs: FileSystem,
+	cache: Union[BuildCache, None],
+	jobs: int,
+	targets: Union[list, None]
+) -> BuildResult:
+	"""
+	Build with the global filesystem and options already swapped in by compile_tree()
+	:param fs:
+	:param cache:
+	:param jobs:
+	:param targets:
+	:return:
+	"""
+	source_type, source_repo, repo_url = get_source_repo()
+
+	with profiler.span('parse scriptlets', 'phase'):
+		parsed_scriptlets = parse_scriptlets()
+	scripts = compile_scripts(repo_url, cache, jobs, targets)
+	if repo_url == 'UNKNOWN' and any([x.type == 'shell' for x in scripts]):
+		print('WARNING - No git remote found in .git/config')
+		print(
+			'  GUIDs of shell scripts are derived from the repository URL '
+			'and will differ from the published ones'
+		)
+	if cache is not None:
+		with profiler.span('save build cache', 'phase'):
+			cache.save()
+			cache.save_metadata(scripts)
+		with profiler.span('update metadata index', 'phase'):
+			metadata_index.update(scripts, parsed_scriptlets, cache)
+	print('Scriptlet cache: %d hits, %d misses' % (scriptlet_cache.hits, scriptlet_cache.misses))
+
+	outputs = write_outputs(scripts, parsed_scriptlets, source_type, source_repo)
+
+	result = BuildResult(fs, scripts, parsed_scriptlets, outputs)
+	result.source_type = source_type
+	result.source_repo = source_repo
+	result.repo_url = repo_url
+	return result
+
+
+def find_duplicate_definitions(content: str, type: str) -> dict:
+	"""
+	Find functions, (and classes for Python),
+	defined more than once at the top level of a compiled script
+
+	Usually the sign of two included scriptlets defining the same name,
+	where the last one silently wins.
+
+	:param content:
+	:param type:
+	:return: Line numbers of every definition, keyed by each name defined more than once
+	"""
+	definitions = {}
+	if type == 'python':
+		try:
+			tree = ast.parse(content)
+		except SyntaxError:
+			return {}
+		for node in tree.body:
+			if isinstance(node, PYTHON_DEFINITIONS):
+				definitions.setdefault(node.name, []).append(node.lineno)
+	elif type == 'shell':
+		heredoc = None
+		for i, line in enumerate(content.splitlines()):
+			if heredoc is not None:
+				if line.strip() == heredoc:
+					heredoc = None
+				continue
+			match = SHELL_FUNCTION.match(line)
+			if match is not None:
+				definitions.setdefault(match.group(1), []).append(i + 1)
+			heredoc_match = SHELL_HEREDOC.search(line)
+			if heredoc_match is not None and not line.lstrip().startswith('#'):
+				heredoc = heredoc_match.group(1)
+	elif type == 'powershell':
+		for i, line in enumerate(content.splitlines()):
+			match = POWERSHELL_FUNCTION.match(line)
+			if match is not None and not line[0].isspace():
+				definitions.setdefault(match.group(1).lower(), []).append(i + 1)
+
+	return {name: lines for name, lines in definitions.items() if len(lines) > 1}
+
+
+def verify_output(file: str) -> dict:
+	"""
+	Check a compiled script for syntax errors, includes which could not be resolved,
+	and duplicate definitions
+
+	Python is compiled, (as per py_compile, without writing bytecode),
+	and shell scripts are checked with bash -n;
+	PowerShell is only checked for includes and duplicate definitions.
+
+	:param file:
+	:return: File, type, time taken in seconds, and the list of errors found
+	"""
+	type = SOURCE_TYPES[os.path.splitext(file)[1]]
+	errors = []
+	with profiler.span(file, 'verify'):
+		start = time.perf_counter()
+		content = filesystem.read(file)
+		text = content.decode('utf-8', errors='replace')
+
+		for i, line in enumerate(text.splitlines()):
+			if line.startswith('# ERROR - '):
+				errors.append('line %d: %s' % (i + 1, line[2:]))
+
+		if type == 'python':
+			try:
+				compile(text, file, 'exec', dont_inherit=True)
+			except (SyntaxError, ValueError) as e:
+				errors.append('line %s: %s' % (
+					getattr(e, 'lineno', '?'), getattr(e, 'msg', str(e))
+				))
+		elif type == 'shell' and shutil.which('bash') is not None:
+			proc = subprocess.run(['bash', '-n'], input=content, capture_output=True)
+			if proc.returncode != 0:
+				for line in proc.stderr.decode('utf-8', errors='replace').splitlines():
+					errors.append(line[6:] if line.startswith('bash: ') else line)
+
+		for name, lines in find_duplicate_definitions(text, type).items():
+			errors.append('%s is defined %d times, (lines %s)' % (
+				name, len(lines), ', '.join([str(x) for x in lines])
+			))
+
+		seconds = time.perf_counter() - start
+	return {'file': file, 'type': type, 'seconds': seconds, 'errors': errors}
+
+
+def verify_outputs(outputs: list, workers: Union[int, None] = None) -> list:
+	"""
+	Verify every compiled script within a list of outputs concurrently
+	:param outputs: Files produced by the build, (anything other than compiled scripts is skipped)
+	:param workers: Number of threads,
+		(defaults to the number of cores plus 4, as most time is spent in bash)
+	:return: Result of each file, as per verify_output()
+	"""
+	files = [x for x in outputs if os.path.splitext(x)[1] in SOURCE_TYPES and filesystem.exists(x)]
+	if workers is None:
+		workers = min(32, (os.cpu_count() or 1) + 4)
+	with ThreadPoolExecutor(max_workers=workers) as executor:
+		return list(executor.map(verify_output, files))
+
+
+def print_verify_report(results: list, seconds: float, top: int = 10) -> bool:
+	"""
+	Print the slowest files to verify and every error found
+	:param results: As returned by verify_outputs()
+	:param seconds: Wall time of the verification
+	:param top: Number of slowest files to list
+	:return: True if any errors were found
+	"""
+	failed = [x for x in results if len(x['errors']) > 0]
+	print('')
+	print('Verified %d scripts in %.2fs, (%.2fs of checks), %d with errors' % (
+		len(results), seconds, sum([x['seconds'] for x in results]), len(failed)
+	))
+	if shutil.which('bash') is None:
+		print('WARNING - bash is not available, shell scripts were not checked for syntax errors')
+
+	if len(results) > 0:
+		print('')
+		print('| Slowest to verify                                    | Type       | Time (ms) |')
+		print('|------------------------------------------------------|------------|-----------|')
+		for result in sorted(results, key=lambda x: x['seconds'], reverse=True)[:top]:
+			print('| %-52s | %-10s | %9.1f |' % (
+				result['file'], result['type'], result['seconds'] * 1000
+			))
+
+	for result in failed:
+		print('')
+		print('ERROR - %s' % result['file'])
+		for error in result['errors']:
+			print('  %s' % error)
+	return len(failed) > 0
+
+
+def rebuild_changed(
+	changed: set,
+	scripts: list,
+	scriptlets: list,
+	cache: BuildCache,
+	source_type: str,
+	source_repo: str,
+	repo_url: str,
+	verify: bool = True
+) -> tuple:
+	"""
+	Recompile only the scripts affected by a set of changed files,
+	(as found via the reverse include graph)
+	:param changed: Changed, added, or removed files
+	:param scripts: Scripts of the previous build
+	:param scriptlets: Scriptlets of the previous build
+	:param cache:
+	:param source_type:
+	:param source_repo:
+	:param repo_url:
+	:param verify: Verify the rebuilt scripts
+	:return: (scripts, scriptlets) of this build
+	"""
+	cache.invalidate(changed)
+	dependents = cache.get_dependents()
+	by_file = {os.path.normpath(x.file): x for x in scripts}
+	affected = set()
+	removed = set()
+	for file in changed:
+		affected |= set([os.path.normpath(x) for x in dependents.get(file, [])])
+		extension = os.path.splitext(file)[1]
+		if file.startswith('src' + os.sep) and extension in SOURCE_TYPES:
+			affected.add(file)
+
+	for file in sorted(affected):
+		if not os.path.exists(file):
+			removed.add(file)
+			by_file.pop(file, None)
+			continue
+		type = SOURCE_TYPES[os.path.splitext(file)[1]]
+		data = compile_script(file, type, repo_url if type == 'shell' else None)[0]
+		by_file[file] = Script.from_cache(data)
+		cache.set(by_file[file])
+
+	# Scriptlet documentation is only needed for the README; refresh it if any scriptlet changed
+	if any([x.startswith('scriptlets' + os.sep) for x in changed]):
+		scriptlets = parse_scriptlets()
+
+	cache.prune(list(by_file.keys()))
+	cache.save()
+
+	scripts = list(by_file.values())
+	cache.save_metadata(scripts)
+	metadata_index.update(scripts, scriptlets, cache)
+	outputs = write_outputs(scripts, scriptlets, source_type, source_repo)
+	if len(removed) > 0:
+		prune_dist(outputs)
+	print('Rebuilt %d script(s), %d removed' % (len(affected) - len(removed), len(removed)))
+
+	rebuilt = []
+	for file in affected - removed:
+		rebuilt += by_file[file].get_outputs()
+	if verify:
+		start = time.perf_counter()
+		print_verify_report(verify_outputs(rebuilt), time.perf_counter() - start, 5)
+	return scripts, scriptlets
+
+
+def watch(
+	scripts: list,
+	scriptlets: list,
+	cache: BuildCache,
+	source_type: str,
+	source_repo: str,
+	repo_url: str,
+	poll: bool = False,
+	interval: float = 1.0,
+	verify: bool = True
+):
+	"""
+	Keep running and rebuild affected outputs whenever sources, scriptlets, or scripts change
+	:param scripts:
+	:param scriptlets:
+	:param cache:
+	:param source_type:
+	:param source_repo:
+	:param repo_url:
+	:param poll:
+	:param interval:
+	:param verify: Verify rebuilt scripts
+	:return:
+	"""
+	watcher = create_watcher(poll, interval)
+	print('Watching %s for changes, (Ctrl+C to stop)' % ', '.join(WATCH_PATHS))
+	try:
+		while True:
+			changed = watcher.wait()
+			print('')
+			print('Changed: %s' % ', '.join(sorted(changed)))
+			try:
+				scripts, scriptlets = rebuild_changed(
+					changed, scripts, scriptlets, cache, source_type, source_repo, repo_url, verify
+				)
+			except Exception as e:
+				# Keep watching; the file is likely mid-edit
+				print('ERROR - rebuild failed: %s' % e)
+	except KeyboardInterrupt:
+		print('')
+		print('Stopped watching')
+
+
+def main():
+	if sys.argv[1:2] == ['query']:
+		query_main(sys.argv[2:])
+		return
+
+	parser = argparse.ArgumentParser(
+		prog='compile.py',
+		description='Compile scripts and scriptlets into single distributable files')
+	parser.add_argument(
+		'targets', nargs='*', metavar='SCRIPT',
+		help='Only compile these scripts, (ie: src/ufw/linux_install_ufw.sh), '
+		'updating their entries in the README and metafiles'
+	)
+	parser.add_argument(
+		'--force', action='store_true',
+		help='Ignore the build cache and recompile every script'
+	)
+	parser.add_argument(
+		'-j', '--jobs', type=int, default=1,
+		help='Number of worker processes to compile scripts with, (0 to use all available cores)'
+	)
+	parser.add_argument(
+		'--resolve', action='append', metavar='INCLUDE',
+		help='Print which source and cache path would serve a scriptlet include, (does not compile)'
+	)
+	parser.add_argument(
+		'--graph', metavar='FILE',
+		help='Save the include graph of every script as JSON, (or DOT if FILE ends with .dot), '
+		'(does not compile)'
+	)
+	parser.add_argument(
+		'--who-includes', action='append', metavar='INCLUDE',
+		help='Print which scripts include a scriptlet, directly or via other scriptlets, '
+		'(does not compile)'
+	)
+	parser.add_argument(
+		'--no-verify', action='store_true',
+		help='Skip checking compiled scripts for syntax errors, missing includes, '
+		'and duplicate definitions'
+	)
+	parser.add_argument(
+		'--update-lock', action='store_true',
+		help='Retrieve the current revision of every remote scriptlet '
+		'and pin them in scriptlets.lock before building'
+	)
+	parser.add_argument(
+		'--offline', action='store_true',
+		help='Never touch the network; use local and previously downloaded scriptlets only'
+	)
+	parser.add_argument(
+		'--tree-shake', action='store_true',
+		help='Drop functions and classes of included Python scriptlets '
+		'which are never used by the script'
+	)
+	parser.add_argument(
+		'--lazy-imports', action='store_true',
+		help='Move imports of heavy standard library modules into the functions which use them, '
+		'(Python only)'
+	)
+	parser.add_argument(
+		'--pyz', action='store_true',
+		help='Also write each Python script as a zipapp with precompiled bytecode, '
+		'(dist/.../script.pyz)'
+	)
+	parser.add_argument(
+		'--pyz-optimize', type=int, default=2, choices=(0, 1, 2),
+		help='Optimization level of the bytecode within zipapps, (as per python -O)'
+	)
+	parser.add_argument(
+		'--watch', action='store_true',
+		help='After building, keep running and rebuild only the outputs affected by each change'
+	)
+	parser.add_argument(
+		'--poll', action='store_true',
+		help='Poll for changes with --watch instead of using inotify, (ie: on network filesystems)'
+	)
+	parser.add_argument(
+		'--poll-interval', type=float, default=1.0, metavar='SECONDS',
+		help='Seconds between polls for changes with --watch'
+	)
+	parser.add_argument(
+		'--profile', nargs='?', const='', metavar='FILE',
+		help='Print where the build spends its time, optionally saving a Chrome trace-event file'
+	)
+	parser.add_argument(
+		'--profile-top', type=int, default=10, metavar='N',
+		help='Number of slowest scripts and most included scriptlets to list with --profile'
+	)
+	options = parser.parse_args()
+
+	fetcher.offline = options.offline
+	build_options.tree_shake = options.tree_shake
+	build_options.lazy_imports = options.lazy_imports
+	build_options.pyz = options.pyz
+	build_options.pyz_optimize = options.pyz_optimize
+	if options.profile is not None:
+		profiler.enable()
+
+	if options.resolve:
+		for include in options.resolve:
+			print('\n'.join(resolver.describe(include)))
+			print('')
+		return
+
+	if options.graph or options.who_includes:
+		graph = build_include_graph()
+		for include in (options.who_includes or []):
+			print('\n'.join(who_includes(graph, include)))
+			print('')
+		if options.graph:
+			with open(options.graph, 'w') as f:
+				if options.graph.endswith('.dot'):
+					f.write(include_graph_as_dot(graph))
+				else:
+					json.dump(graph, f, indent=1)
+			print_include_sizes(graph, options.profile_top)
+			print('')
+			print('Include graph saved to %s' % options.graph)
+		return
+
+	if options.update_lock:
+		if options.offline:
+			print('ERROR - --update-lock requires network access, (remove --offline)')
+			sys.exit(1)
+		sources = []
+		for extension, type in SOURCE_TYPES.items():
+			sources += [(x, type) for x in filesystem.glob('src/**/*' + extension)]
+		with profiler.span('update scriptlets.lock', 'phase'):
+			scriptlet_lock.update(sources)
+
+	cache = BuildCache()
+	if not options.force:
+		with profiler.span('load build cache', 'phase'):
+			cache.load()
+
+	jobs = options.jobs if options.jobs > 0 else (os.cpu_count() or 1)
+	try:
+		result = compile_tree(
+			fs=filesystem, cache=cache, jobs=jobs, targets=options.targets or None
+		)
+	except ValueError as e:
+		print('ERROR - %s' % e)
+		sys.exit(1)
+
+	# Remove anything left over from scripts which no longer exist
+	with profiler.span('prune dist', 'phase'):
+		prune_dist(result.outputs)
+
+	failed = False
+	if not options.no_verify:
+		start = time.perf_counter()
+		with profiler.span('verify outputs', 'phase'):
+			results = verify_outputs(result.outputs)
+		failed = print_verify_report(results, time.perf_counter() - start, options.profile_top)
+
+	if profiler.enabled:
+		profiler.print_summary(options.profile_top)
+		if options.profile:
+			profiler.save(options.profile, options.profile_top)
+			print('')
+			print(
+				'Trace saved to %s, (open in chrome://tracing or https://ui.perfetto.dev)'
+				% options.profile
+			)
+
+	if options.watch:
+		watch(
+			result.scripts, result.scriptlets, cache,
+			result.source_type, result.source_repo, result.repo_url,
+			options.poll, options.poll_interval, not options.no_verify
+		)
+	elif failed:
+		print('')
+		print('ERROR - verification failed, (see above)')
+		sys.exit(1)
+
 
+if __name__ == '__main__':
+	main()
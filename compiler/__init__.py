@@ -0,0 +1,37 @@
+"""
+Build subsystems of compile.py
+
+compile.py holds the build itself, (parsing, including, and writing outputs), and the global state
+swapped by compile_tree(); the modules here do not depend on that state
+and are re-exported by compile.py.
+"""
+
+
+CACHE_DIR = '.compile-cache'
+"""
+Directory used to store the incremental build cache, (relative to the project root)
+"""
+
+
+SOURCE_TYPES = {
+	'.sh': 'shell',
+	'.py': 'python',
+	'.ps1': 'powershell',
+}
+"""
+Script type of each compilable file extension
+"""
+
+
+TRMM_PLATFORMS = (
+	('linux', (
+		'tux', 'archlinux', 'centos', 'debian', 'fedora',
+		'linuxmint', 'redhat', 'rocky', 'suse', 'ubuntu'
+	)),
+	('macos', ('macos',)),
+	('windows', ('windows',)),
+)
+"""
+Platforms as known to TRMM and the supported OS aliases within each;
+TRMM treats all *nix distros as just "linux"
+"""
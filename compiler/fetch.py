@@ -0,0 +1,168 @@
+"""
+Scriptlet downloads over keep-alive connections
+"""
+import hashlib
+import http.client
+import os
+import ssl
+import threading
+import urllib.parse
+from typing import Union
+
+
+def get_etag_path(filename: str) -> str:
+	"""
+	Get the file storing the ETag of a downloaded file;
+	it is in the same directory but with '.etag.(filename)' instead.
+	:param filename:
+	:return:
+	"""
+	return os.path.join(os.path.dirname(filename), '.etag.' + os.path.basename(filename))
+
+
+def hash_file(filename: str) -> Union[str, None]:
+	"""
+	Get the sha256 hash of a file, or None if the file does not exist
+	:param filename:
+	:return:
+	"""
+	if not os.path.isfile(filename):
+		return None
+
+	h = hashlib.sha256()
+	with open(filename, 'rb') as f:
+		for chunk in iter(lambda: f.read(65536), b''):
+			h.update(chunk)
+	return h.hexdigest()
+
+
+class ScriptletFetcher:
+	"""
+	Download scriptlets over a small pool of keep-alive connections
+
+	Each worker thread keeps one persistent connection per host, so a batch of scriptlets
+	costs one connection setup per thread instead of one per file.
+	Conditional requests reuse the '.etag.(filename)' files stored next to each scriptlet.
+	"""
+	def __init__(self, workers: int = 4, timeout: int = 5):
+		self.workers = workers
+		self.timeout = timeout
+		self.offline = False
+		"""
+		Set to True to never touch the network; previously downloaded files are used as-is
+		"""
+		self.context = ssl.create_default_context()
+		self._local = threading.local()
+
+	def _get_connection(self, scheme: str, host: str):
+		"""
+		Get the keep-alive connection to a host for the current thread
+		:param scheme:
+		:param host:
+		:return:
+		"""
+		if not hasattr(self._local, 'connections'):
+			self._local.connections = {}
+
+		key = (scheme, host)
+		if key not in self._local.connections:
+			if scheme == 'https':
+				conn = http.client.HTTPSConnection(host, timeout=self.timeout, context=self.context)
+			else:
+				conn = http.client.HTTPConnection(host, timeout=self.timeout)
+			self._local.connections[key] = conn
+		return self._local.connections[key]
+
+	def _close_connection(self, scheme: str, host: str):
+		conn = self._local.connections.pop((scheme, host), None)
+		if conn is not None:
+			conn.close()
+
+	def request(self, url: str, headers: dict, redirects: int = 5) -> tuple:
+		"""
+		Perform a GET request and return the status, ETag, and body of the response
+		:param url:
+		:param headers:
+		:param redirects: Maximum number of redirects to follow
+		:return:
+		"""
+		status, etag, body, location = self._request(url, headers)
+		while status in (301, 302, 303, 307, 308) and location and redirects > 0:
+			redirects -= 1
+			target = urllib.parse.urljoin(url, location)
+			status, etag, body, location = self._request(target, headers)
+		return status, etag, body
+
+	def _request(self, url: str, headers: dict) -> tuple:
+		parts = urllib.parse.urlsplit(url)
+		path = parts.path + ('?' + parts.query if parts.query else '')
+
+		# A pooled connection may have been closed by the server since its last use, so retry once
+		for attempt in range(2):
+			conn = self._get_connection(parts.scheme, parts.netloc)
+			try:
+				conn.request('GET', path, headers=headers)
+				response = conn.getresponse()
+				body = response.read()
+				etag = response.getheader('ETag', '')
+				return response.status, etag, body, response.getheader('Location')
+			except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+				self._close_connection(parts.scheme, parts.netloc)
+				if attempt == 1:
+					raise
+			except Exception:
+				self._close_connection(parts.scheme, parts.netloc)
+				raise
+
+	def fetch(self, filename: str, url: Union[str, None], conditional: bool = True) -> bool:
+		"""
+		Check if a scriptlet is already downloaded AND has not been modified.
+
+		If modified or doesn't exist, attempt to download the file and store the cache tag.
+
+		Returns True if successful or no download required.
+		Returns False if unsuccessful.
+
+		:param filename:
+		:param url:
+		:param conditional: Set to False to always download the file, (ignoring the stored ETag)
+		:return:
+		"""
+		if url is None:
+			return False
+
+		if self.offline:
+			if os.path.exists(filename):
+				return True
+			print('Could not download %s, (offline)' % filename)
+			return False
+
+		etag_path = get_etag_path(filename)
+		headers = {}
+		if conditional and os.path.exists(etag_path) and os.path.exists(filename):
+			with open(etag_path, 'r') as f:
+				etag = f.read().strip()
+				headers['If-None-Match'] = etag
+
+		# Try to auto-download scripts from the repository
+		os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+		try:
+			status, etag, body = self.request(url, headers)
+		except Exception:
+			print('Could not download %s' % filename)
+			return False
+
+		if status == 304:
+			return True
+		elif status != 200:
+			print('Could not download %s, (HTTP %d)' % (filename, status))
+			return False
+
+		with open(filename, 'wb') as f:
+			f.write(body)
+		# Store the ETag for future caching
+		with open(etag_path, 'w') as f:
+			f.write(etag)
+		print('Downloaded %s' % filename)
+		return True
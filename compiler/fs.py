@@ -0,0 +1,310 @@
+"""
+Filesystems a build reads its sources from and writes its outputs to
+"""
+import itertools
+import os
+import re
+import stat
+import tempfile
+from glob import glob
+from typing import Union
+
+
+class FileSystem:
+	"""
+	Files the compiler reads sources from and writes outputs to
+
+	Paths are always relative to the project root, (ie: src/..., scriptlets/..., dist/...).
+	Remote scriptlets are only fetched when compiling on local disk.
+	"""
+	local = False
+	"""
+	Set if paths are real files in the working directory,
+	(required for the build cache, worker processes, and downloads)
+	"""
+
+	def exists(self, path: str) -> bool:
+		"""
+		Check if a file exists
+		:param path:
+		:return:
+		"""
+		raise NotImplementedError()
+
+	def isdir(self, path: str) -> bool:
+		"""
+		Check if a directory exists
+		:param path:
+		:return:
+		"""
+		raise NotImplementedError()
+
+	def read(self, path: str) -> bytes:
+		"""
+		Read the contents of a file, raising FileNotFoundError if it does not exist
+		:param path:
+		:return:
+		"""
+		raise NotImplementedError()
+
+	def read_text(self, path: str) -> str:
+		"""
+		Read the contents of a text file, with all line endings translated to \\n,
+		(as per open() in text mode)
+		:param path:
+		:return:
+		"""
+		return self.read(path).decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+	def write(self, path: str, content: bytes, mode: int = 0o664) -> bool:
+		"""
+		Write a file only if its content differs from the current content
+		:param path:
+		:param content:
+		:param mode: Permissions of the written file
+		:return: True if the file was written, False if it was already up to date
+		"""
+		raise NotImplementedError()
+
+	def size(self, path: str) -> int:
+		"""
+		Get the size of a file in bytes
+		:param path:
+		:return:
+		"""
+		raise NotImplementedError()
+
+	def mode(self, path: str) -> int:
+		"""
+		Get the permissions of a file
+		:param path:
+		:return:
+		"""
+		raise NotImplementedError()
+
+	def signature(self, path: str) -> tuple:
+		"""
+		Get a value which changes whenever a file is modified, (used to key in-process caches)
+		:param path:
+		:return:
+		"""
+		raise NotImplementedError()
+
+	def glob(self, pattern: str) -> list:
+		"""
+		Find all files matching a pattern, (with ** matching any number of directories)
+
+		Results are sorted, so every build processes files in the same order
+		regardless of the underlying filesystem.
+
+		:param pattern:
+		:return:
+		"""
+		raise NotImplementedError()
+
+	def mount(self, prefix: str, source):
+		"""
+		Make a directory on disk, a dictionary of files, or another FileSystem
+		available under a path prefix
+		:param prefix:
+		:param source:
+		:return:
+		"""
+		raise ValueError('%s does not support mounting %s' % (type(self).__name__, prefix))
+
+
+class DiskFileSystem(FileSystem):
+	"""
+	Files on disk, relative to a root directory, (the working directory by default)
+	"""
+	def __init__(self, root: str = '.'):
+		self.root = root
+		self.local = root == '.'
+
+	def path(self, path: str) -> str:
+		"""
+		Get the real path of a file on disk
+		:param path:
+		:return:
+		"""
+		return path if self.root == '.' else os.path.join(self.root, path)
+
+	def exists(self, path: str) -> bool:
+		return os.path.isfile(self.path(path))
+
+	def isdir(self, path: str) -> bool:
+		return os.path.isdir(self.path(path))
+
+	def read(self, path: str) -> bytes:
+		with open(self.path(path), 'rb') as f:
+			return f.read()
+
+	def write(self, path: str, content: bytes, mode: int = 0o664) -> bool:
+		"""
+		Write a file only if its content differs from what is already on disk
+
+		Changed files are written to a temporary file in the same directory and renamed over
+		the destination, so readers and sync tools never see a partially written file.
+
+		:param path:
+		:param content:
+		:param mode: Permissions of the written file
+		:return: True if the file was written, False if it was already up to date
+		"""
+		dest_file = self.path(path)
+		if os.path.isfile(dest_file) and os.path.getsize(dest_file) == len(content):
+			with open(dest_file, 'rb') as f:
+				if f.read() == content:
+					if stat.S_IMODE(os.stat(dest_file).st_mode) != mode:
+						os.chmod(dest_file, mode)
+					return False
+
+		dest_dir = os.path.dirname(dest_file) or '.'
+		os.makedirs(dest_dir, exist_ok=True)
+		fd, tmp_file = tempfile.mkstemp(
+			dir=dest_dir, prefix='.' + os.path.basename(dest_file) + '.', suffix='.tmp'
+		)
+		try:
+			with os.fdopen(fd, 'wb') as f:
+				f.write(content)
+			os.chmod(tmp_file, mode)
+			os.replace(tmp_file, dest_file)
+		except BaseException:
+			if os.path.exists(tmp_file):
+				os.remove(tmp_file)
+			raise
+		return True
+
+	def size(self, path: str) -> int:
+		return os.path.getsize(self.path(path))
+
+	def mode(self, path: str) -> int:
+		return stat.S_IMODE(os.stat(self.path(path)).st_mode)
+
+	def signature(self, path: str) -> tuple:
+		stats = os.stat(self.path(path))
+		return os.path.abspath(self.path(path)), stats.st_mtime_ns, stats.st_size
+
+	def glob(self, pattern: str) -> list:
+		if self.root == '.':
+			return sorted(glob(pattern, recursive=True))
+		matches = glob(self.path(pattern), recursive=True)
+		return sorted([os.path.relpath(x, self.root) for x in matches])
+
+
+class MemoryFileSystem(FileSystem):
+	"""
+	Files held in memory, optionally backed by directories on disk mounted under a prefix
+
+	Mounted directories are only ever read;
+	every write, (including outputs in dist/), is kept in memory.
+	"""
+	_versions = itertools.count(1)
+	"""
+	Shared by every instance, so signatures are never reused for different content
+	"""
+
+	def __init__(self, files: Union[dict, None] = None):
+		self.files = {}
+		"""
+		Content of every file written or added, keyed by path
+		"""
+		self.modes = {}
+		self.versions = {}
+		self.mounts = {}
+		for path, content in (files or {}).items():
+			self._set(path, content, 0o664)
+
+	def _set(self, path: str, content: Union[str, bytes], mode: int):
+		if isinstance(content, str):
+			content = content.encode('utf-8')
+		self.files[path] = content
+		self.modes[path] = mode
+		self.versions[path] = next(self._versions)
+
+	def _find_mount(self, path: str) -> tuple:
+		"""
+		Get the mounted filesystem containing a path, and the path within it
+		:param path:
+		:return: (FileSystem, path), or (None, None) if the path is not within a mount
+		"""
+		for prefix, fs in self.mounts.items():
+			if path.startswith(prefix + '/'):
+				return fs, path[len(prefix) + 1:]
+		return None, None
+
+	def mount(self, prefix: str, source):
+		prefix = prefix.strip('/')
+		if isinstance(source, dict):
+			for path, content in source.items():
+				self._set(prefix + '/' + path.replace('\\', '/'), content, 0o664)
+		elif isinstance(source, str):
+			self.mounts[prefix] = DiskFileSystem(source)
+		else:
+			self.mounts[prefix] = source
+
+	def exists(self, path: str) -> bool:
+		if path in self.files:
+			return True
+		fs, sub = self._find_mount(path)
+		return fs is not None and fs.exists(sub)
+
+	def isdir(self, path: str) -> bool:
+		path = path.rstrip('/')
+		if path in self.mounts or any([x.startswith(path + '/') for x in self.files]):
+			return True
+		fs, sub = self._find_mount(path)
+		return fs is not None and fs.isdir(sub)
+
+	def read(self, path: str) -> bytes:
+		if path in self.files:
+			return self.files[path]
+		fs, sub = self._find_mount(path)
+		if fs is None:
+			raise FileNotFoundError(path)
+		return fs.read(sub)
+
+	def write(self, path: str, content: bytes, mode: int = 0o664) -> bool:
+		if self.files.get(path) == content:
+			self.modes[path] = mode
+			return False
+		self._set(path, content, mode)
+		return True
+
+	def size(self, path: str) -> int:
+		return len(self.read(path))
+
+	def mode(self, path: str) -> int:
+		if path in self.files:
+			return self.modes[path]
+		fs, sub = self._find_mount(path)
+		return fs.mode(sub)
+
+	def signature(self, path: str) -> tuple:
+		if path in self.files:
+			return self.versions[path], len(self.files[path])
+		fs, sub = self._find_mount(path)
+		return fs.signature(sub)
+
+	def glob(self, pattern: str) -> list:
+		regex = ''
+		parts = pattern.split('/')
+		for i, part in enumerate(parts):
+			if part == '**':
+				regex += '(?:[^/]+/)*'
+				continue
+			regex += ''.join([
+				'[^/]*' if c == '*' else '[^/]' if c == '?' else re.escape(c) for c in part
+			])
+			if i < len(parts) - 1:
+				regex += '/'
+		regex = re.compile(regex + r'\Z')
+
+		matches = [x for x in self.files if regex.match(x)]
+		for prefix, fs in self.mounts.items():
+			if pattern.startswith(prefix + '/'):
+				for path in fs.glob(pattern[len(prefix) + 1:]):
+					path = prefix + '/' + path.replace(os.sep, '/')
+					if path not in self.files:
+						matches.append(path)
+		return sorted(matches)
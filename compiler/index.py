@@ -0,0 +1,289 @@
+"""
+SQLite metadata index of scripts and scriptlet functions, (searched with compile.py query)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Union
+
+from compiler import CACHE_DIR, TRMM_PLATFORMS
+
+
+class MetadataIndex:
+	"""
+	SQLite index of the metadata of every script and the functions of every scriptlet
+
+	Refreshed after every build;
+	only files whose inputs changed since the last refresh are rewritten,
+	(every file is rewritten when the compiler itself changes).
+	Titles, descriptions, categories, syntax, and function documentation are full-text searchable.
+	"""
+	SCHEMA = (
+		'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)',
+		'CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, kind TEXT NOT NULL, sha256 TEXT)',
+		'CREATE TABLE IF NOT EXISTS scripts ('
+		'file TEXT PRIMARY KEY, guid TEXT, type TEXT, title TEXT, category TEXT, description TEXT, '
+		'author TEXT, trmm_timeout INTEGER, draft INTEGER, is_python_module INTEGER, data TEXT)',
+		'CREATE TABLE IF NOT EXISTS supports (file TEXT NOT NULL, alias TEXT, name TEXT)',
+		'CREATE INDEX IF NOT EXISTS supports_alias ON supports (alias)',
+		'CREATE TABLE IF NOT EXISTS includes (file TEXT NOT NULL, scriptlet TEXT NOT NULL)',
+		'CREATE INDEX IF NOT EXISTS includes_scriptlet ON includes (scriptlet)',
+		'CREATE TABLE IF NOT EXISTS functions ('
+		'scriptlet TEXT NOT NULL, type TEXT, name TEXT, kind TEXT, doc TEXT)',
+		'CREATE INDEX IF NOT EXISTS functions_name ON functions (name)',
+		'CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5(path UNINDEXED, name, content)',
+	)
+
+	def __init__(self, path: str = os.path.join(CACHE_DIR, 'index.sqlite')):
+		self.path = path
+
+	def connect(self) -> sqlite3.Connection:
+		"""
+		Open the index, creating its tables if necessary
+		:return:
+		"""
+		if os.path.dirname(self.path):
+			os.makedirs(os.path.dirname(self.path), exist_ok=True)
+		db = sqlite3.connect(self.path)
+		db.row_factory = sqlite3.Row
+		for statement in self.SCHEMA:
+			db.execute(statement)
+		return db
+
+	def _delete(self, db: sqlite3.Connection, path: str):
+		for table, column in (
+			('files', 'path'), ('scripts', 'file'), ('supports', 'file'),
+			('includes', 'file'), ('functions', 'scriptlet'), ('search', 'path')
+		):
+			db.execute('DELETE FROM %s WHERE %s = ?' % (table, column), (path,))
+
+	def _add_script(self, db: sqlite3.Connection, script):
+		data = script.as_cache()
+		db.execute(
+			'INSERT INTO scripts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+			(
+				script.file, script.guid, script.type, script.title, script.category,
+				script.description, script.get_full_author(), script.trmm_timeout,
+				int(script.draft), int(script.is_python_module), json.dumps(data)
+			)
+		)
+		db.executemany(
+			'INSERT INTO supports VALUES (?, ?, ?)',
+			[(script.file, x[0], x[1]) for x in script.supports_detailed]
+		)
+		db.executemany(
+			'INSERT INTO includes VALUES (?, ?)',
+			[(script.file, os.path.join('scriptlets', x)) for x in script.scriptlets]
+		)
+		content = '\n'.join([x for x in [script.description, script.category] + script.syntax if x])
+		db.execute(
+			'INSERT INTO search VALUES (?, ?, ?)', (script.file, script.title or '', content)
+		)
+
+	def _add_scriptlet(self, db: sqlite3.Connection, scriptlet):
+		for function in scriptlet.functions:
+			doc = function.body.strip()
+			db.execute(
+				'INSERT INTO functions VALUES (?, ?, ?, ?, ?)',
+				(scriptlet.name, scriptlet.type, function.name, function.type, doc)
+			)
+			db.execute(
+				'INSERT INTO search VALUES (?, ?, ?)', (scriptlet.name, function.name, doc)
+			)
+
+	def update(self, scripts: list, scriptlets: list, cache):
+		"""
+		Refresh the index with the scripts and scriptlets of a build
+		:param scripts:
+		:param scriptlets:
+		:param cache: Build cache of the build, (provides the inputs and hashes of each file)
+		:return:
+		"""
+		current = {}
+		for script in scripts:
+			# Included scriptlets contribute to the metadata, (ie: the list of includes),
+			# so they're part of the hash, as is the repository GUIDs of shell scripts derive from
+			inputs = ['repo:%s' % script.repo]
+			inputs += ['%s:%s' % (x, cache.hash(x)) for x in cache.get_inputs(script)]
+			sha256 = hashlib.sha256('\n'.join(inputs).encode('utf-8')).hexdigest()
+			current[script.file] = ('script', sha256, script)
+		for scriptlet in scriptlets:
+			current[scriptlet.name] = ('scriptlet', cache.hash(scriptlet.name), scriptlet)
+
+		try:
+			db = self.connect()
+			try:
+				with db:
+					updated, removed = self._refresh(db, current, cache.compiler)
+			finally:
+				db.close()
+		except sqlite3.Error as e:
+			# The index only serves compile.py query, (ie: SQLite may be built without FTS5),
+			# so never fail the build
+			print('WARNING - Unable to update the metadata index %s, skipping: %s' % (self.path, e))
+			return
+		print('Metadata index: %d updated, %d removed' % (updated, removed))
+
+	def _refresh(self, db: sqlite3.Connection, current: dict, compiler: str) -> tuple:
+		"""
+		Rewrite every file of the index whose hash changed, and drop files no longer built
+		:param db:
+		:param current: Kind, hash, and script or scriptlet of every file, keyed by path
+		:param compiler: Hash of the compiler; the whole index is rewritten when it changes
+		:return: Number of files updated and removed
+		"""
+		row = db.execute("SELECT value FROM meta WHERE key = 'compiler'").fetchone()
+		if row is None or row['value'] != compiler:
+			for table in ('files', 'scripts', 'supports', 'includes', 'functions', 'search'):
+				db.execute('DELETE FROM %s' % table)
+			db.execute("INSERT OR REPLACE INTO meta VALUES ('compiler', ?)", (compiler,))
+
+		stored = {x['path']: x['sha256'] for x in db.execute('SELECT path, sha256 FROM files')}
+		removed = [x for x in stored if x not in current]
+		for path in removed:
+			self._delete(db, path)
+
+		updated = 0
+		for path, (kind, sha256, item) in current.items():
+			if stored.get(path) == sha256:
+				continue
+			updated += 1
+			self._delete(db, path)
+			db.execute('INSERT INTO files VALUES (?, ?, ?)', (path, kind, sha256))
+			if kind == 'script':
+				self._add_script(db, item)
+			else:
+				self._add_scriptlet(db, item)
+		return updated, len(removed)
+
+	def query(
+		self,
+		text: Union[str, None] = None,
+		supports: Union[str, None] = None,
+		category: Union[str, None] = None,
+		type: Union[str, None] = None,
+		function: Union[str, None] = None
+	) -> dict:
+		"""
+		Find scripts and scriptlet functions; every given filter must match
+		:param text: Full-text search over titles, descriptions, categories, syntax,
+			and function documentation
+		:param supports: OS alias or name, (ie: rocky or "Rocky 9");
+			scripts supporting all of Linux match any distro
+		:param category: Category of the script, (case-insensitive)
+		:param type: Script or scriptlet type, (shell, python, or powershell)
+		:param function: Name of a scriptlet function;
+			scripts including the scriptlet which defines it match
+		:return: Matching 'scripts' and 'functions'
+		"""
+		if not os.path.exists(self.path):
+			raise FileNotFoundError('%s does not exist, run compile.py to build it' % self.path)
+
+		match = None
+		if text:
+			# Quote every term so punctuation in the search is not parsed as FTS syntax
+			match = ' '.join(['"%s"' % x.replace('"', '""') for x in text.split()])
+
+		where = []
+		params = []
+		if supports:
+			aliases = [supports.lower()]
+			if supports.lower() in dict(TRMM_PLATFORMS)['linux']:
+				aliases.append('tux')
+			where.append(
+				'file IN (SELECT file FROM supports WHERE alias IN (%s) OR name LIKE ?)'
+				% ', '.join(['?'] * len(aliases))
+			)
+			params += aliases + [supports + '%']
+		if category:
+			where.append('category = ? COLLATE NOCASE')
+			params.append(category)
+		if type:
+			where.append('type = ?')
+			params.append(type)
+		if function:
+			where.append(
+				'file IN (SELECT i.file FROM includes i '
+				'JOIN functions f ON f.scriptlet = i.scriptlet WHERE f.name = ?)'
+			)
+			params.append(function)
+		if match:
+			where.append('file IN (SELECT path FROM search WHERE search MATCH ?)')
+			params.append(match)
+
+		results = {'scripts': [], 'functions': []}
+		db = self.connect()
+		try:
+			sql = 'SELECT * FROM scripts'
+			if where:
+				sql += ' WHERE ' + ' AND '.join(where)
+			for row in db.execute(sql + ' ORDER BY category, title', params):
+				data = json.loads(row['data'])
+				results['scripts'].append({
+					'file': row['file'],
+					'guid': row['guid'],
+					'type': row['type'],
+					'title': row['title'],
+					'category': row['category'],
+					'description': row['description'],
+					# Multiple aliases share the same name,
+					# (ie: debian and ubuntu are both Debian-All)
+					'supports': list(dict.fromkeys([x[1] for x in data['supports_detailed']])),
+					'syntax': data['syntax'],
+					'env': data['env'],
+					'trmm_timeout': row['trmm_timeout'],
+				})
+
+			# Functions are only listed when searched for, (only the type filter applies to them)
+			if function or match:
+				results['functions'] = self._query_functions(db, match, type, function)
+		finally:
+			db.close()
+		return results
+
+	def _query_functions(
+		self,
+		db: sqlite3.Connection,
+		match: Union[str, None],
+		type: Union[str, None],
+		function: Union[str, None]
+	) -> list:
+		"""
+		Find scriptlet functions, along with the scripts which include each one
+		:param db:
+		:param match: FTS5 query of the full-text search
+		:param type:
+		:param function:
+		:return:
+		"""
+		where = []
+		params = []
+		if type:
+			where.append('type = ?')
+			params.append(type)
+		if function:
+			where.append('name = ?')
+			params.append(function)
+		if match:
+			where.append(
+				'rowid IN (SELECT f.rowid FROM functions f '
+				'JOIN search s ON s.path = f.scriptlet AND s.name = f.name WHERE search MATCH ?)'
+			)
+			params.append(match)
+
+		functions = []
+		sql = 'SELECT * FROM functions WHERE %s ORDER BY scriptlet, name' % ' AND '.join(where)
+		for row in db.execute(sql, params):
+			included_by = db.execute(
+				'SELECT file FROM includes WHERE scriptlet = ? ORDER BY file', (row['scriptlet'],)
+			)
+			functions.append({
+				'scriptlet': row['scriptlet'],
+				'type': row['type'],
+				'name': row['name'],
+				'kind': row['kind'],
+				'doc': row['doc'],
+				'included_by': [x['file'] for x in included_by],
+			})
+		return functions
@@ -0,0 +1,147 @@
+"""
+Change detection of the source directories for --watch
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+
+WATCH_PATHS = ('src', 'scriptlets', 'scripts')
+"""
+Directories watched for changes with --watch
+"""
+
+
+class PollingWatcher:
+	"""
+	Detect changed files by periodically comparing the modification time and size of every file
+	"""
+	def __init__(self, paths: tuple = WATCH_PATHS, interval: float = 1.0):
+		self.paths = paths
+		self.interval = interval
+		self.snapshot = self._scan()
+
+	def _scan(self) -> dict:
+		snapshot = {}
+		for path in self.paths:
+			for root, dirs, files in os.walk(path):
+				for file in files:
+					file = os.path.normpath(os.path.join(root, file))
+					try:
+						stats = os.stat(file)
+					except OSError:
+						continue
+					snapshot[file] = (stats.st_mtime_ns, stats.st_size)
+		return snapshot
+
+	def wait(self) -> set:
+		"""
+		Block until files change, then return the set of changed, added, and removed files
+		:return:
+		"""
+		while True:
+			time.sleep(self.interval)
+			snapshot = self._scan()
+			changed = set([x for x in snapshot if self.snapshot.get(x) != snapshot[x]])
+			changed |= set([x for x in self.snapshot if x not in snapshot])
+			self.snapshot = snapshot
+			if len(changed) > 0:
+				return changed
+
+
+class InotifyWatcher:
+	"""
+	Detect changed files with Linux inotify, (via libc, no third party packages required)
+
+	Raises OSError if inotify is not available on this system.
+	"""
+	IN_CLOSE_WRITE = 0x00000008
+	IN_MOVED_FROM = 0x00000040
+	IN_MOVED_TO = 0x00000080
+	IN_CREATE = 0x00000100
+	IN_DELETE = 0x00000200
+	IN_Q_OVERFLOW = 0x00004000
+	IN_ISDIR = 0x40000000
+	MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+	def __init__(self, paths: tuple = WATCH_PATHS, settle: float = 0.2):
+		if not sys.platform.startswith('linux'):
+			raise OSError('inotify is only available on Linux')
+		self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+		self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+		if self.fd < 0:
+			raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+		self.settle = settle
+		"""
+		Seconds without further events before a batch of changes is returned,
+		(editors often write in several steps)
+		"""
+		self.paths = paths
+		self.watches = {}
+		for path in paths:
+			self._add_tree(path)
+
+	def _add_tree(self, path: str):
+		for root, dirs, files in os.walk(path):
+			wd = self.libc.inotify_add_watch(self.fd, os.path.normpath(root).encode(), self.MASK)
+			if wd < 0:
+				raise OSError(ctypes.get_errno(), 'inotify_add_watch failed for %s' % root)
+			self.watches[wd] = os.path.normpath(root)
+
+	def _read(self) -> set:
+		changed = set()
+		data = os.read(self.fd, 65536)
+		offset = 0
+		while offset < len(data):
+			wd, mask, cookie, length = struct.unpack_from('iIII', data, offset)
+			name = data[offset + 16:offset + 16 + length].rstrip(b'\0').decode()
+			offset += 16 + length
+			if mask & self.IN_Q_OVERFLOW:
+				# Events were lost; report everything as changed
+				for path in self.paths:
+					changed |= set(PollingWatcher((path,)).snapshot.keys())
+				continue
+			if wd not in self.watches:
+				continue
+			path = os.path.join(self.watches[wd], name)
+			if mask & self.IN_ISDIR:
+				if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+					# Watch new directories, and pick up anything written before the watch was added
+					self._add_tree(path)
+					changed |= set(PollingWatcher((path,)).snapshot.keys())
+			else:
+				changed.add(os.path.normpath(path))
+		return changed
+
+	def wait(self) -> set:
+		"""
+		Block until files change, then return the set of changed, added, and removed files
+		:return:
+		"""
+		changed = set()
+		while len(changed) == 0:
+			select.select([self.fd], [], [])
+			changed |= self._read()
+			while select.select([self.fd], [], [], self.settle)[0]:
+				changed |= self._read()
+		return changed
+
+
+def create_watcher(poll: bool = False, interval: float = 1.0):
+	"""
+	Get a watcher for the source directories, using inotify when available
+	:param poll: Always use polling,
+		(ie: for network filesystems where inotify does not report changes)
+	:param interval: Seconds between polls
+	:return:
+	"""
+	if not poll:
+		try:
+			return InotifyWatcher()
+		except (OSError, AttributeError) as e:
+			print('inotify not available, (%s), falling back to polling' % e)
+	return PollingWatcher(interval=interval)
@@ -65,8 +65,8 @@ function os_like() {
 	local OS="$1"
 
 	if [ -f '/etc/os-release' ]; then
-		ID="$(egrep '^ID=' /etc/os-release | sed 's:ID=::')"
-		LIKE="$(egrep '^ID_LIKE=' /etc/os-release | sed 's:ID_LIKE=::')"
+		ID="$(grep -E '^ID=' /etc/os-release | sed 's:ID=::')"
+		LIKE="$(grep -E '^ID_LIKE=' /etc/os-release | sed 's:ID_LIKE=::')"
 
 		if [[ "$LIKE" =~ "$OS" ]] || [ "$ID" == "$OS" ]; then
 			return 0;
@@ -306,7 +306,7 @@ function os_version() {
 		fi
 
 	elif [ -f '/etc/os-release' ]; then
-		local VERS="$(egrep '^VERSION_ID=' /etc/os-release | sed 's:VERSION_ID=::')"
+		local VERS="$(grep -E '^VERSION_ID=' /etc/os-release | sed 's:VERSION_ID=::')"
 
 		if [[ "$VERS" =~ '"' ]]; then
 			# Strip quotes around the OS name
@@ -331,6 +331,26 @@ function os_version() {
 		echo 0
 	fi
 }
+##
+# Simple wrapper to emulate `which -s`
+#
+# The -s flag is not available on all systems, so this function
+# provides a consistent way to check for command existence
+# without having to include '&>/dev/null' everywhere.
+#
+# Returns 0 on success, 1 on failure
+#
+# Arguments:
+#   $1 - Command to check
+#
+# CHANGELOG:
+#   2025.12.15 - Initial version (for a regression fix)
+#
+function cmd_exists() {
+	local CMD="$1"
+	which "$CMD" &>/dev/null
+	return $?
+}
 
 ##
 # Install a package with the system's package manager.
@@ -348,6 +368,7 @@ function os_version() {
 #
 #
 # CHANGELOG:
+#   2026.07.08 - Add paru support for Arch's AUR
 #   2026.01.09 - Cleanup os_like a bit and add support for RHEL 9's dnf
 #   2025.04.10 - Set Debian frontend to noninteractive
 #
@@ -365,7 +386,11 @@ function package_install (){
 			yum install -y $*
 		fi
 	elif os_like_arch -q; then
-		pacman -Syu --noconfirm $*
+		if ! cmd_exists paru; then
+			# Install paru before handling the user packages
+			_package_install_paru
+		fi
+		paru -Syu --noconfirm $*
 	elif os_like_suse -q; then
 		zypper install -y $*
 	else
@@ -374,6 +399,24 @@ function package_install (){
 		exit 1
 	fi
 }
+
+##
+# Special handler to ensure paru is installed on an Arch system.
+#
+# Useful to allow packages to install from the AUR by default.
+#
+function _package_install_paru() {
+	pacman -S git base-devel make
+
+	[ -e /opt/script-collection/ ] || mkdir -p /opt/script-collection
+	if [ ! -e /opt/script-collection/paru ]; then
+		git clone https://aur.archlinux.org/paru.git /opt/script-collection/paru
+	fi
+
+	cd /opt/script-collection/paru
+	makepkg -si
+	cd -
+}
 ##
 # Simple check to enforce the script to be run as root
 if [ $(id -u) -ne 0 ]; then
@@ -1,7 +1,6 @@
 
 from typing import Union
-from urllib import request
-from urllib import error as urllib_error
+from urllib import request, error as urllib_error
 
 
 def get_wan_ip() -> Union[str, None]:
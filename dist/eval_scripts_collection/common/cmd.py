@@ -1,19 +1,24 @@
 import subprocess
 import json
+from typing import Union
 class Cmd:
 	"""
 	Simple subprocess wrapper to provide convenience methods for common interactions.
 	"""
-	def __init__(self, cmd: list):
+	def __init__(self, cmd: list, timeout: Union[float, None] = None):
 		self.cmd = cmd
 		self.result = None
+		self.timeout = timeout
+		"""
+		Seconds to allow the command to run before it is killed, (None to wait forever)
+		"""
 
 	def exists(self) -> bool:
 		"""
 		Check if this binary exists
 		:return:
 		"""
-		return subprocess.run(['which', self.cmd[0]], check=False, stdout=subprocess.PIPE).returncode == 0
+		return subprocess.run(['which', self.cmd[0]], check=False, stdout=subprocess.PIPE, timeout=self.timeout).returncode == 0
 
 	def text(self) -> str:
 		"""
@@ -43,7 +48,8 @@ class Cmd:
 				stdout=subprocess.PIPE,
 				stderr=subprocess.PIPE,
 				check=True,
-				encoding='utf-8'
+				encoding='utf-8',
+				timeout=self.timeout
 			)
 
 		return self.result
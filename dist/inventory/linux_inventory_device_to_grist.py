@@ -10,7 +10,7 @@ TRMM Environment:
 	GRIST_ACCOUNT={{client.grist_account}}
 
 Syntax:
-	--debug: Enable debug logging
+	--debug: Enable debug logging and print the time taken by each probe
 
 Supports:
 	Linux-All
@@ -25,6 +25,8 @@ Author:
 	Charlie Powell <cdp1337@veraciousnetwork.com>
 
 Changelog:
+	20261018 - Collect each source of information concurrently with per-probe timeouts
+		Print per-probe timings with --debug
 	20250906 - Switch script from SuiteCRM to Grist
 	20250205 - Fix debug statement on CPU lookup
 	20240130 - Switch to standardized cmd library
@@ -41,9 +43,12 @@ import logging
 import argparse
 import sys
 from urllib import request
-from typing import Union
+from typing import Union, Callable
 import subprocess
 import json
+import queue
+import threading
+import time
 import ctypes
 
 
@@ -53,16 +58,20 @@ class Cmd:
 	"""
 	Simple subprocess wrapper to provide convenience methods for common interactions.
 	"""
-	def __init__(self, cmd: list):
+	def __init__(self, cmd: list, timeout: Union[float, None] = None):
 		self.cmd = cmd
 		self.result = None
+		self.timeout = timeout
+		"""
+		Seconds to allow the command to run before it is killed, (None to wait forever)
+		"""
 
 	def exists(self) -> bool:
 		"""
 		Check if this binary exists
 		:return:
 		"""
-		return subprocess.run(['which', self.cmd[0]], check=False, stdout=subprocess.PIPE).returncode == 0
+		return subprocess.run(['which', self.cmd[0]], check=False, stdout=subprocess.PIPE, timeout=self.timeout).returncode == 0
 
 	def text(self) -> str:
 		"""
@@ -92,12 +101,191 @@ class Cmd:
 				stdout=subprocess.PIPE,
 				stderr=subprocess.PIPE,
 				check=True,
-				encoding='utf-8'
+				encoding='utf-8',
+				timeout=self.timeout
 			)
 
 		return self.result
 
 
+class Probe:
+	"""
+	Single independent collector of information, (ie: the output of one command or a set of files)
+	"""
+	def __init__(self, name: str, func: Callable, timeout: float = 10.0, default=None):
+		self.name = name
+		self.func = func
+		self.timeout = timeout
+		"""
+		Seconds the probe is allowed to run before its result is abandoned
+		"""
+		self.default = default
+		"""
+		Value to use when the probe fails or does not finish in time
+		"""
+		self.status = 'pending'
+		"""
+		One of pending, running, ok, error, or timeout
+		"""
+		self.value = default
+		self.error = None
+		self.started = None
+		self.seconds = None
+
+
+class ProbeRunner:
+	"""
+	Run a set of probes concurrently on a pool of threads, each with its own deadline.
+
+	A probe which misses its deadline keeps its default value and its thread is abandoned,
+	(threads are daemons, so they will not keep the script running),
+	and a replacement thread is started to pick up any remaining probes.
+	"""
+	def __init__(self, workers: int = 8):
+		self.workers = workers
+		self.probes = {}
+		self.seconds = None
+		self._queue = queue.Queue()
+		self._lock = threading.Condition()
+
+	def add(self, name: str, func: Callable, timeout: float = 10.0, default=None) -> Probe:
+		"""
+		Register a function as a probe
+		:param name: Name of the probe, used to retrieve its value
+		:param func: Callable which takes no arguments and returns the collected value
+		:param timeout: Seconds to allow the probe to run
+		:param default: Value to use if the probe fails or times out
+		:return:
+		"""
+		probe = Probe(name, func, timeout, default)
+		self.probes[name] = probe
+		return probe
+
+	def probe(self, name: str, timeout: float = 10.0, default=None):
+		"""
+		Decorator to register a function as a probe
+		:param name: Name of the probe, used to retrieve its value
+		:param timeout: Seconds to allow the probe to run
+		:param default: Value to use if the probe fails or times out
+		:return:
+		"""
+		def decorator(func: Callable) -> Callable:
+			self.add(name, func, timeout, default)
+			return func
+		return decorator
+
+	def run(self) -> dict:
+		"""
+		Run all registered probes and wait for each to finish or reach its deadline
+		:return: Dictionary of probe name to its value, (or its default)
+		"""
+		start = time.monotonic()
+		for probe in self.probes.values():
+			self._queue.put(probe)
+
+		for i in range(min(self.workers, len(self.probes))):
+			self._start_worker()
+
+		with self._lock:
+			while True:
+				now = time.monotonic()
+				deadlines = []
+				for probe in self.probes.values():
+					if probe.status != 'running':
+						continue
+
+					deadline = probe.started + probe.timeout
+					if now >= deadline:
+						probe.status = 'timeout'
+						probe.seconds = now - probe.started
+						# The thread running this probe is stuck, replace it so pending probes still run
+						self._start_worker()
+					else:
+						deadlines.append(deadline)
+
+				if all([probe.status not in ('pending', 'running') for probe in self.probes.values()]):
+					break
+
+				self._lock.wait(min(deadlines) - now if len(deadlines) else None)
+
+		self.seconds = time.monotonic() - start
+		return self.get_values()
+
+	def get_values(self) -> dict:
+		"""
+		Get the value of every probe, (or its default if it did not succeed)
+		:return:
+		"""
+		return {name: probe.value for name, probe in self.probes.items()}
+
+	def get(self, name: str):
+		"""
+		Get the value of a single probe, (or its default if it did not succeed)
+		:param name:
+		:return:
+		"""
+		return self.probes[name].value
+
+	def print_report(self, file=sys.stderr):
+		"""
+		Print the status and latency of each probe, slowest first
+		:param file:
+		:return:
+		"""
+		probes = sorted(self.probes.values(), key=lambda p: p.seconds or 0, reverse=True)
+		width = max([len(p.name) for p in probes] + [5])
+		print('%s  %-8s  %8s' % ('Probe'.ljust(width), 'Status', 'Seconds'), file=file)
+		for probe in probes:
+			line = '%s  %-8s  %8.3f' % (probe.name.ljust(width), probe.status, probe.seconds or 0)
+			if probe.status == 'timeout':
+				line += '  (exceeded %ss)' % probe.timeout
+			elif probe.error is not None:
+				line += '  (%s: %s)' % (type(probe.error).__name__, probe.error)
+			print(line, file=file)
+
+		total = sum([p.seconds or 0 for p in probes])
+		print(
+			'%s probes in %.3fs, (%.3fs if run sequentially)' % (len(probes), self.seconds or 0, total),
+			file=file
+		)
+
+	def _start_worker(self):
+		threading.Thread(target=self._work, daemon=True).start()
+
+	def _work(self):
+		while True:
+			try:
+				probe = self._queue.get_nowait()
+			except queue.Empty:
+				return
+
+			with self._lock:
+				probe.status = 'running'
+				probe.started = time.monotonic()
+				self._lock.notify_all()
+
+			value = None
+			error = None
+			try:
+				value = probe.func()
+			except Exception as e:
+				error = e
+
+			with self._lock:
+				if probe.status != 'running':
+					# Deadline already passed and a replacement thread has taken over
+					return
+
+				probe.seconds = time.monotonic() - probe.started
+				if error is None:
+					probe.status = 'ok'
+					probe.value = value
+				else:
+					probe.status = 'error'
+					probe.error = error
+				self._lock.notify_all()
+
+
 parser = argparse.ArgumentParser(
 	prog='linux_inventory_device_to_grist.py',
 	description='Collect device asset inventory and send to Grist')
@@ -183,55 +371,146 @@ if sys_vendor is not None:
 		set_field('type', 'VM')
 
 
-# Grab hostname from binary
-set_field('hostname', Cmd(['hostname', '-f']).text())
+# Each source of information is an independent probe; they all run concurrently,
+# and any one which fails or hangs past its timeout is skipped instead of stalling the whole inventory.
+probes = ProbeRunner()
+
+
+@probes.probe('hostname', timeout=5)
+def probe_hostname():
+	# Grab hostname from binary
+	return Cmd(['hostname', '-f'], timeout=5).text()
+
+
+@probes.probe('dmi', timeout=5, default={})
+def probe_dmi():
+	# Read general hardware info basic files as provided from the kernel
+	return {
+		'manufacturer': read_from(['/sys/devices/virtual/dmi/id/chassis_vendor']),
+		'model': read_from(['/sys/devices/virtual/dmi/id/product_name']),
+		'serial': read_from([
+			'/sys/devices/virtual/dmi/id/product_serial',
+			'/sys/devices/virtual/dmi/id/chassis_serial'
+		]),
+		'hardware_version': read_from([
+			'/sys/devices/virtual/dmi/id/product_version',
+			'/sys/devices/virtual/dmi/id/chassis_version'
+		]),
+		'board_manufacturer': read_from(['/sys/devices/virtual/dmi/id/board_vendor']),
+		'board_model': read_from(['/sys/devices/virtual/dmi/id/board_name']),
+		'board_serial': read_from(['/sys/devices/virtual/dmi/id/board_serial']),
+	}
+
+
+@probes.probe('cpuinfo', timeout=5)
+def probe_cpuinfo():
+	# Read processor information from /proc/cpuinfo
+	cpu = {
+		'model': None,
+		'threads': 0,
+		'sockets': [],
+		'fields': {},
+	}
+	with open('/proc/cpuinfo', 'r') as f:
+		for line in f:
+			if line.startswith('model name'):
+				cpu['model'] = line.split(':')[1].strip()
+			elif line.startswith('processor'):
+				cpu['threads'] += 1
+			elif line.startswith('physical id'):
+				if line not in cpu['sockets']:
+					cpu['sockets'].append(line)
+			elif line.startswith('Serial'):
+				# Raspberry PI has their hardware information in /proc/cpuinfo
+				cpu['fields']['board_serial'] = line.split(':')[1].strip()
+			elif line.startswith('Model'):
+				# Raspberry PI has their hardware information in /proc/cpuinfo
+				val = line.split(':')[1].strip()
+				cpu['fields']['board_model'] = val
+				if 'Raspberry Pi' in val:
+					cpu['fields']['board_manufacturer'] = 'Raspberry Pi Ltd'
+	return cpu
+
+
+@probes.probe('lscpu', timeout=5)
+def probe_lscpu():
+	# Only used if /proc/cpuinfo does not provide the model, but cheap enough to run alongside it
+	cpu_data = Cmd(['lscpu', '-J'], timeout=5).json()
+	for record in cpu_data['lscpu']:
+		if record['field'] == 'Model name:':
+			return record['data']
+	return None
+
+
+@probes.probe('dmidecode', timeout=10)
+def probe_dmidecode():
+	# Use dmidecode to gather memory information, (if it's installed)
+	dmi = Cmd(['dmidecode', '--type', 'memory'], timeout=10)
+	if is_vm or not dmi.exists():
+		return None
+	return dmi.lines()
+
+
+@probes.probe('meminfo', timeout=5)
+def probe_meminfo():
+	with open('/proc/meminfo', 'r') as f:
+		for line in f:
+			if line.startswith('MemTotal:'):
+				mem_size = line.split(':')[1].strip()
+				if mem_size.endswith(' kB'):
+					mem_size = int(round(int(mem_size[:-3]) / 1024 / 1024, 0))
+				return mem_size
+	return None
+
+
+@probes.probe('pveversion', timeout=10)
+def probe_pveversion():
+	pve = Cmd(['pveversion'], timeout=10)
+	if not pve.exists():
+		return None
+	return pve.text().split('/')[1]
+
 
+@probes.probe('os_release', timeout=5, default={})
+def probe_os_release():
+	os_release = {}
+	if os.path.exists('/etc/os-release'):
+		with open('/etc/os-release', 'r') as f:
+			for line in f:
+				if line.startswith('NAME='):
+					os_release['os_name'] = line.split('=')[1].strip().strip('"')
+				elif line.startswith('VERSION='):
+					os_release['os_version'] = line.split('=')[1].strip().strip('"')
+	return os_release
 
-# Read general hardware info basic files as provided from the kernel
-set_field('manufacturer', read_from(['/sys/devices/virtual/dmi/id/chassis_vendor']))
-set_field('model', read_from(['/sys/devices/virtual/dmi/id/product_name']))
-set_field('serial', read_from([
-	'/sys/devices/virtual/dmi/id/product_serial',
-	'/sys/devices/virtual/dmi/id/chassis_serial'
-]))
-set_field('hardware_version', read_from([
-	'/sys/devices/virtual/dmi/id/product_version',
-	'/sys/devices/virtual/dmi/id/chassis_version'
-]))
-set_field('board_manufacturer', read_from(['/sys/devices/virtual/dmi/id/board_vendor']))
-set_field('board_model', read_from(['/sys/devices/virtual/dmi/id/board_name']))
-set_field('board_serial', read_from(['/sys/devices/virtual/dmi/id/board_serial']))
+
+@probes.probe('ip', timeout=5, default=[])
+def probe_ip():
+	return Cmd(['ip', '-j', 'address'], timeout=5).json()
+
+
+results = probes.run()
+if options.debug:
+	probes.print_report()
+
+
+set_field('hostname', results['hostname'])
+
+for key, value in results['dmi'].items():
+	set_field(key, value)
 
 
-# Read processor information from /proc/cpuinfo
 cpu_model = None
-cpu_threads = 0
 cpu_sockets = []
-with open('/proc/cpuinfo', 'r') as f:
-	for line in f:
-		if line.startswith('model name'):
-			cpu_model = line.split(':')[1].strip()
-		elif line.startswith('processor'):
-			cpu_threads += 1
-		elif line.startswith('physical id'):
-			if line not in cpu_sockets:
-				cpu_sockets.append(line)
-		elif line.startswith('Serial'):
-			# Raspberry PI has their hardware information in /proc/cpuinfo
-			set_field('board_serial', line.split(':')[1].strip())
-		elif line.startswith('Model'):
-			# Raspberry PI has their hardware information in /proc/cpuinfo
-			val = line.split(':')[1].strip()
-			set_field('board_model', val)
-			if 'Raspberry Pi' in val:
-				set_field('board_manufacturer', 'Raspberry Pi Ltd')
+if results['cpuinfo'] is not None:
+	cpu_model = results['cpuinfo']['model']
+	cpu_sockets = results['cpuinfo']['sockets']
+	for key, value in results['cpuinfo']['fields'].items():
+		set_field(key, value)
 
 if cpu_model is None:
 	# Try lscpu instead
-	cpu_data = Cmd(['lscpu', '-J']).json()
-	for record in cpu_data['lscpu']:
-		if record['field'] == 'Model name:':
-			cpu_model = record['data']
+	cpu_model = results['lscpu']
 
 
 if len(cpu_sockets) > 1 and cpu_model is not None:
@@ -239,20 +518,18 @@ if len(cpu_sockets) > 1 and cpu_model is not None:
 else:
 	set_field('cpu_model', cpu_model)
 
-if cpu_threads > 0:
-	set_field('cpu_threads', cpu_threads)
+if results['cpuinfo'] is not None and results['cpuinfo']['threads'] > 0:
+	set_field('cpu_threads', results['cpuinfo']['threads'])
 
 
 # Read memory information from /proc/meminfo or dmidecode if available
-dmi = Cmd(['dmidecode', '--type', 'memory'])
-if not is_vm and dmi.exists():
-	# Use dmidecode to gather memory information, (if it's installed)
-	# Just because this is present does not mean it'll succeed though,
+if results['dmidecode'] is not None:
+	# Just because dmidecode is present does not mean it'll succeed though,
 	# Raspberry PIs do not support SMBIOS information, so nothing will be returned
 	# and we'll need to fallback to /proc/meminfo
 	memory = []
 	current_stick = None
-	for line in dmi.lines():
+	for line in results['dmidecode']:
 		if line.startswith('Memory Device'):
 			current_stick = {
 				'total_width': None,
@@ -340,33 +617,21 @@ if is_vm:
 
 if 'mem_size' not in data or data['mem_size'] == 0:
 	# Lookup from dmidecode failed, fallback to /proc/meminfo
-	with open('/proc/meminfo', 'r') as f:
-		for line in f:
-			if line.startswith('MemTotal:'):
-				mem_size = line.split(':')[1].strip()
-				if mem_size.endswith(' kB'):
-					mem_size = int(round(int(mem_size[:-3]) / 1024 / 1024, 0))
-				set_field('mem_size', mem_size)
+	set_field('mem_size', results['meminfo'])
 
 
 # Get OS name and version from common, (and not-so-common) sources
-pve = Cmd(['pveversion'])
-if pve.exists():
+if results['pveversion'] is not None:
 	set_field('os_name', 'Proxmox')
-	set_field('os_version', pve.text().split('/')[1])
-elif os.path.exists('/etc/os-release'):
-	with open('/etc/os-release', 'r') as f:
-		for line in f:
-			if line.startswith('NAME='):
-				set_field('os_name', line.split('=')[1].strip().strip('"'))
-			elif line.startswith('VERSION='):
-				set_field('os_version', line.split('=')[1].strip().strip('"'))
+	set_field('os_version', results['pveversion'])
+else:
+	set_field('os_name', results['os_release'].get('os_name'))
+	set_field('os_version', results['os_release'].get('os_version'))
 
 
 # Get IP and MAC address for this device
-ifaces = Cmd(['ip', '-j', 'address']).json()
 pri_sent = False
-for iface in ifaces:
+for iface in results['ip']:
 	if iface['operstate'] == 'DOWN':
 		continue
 
@@ -0,0 +1,183 @@
+import queue
+import sys
+import threading
+import time
+from typing import Callable
+
+
+class Probe:
+	"""
+	Single independent collector of information, (ie: the output of one command or a set of files)
+	"""
+	def __init__(self, name: str, func: Callable, timeout: float = 10.0, default=None):
+		self.name = name
+		self.func = func
+		self.timeout = timeout
+		"""
+		Seconds the probe is allowed to run before its result is abandoned
+		"""
+		self.default = default
+		"""
+		Value to use when the probe fails or does not finish in time
+		"""
+		self.status = 'pending'
+		"""
+		One of pending, running, ok, error, or timeout
+		"""
+		self.value = default
+		self.error = None
+		self.started = None
+		self.seconds = None
+
+
+class ProbeRunner:
+	"""
+	Run a set of probes concurrently on a pool of threads, each with its own deadline.
+
+	A probe which misses its deadline keeps its default value and its thread is abandoned,
+	(threads are daemons, so they will not keep the script running),
+	and a replacement thread is started to pick up any remaining probes.
+	"""
+	def __init__(self, workers: int = 8):
+		self.workers = workers
+		self.probes = {}
+		self.seconds = None
+		self._queue = queue.Queue()
+		self._lock = threading.Condition()
+
+	def add(self, name: str, func: Callable, timeout: float = 10.0, default=None) -> Probe:
+		"""
+		Register a function as a probe
+		:param name: Name of the probe, used to retrieve its value
+		:param func: Callable which takes no arguments and returns the collected value
+		:param timeout: Seconds to allow the probe to run
+		:param default: Value to use if the probe fails or times out
+		:return:
+		"""
+		probe = Probe(name, func, timeout, default)
+		self.probes[name] = probe
+		return probe
+
+	def probe(self, name: str, timeout: float = 10.0, default=None):
+		"""
+		Decorator to register a function as a probe
+		:param name: Name of the probe, used to retrieve its value
+		:param timeout: Seconds to allow the probe to run
+		:param default: Value to use if the probe fails or times out
+		:return:
+		"""
+		def decorator(func: Callable) -> Callable:
+			self.add(name, func, timeout, default)
+			return func
+		return decorator
+
+	def run(self) -> dict:
+		"""
+		Run all registered probes and wait for each to finish or reach its deadline
+		:return: Dictionary of probe name to its value, (or its default)
+		"""
+		start = time.monotonic()
+		for probe in self.probes.values():
+			self._queue.put(probe)
+
+		for i in range(min(self.workers, len(self.probes))):
+			self._start_worker()
+
+		with self._lock:
+			while True:
+				now = time.monotonic()
+				deadlines = []
+				for probe in self.probes.values():
+					if probe.status != 'running':
+						continue
+
+					deadline = probe.started + probe.timeout
+					if now >= deadline:
+						probe.status = 'timeout'
+						probe.seconds = now - probe.started
+						# The thread running this probe is stuck, replace it so pending probes still run
+						self._start_worker()
+					else:
+						deadlines.append(deadline)
+
+				if all([probe.status not in ('pending', 'running') for probe in self.probes.values()]):
+					break
+
+				self._lock.wait(min(deadlines) - now if len(deadlines) else None)
+
+		self.seconds = time.monotonic() - start
+		return self.get_values()
+
+	def get_values(self) -> dict:
+		"""
+		Get the value of every probe, (or its default if it did not succeed)
+		:return:
+		"""
+		return {name: probe.value for name, probe in self.probes.items()}
+
+	def get(self, name: str):
+		"""
+		Get the value of a single probe, (or its default if it did not succeed)
+		:param name:
+		:return:
+		"""
+		return self.probes[name].value
+
+	def print_report(self, file=sys.stderr):
+		"""
+		Print the status and latency of each probe, slowest first
+		:param file:
+		:return:
+		"""
+		probes = sorted(self.probes.values(), key=lambda p: p.seconds or 0, reverse=True)
+		width = max([len(p.name) for p in probes] + [5])
+		print('%s  %-8s  %8s' % ('Probe'.ljust(width), 'Status', 'Seconds'), file=file)
+		for probe in probes:
+			line = '%s  %-8s  %8.3f' % (probe.name.ljust(width), probe.status, probe.seconds or 0)
+			if probe.status == 'timeout':
+				line += '  (exceeded %ss)' % probe.timeout
+			elif probe.error is not None:
+				line += '  (%s: %s)' % (type(probe.error).__name__, probe.error)
+			print(line, file=file)
+
+		total = sum([p.seconds or 0 for p in probes])
+		print(
+			'%s probes in %.3fs, (%.3fs if run sequentially)' % (len(probes), self.seconds or 0, total),
+			file=file
+		)
+
+	def _start_worker(self):
+		threading.Thread(target=self._work, daemon=True).start()
+
+	def _work(self):
+		while True:
+			try:
+				probe = self._queue.get_nowait()
+			except queue.Empty:
+				return
+
+			with self._lock:
+				probe.status = 'running'
+				probe.started = time.monotonic()
+				self._lock.notify_all()
+
+			value = None
+			error = None
+			try:
+				value = probe.func()
+			except Exception as e:
+				error = e
+
+			with self._lock:
+				if probe.status != 'running':
+					# Deadline already passed and a replacement thread has taken over
+					return
+
+				probe.seconds = time.monotonic() - probe.started
+				if error is None:
+					probe.status = 'ok'
+					probe.value = value
+				else:
+					probe.status = 'error'
+					probe.error = error
+				self._lock.notify_all()
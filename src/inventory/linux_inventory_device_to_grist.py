@@ -10,7 +10,7 @@ TRMM Environment:
 	GRIST_ACCOUNT={{client.grist_account}}
 
 Syntax:
-	--debug: Enable debug logging
+	--debug: Enable debug logging and print the time taken by each probe
 
 Supports:
 	Linux-All
@@ -25,6 +25,8 @@ Author:
 	Charlie Powell <cdp1337@veraciousnetwork.com>
 
 Changelog:
+	20261018 - Collect each source of information concurrently with per-probe timeouts
+		Print per-probe timings with --debug
 	20250906 - Switch script from SuiteCRM to Grist
 	20250205 - Fix debug statement on CPU lookup
 	20240130 - Switch to standardized cmd library
@@ -47,6 +49,7 @@ from urllib import request
 from typing import Union
 
 from scriptlets._common.cmd import *
+from scriptlets._common.probe import *
 
 
 parser = argparse.ArgumentParser(
@@ -123,55 +126,146 @@ if sys_vendor is not None:
 		set_field('type', 'VM')
 
 
-# Grab hostname from binary
-set_field('hostname', Cmd(['hostname', '-f']).text())
+# Each source of information is an independent probe; they all run concurrently,
+# and any one which fails or hangs past its timeout is skipped instead of stalling the whole inventory.
+probes = ProbeRunner()
+
+
+@probes.probe('hostname', timeout=5)
+def probe_hostname():
+	# Grab hostname from binary
+	return Cmd(['hostname', '-f'], timeout=5).text()
+
+
+@probes.probe('dmi', timeout=5, default={})
+def probe_dmi():
+	# Read general hardware info basic files as provided from the kernel
+	return {
+		'manufacturer': read_from(['/sys/devices/virtual/dmi/id/chassis_vendor']),
+		'model': read_from(['/sys/devices/virtual/dmi/id/product_name']),
+		'serial': read_from([
+			'/sys/devices/virtual/dmi/id/product_serial',
+			'/sys/devices/virtual/dmi/id/chassis_serial'
+		]),
+		'hardware_version': read_from([
+			'/sys/devices/virtual/dmi/id/product_version',
+			'/sys/devices/virtual/dmi/id/chassis_version'
+		]),
+		'board_manufacturer': read_from(['/sys/devices/virtual/dmi/id/board_vendor']),
+		'board_model': read_from(['/sys/devices/virtual/dmi/id/board_name']),
+		'board_serial': read_from(['/sys/devices/virtual/dmi/id/board_serial']),
+	}
+
+
+@probes.probe('cpuinfo', timeout=5)
+def probe_cpuinfo():
+	# Read processor information from /proc/cpuinfo
+	cpu = {
+		'model': None,
+		'threads': 0,
+		'sockets': [],
+		'fields': {},
+	}
+	with open('/proc/cpuinfo', 'r') as f:
+		for line in f:
+			if line.startswith('model name'):
+				cpu['model'] = line.split(':')[1].strip()
+			elif line.startswith('processor'):
+				cpu['threads'] += 1
+			elif line.startswith('physical id'):
+				if line not in cpu['sockets']:
+					cpu['sockets'].append(line)
+			elif line.startswith('Serial'):
+				# Raspberry PI has their hardware information in /proc/cpuinfo
+				cpu['fields']['board_serial'] = line.split(':')[1].strip()
+			elif line.startswith('Model'):
+				# Raspberry PI has their hardware information in /proc/cpuinfo
+				val = line.split(':')[1].strip()
+				cpu['fields']['board_model'] = val
+				if 'Raspberry Pi' in val:
+					cpu['fields']['board_manufacturer'] = 'Raspberry Pi Ltd'
+	return cpu
+
+
+@probes.probe('lscpu', timeout=5)
+def probe_lscpu():
+	# Only used if /proc/cpuinfo does not provide the model, but cheap enough to run alongside it
+	cpu_data = Cmd(['lscpu', '-J'], timeout=5).json()
+	for record in cpu_data['lscpu']:
+		if record['field'] == 'Model name:':
+			return record['data']
+	return None
+
+
+@probes.probe('dmidecode', timeout=10)
+def probe_dmidecode():
+	# Use dmidecode to gather memory information, (if it's installed)
+	dmi = Cmd(['dmidecode', '--type', 'memory'], timeout=10)
+	if is_vm or not dmi.exists():
+		return None
+	return dmi.lines()
+
+
+@probes.probe('meminfo', timeout=5)
+def probe_meminfo():
+	with open('/proc/meminfo', 'r') as f:
+		for line in f:
+			if line.startswith('MemTotal:'):
+				mem_size = line.split(':')[1].strip()
+				if mem_size.endswith(' kB'):
+					mem_size = int(round(int(mem_size[:-3]) / 1024 / 1024, 0))
+				return mem_size
+	return None
+
+
+@probes.probe('pveversion', timeout=10)
+def probe_pveversion():
+	pve = Cmd(['pveversion'], timeout=10)
+	if not pve.exists():
+		return None
+	return pve.text().split('/')[1]
+
 
+@probes.probe('os_release', timeout=5, default={})
+def probe_os_release():
+	os_release = {}
+	if os.path.exists('/etc/os-release'):
+		with open('/etc/os-release', 'r') as f:
+			for line in f:
+				if line.startswith('NAME='):
+					os_release['os_name'] = line.split('=')[1].strip().strip('"')
+				elif line.startswith('VERSION='):
+					os_release['os_version'] = line.split('=')[1].strip().strip('"')
+	return os_release
 
-# Read general hardware info basic files as provided from the kernel
-set_field('manufacturer', read_from(['/sys/devices/virtual/dmi/id/chassis_vendor']))
-set_field('model', read_from(['/sys/devices/virtual/dmi/id/product_name']))
-set_field('serial', read_from([
-	'/sys/devices/virtual/dmi/id/product_serial',
-	'/sys/devices/virtual/dmi/id/chassis_serial'
-]))
-set_field('hardware_version', read_from([
-	'/sys/devices/virtual/dmi/id/product_version',
-	'/sys/devices/virtual/dmi/id/chassis_version'
-]))
-set_field('board_manufacturer', read_from(['/sys/devices/virtual/dmi/id/board_vendor']))
-set_field('board_model', read_from(['/sys/devices/virtual/dmi/id/board_name']))
-set_field('board_serial', read_from(['/sys/devices/virtual/dmi/id/board_serial']))
+
+@probes.probe('ip', timeout=5, default=[])
+def probe_ip():
+	return Cmd(['ip', '-j', 'address'], timeout=5).json()
+
+
+results = probes.run()
+if options.debug:
+	probes.print_report()
+
+
+set_field('hostname', results['hostname'])
+
+for key, value in results['dmi'].items():
+	set_field(key, value)
 
 
-# Read processor information from /proc/cpuinfo
 cpu_model = None
-cpu_threads = 0
 cpu_sockets = []
-with open('/proc/cpuinfo', 'r') as f:
-	for line in f:
-		if line.startswith('model name'):
-			cpu_model = line.split(':')[1].strip()
-		elif line.startswith('processor'):
-			cpu_threads += 1
-		elif line.startswith('physical id'):
-			if line not in cpu_sockets:
-				cpu_sockets.append(line)
-		elif line.startswith('Serial'):
-			# Raspberry PI has their hardware information in /proc/cpuinfo
-			set_field('board_serial', line.split(':')[1].strip())
-		elif line.startswith('Model'):
-			# Raspberry PI has their hardware information in /proc/cpuinfo
-			val = line.split(':')[1].strip()
-			set_field('board_model', val)
-			if 'Raspberry Pi' in val:
-				set_field('board_manufacturer', 'Raspberry Pi Ltd')
+if results['cpuinfo'] is not None:
+	cpu_model = results['cpuinfo']['model']
+	cpu_sockets = results['cpuinfo']['sockets']
+	for key, value in results['cpuinfo']['fields'].items():
+		set_field(key, value)
 
 if cpu_model is None:
 	# Try lscpu instead
-	cpu_data = Cmd(['lscpu', '-J']).json()
-	for record in cpu_data['lscpu']:
-		if record['field'] == 'Model name:':
-			cpu_model = record['data']
+	cpu_model = results['lscpu']
 
 
 if len(cpu_sockets) > 1 and cpu_model is not None:
@@ -179,20 +273,18 @@ if len(cpu_sockets) > 1 and cpu_model is not None:
 else:
 	set_field('cpu_model', cpu_model)
 
-if cpu_threads > 0:
-	set_field('cpu_threads', cpu_threads)
+if results['cpuinfo'] is not None and results['cpuinfo']['threads'] > 0:
+	set_field('cpu_threads', results['cpuinfo']['threads'])
 
 
 # Read memory information from /proc/meminfo or dmidecode if available
-dmi = Cmd(['dmidecode', '--type', 'memory'])
-if not is_vm and dmi.exists():
-	# Use dmidecode to gather memory information, (if it's installed)
-	# Just because this is present does not mean it'll succeed though,
+if results['dmidecode'] is not None:
+	# Just because dmidecode is present does not mean it'll succeed though,
 	# Raspberry PIs do not support SMBIOS information, so nothing will be returned
 	# and we'll need to fallback to /proc/meminfo
 	memory = []
 	current_stick = None
-	for line in dmi.lines():
+	for line in results['dmidecode']:
 		if line.startswith('Memory Device'):
 			current_stick = {
 				'total_width': None,
@@ -280,33 +372,21 @@ if is_vm:
 
 if 'mem_size' not in data or data['mem_size'] == 0:
 	# Lookup from dmidecode failed, fallback to /proc/meminfo
-	with open('/proc/meminfo', 'r') as f:
-		for line in f:
-			if line.startswith('MemTotal:'):
-				mem_size = line.split(':')[1].strip()
-				if mem_size.endswith(' kB'):
-					mem_size = int(round(int(mem_size[:-3]) / 1024 / 1024, 0))
-				set_field('mem_size', mem_size)
+	set_field('mem_size', results['meminfo'])
 
 
 # Get OS name and version from common, (and not-so-common) sources
-pve = Cmd(['pveversion'])
-if pve.exists():
+if results['pveversion'] is not None:
 	set_field('os_name', 'Proxmox')
-	set_field('os_version', pve.text().split('/')[1])
-elif os.path.exists('/etc/os-release'):
-	with open('/etc/os-release', 'r') as f:
-		for line in f:
-			if line.startswith('NAME='):
-				set_field('os_name', line.split('=')[1].strip().strip('"'))
-			elif line.startswith('VERSION='):
-				set_field('os_version', line.split('=')[1].strip().strip('"'))
+	set_field('os_version', results['pveversion'])
+else:
+	set_field('os_name', results['os_release'].get('os_name'))
+	set_field('os_version', results['os_release'].get('os_version'))
 
 
 # Get IP and MAC address for this device
-ifaces = Cmd(['ip', '-j', 'address']).json()
 pri_sent = False
-for iface in ifaces:
+for iface in results['ip']:
 	if iface['operstate'] == 'DOWN':
 		continue
 
@@ -0,0 +1,129 @@
+"""
+In-memory builds through compile_tree()
+"""
+import json
+import os
+import threading
+
+import pytest
+
+import compile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+SCRIPT = (
+	'#!/bin/bash\n'
+	'#\n'
+	'# Supports:\n'
+	'#   Debian\n'
+	'#\n'
+	'# Category:\n'
+	'#   Demo\n'
+	'\n'
+	'# scriptlet:_common/hello.sh\n'
+	'\n'
+	'hello\n'
+)
+
+
+def scriptlets(message: str) -> dict:
+	return {'_common/hello.sh': '##\n# Say hello\nhello() {\n\techo %s\n}\n' % message}
+
+
+def test_compiles_in_memory(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	fs = compile.MemoryFileSystem()
+	result = compile.compile_tree({'demo/linux_hello.sh': SCRIPT}, scriptlets('hi'), fs=fs)
+
+	assert result.filesystem is fs
+	assert 'dist/demo/linux_hello.sh' in result.outputs
+	compiled = result.read('dist/demo/linux_hello.sh').decode()
+	assert '# scriptlet:' not in compiled
+	assert 'hello() {\n\techo hi\n}\n' in compiled
+	assert [x['filename'] for x in result.get_trmm_meta()] == ['demo/linux_hello.sh']
+	assert result.get_script('src/demo/linux_hello.sh') is not None
+
+	# Nothing is written to disk
+	assert list(tmp_path.iterdir()) == []
+
+
+def test_restores_filesystem_and_options(monkeypatch):
+	filesystem = compile.filesystem
+	options = compile.build_options.asdict()
+
+	compile.compile_tree({'demo/linux_hello.sh': SCRIPT}, scriptlets('hi'), {'tree_shake': True, 'extra': 1})
+	assert compile.filesystem is filesystem
+	assert compile.build_options.asdict() == options
+
+	def fail(*args):
+		raise RuntimeError('write failed')
+
+	monkeypatch.setattr(compile, 'write_outputs', fail)
+	with pytest.raises(RuntimeError):
+		compile.compile_tree({'demo/linux_hello.sh': SCRIPT}, scriptlets('hi'), {'tree_shake': True})
+	assert compile.filesystem is filesystem
+	assert compile.build_options.asdict() == options
+
+
+def test_rejects_cache_in_memory():
+	with pytest.raises(ValueError):
+		compile.compile_tree({'demo/linux_hello.sh': SCRIPT}, scriptlets('hi'), jobs=2)
+
+
+def test_concurrent_builds_do_not_mix():
+	results = {}
+
+	def build(message: str):
+		result = compile.compile_tree({'demo/linux_hello.sh': SCRIPT}, scriptlets(message))
+		results[message] = result.read('dist/demo/linux_hello.sh').decode()
+
+	threads = [threading.Thread(target=build, args=('message%d' % i,)) for i in range(8)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	assert len(results) == 8
+	for message, compiled in results.items():
+		assert 'echo %s\n' % message in compiled
+		assert compiled.count('echo message') == 1
+
+
+def test_builds_are_ordered_the_same_on_every_filesystem(tmp_path):
+	src = tmp_path / 'src'
+	for name in ('zeta', 'alpha', 'mid'):
+		(src / name).mkdir(parents=True)
+		(src / name / ('linux_%s.sh' % name)).write_text(SCRIPT)
+
+	on_disk = compile.compile_tree(str(src), scriptlets('hi'))
+	in_memory = compile.compile_tree({str(x.relative_to(src)): x.read_text() for x in src.rglob('*.sh')}, scriptlets('hi'))
+
+	assert [x.file for x in on_disk.scripts] == [
+		'src/alpha/linux_alpha.sh', 'src/mid/linux_mid.sh', 'src/zeta/linux_zeta.sh'
+	]
+	assert [x.file for x in in_memory.scripts] == [x.file for x in on_disk.scripts]
+	assert on_disk.get_files() == in_memory.get_files()
+
+
+def test_defaults_compile_the_working_directory(monkeypatch):
+	monkeypatch.chdir(ROOT)
+	with open(os.path.join('dist', 'community_scripts.json'), 'rb') as f:
+		published = f.read()
+
+	result = compile.compile_tree()
+	assert sorted([x['filename'] for x in result.get_trmm_meta()]) == sorted(
+		[x['filename'] for x in json.loads(published)]
+	)
+
+	# As documented in the README
+	result = compile.compile_tree('src', 'scriptlets', {'tree_shake': True})
+	compiled = result.read('dist/ufw/linux_install_ufw.sh').decode()
+	assert compiled.startswith('#!/bin/bash')
+	assert '# scriptlet:' not in compiled
+	assert 'ufw/linux_install_ufw.sh' in [x['filename'] for x in result.get_trmm_meta()]
+
+	# The build was only ever held in memory
+	with open(os.path.join('dist', 'community_scripts.json'), 'rb') as f:
+		assert f.read() == published
@@ -0,0 +1,205 @@
+"""
+Scriptlet downloads against a local stand-in for the scriptlet web server
+"""
+import hashlib
+import http.server
+import os
+import threading
+import time
+
+import pytest
+
+import compile
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def setup(self):
+		super().setup()
+		with self.server.lock:
+			self.server.connections += 1
+
+	def do_GET(self):
+		server = self.server
+		with server.lock:
+			server.requests.append((self.path, self.headers.get('If-None-Match')))
+			server.active += 1
+			server.max_active = max(server.max_active, server.active)
+		try:
+			time.sleep(server.delay)
+			self.respond()
+		finally:
+			with server.lock:
+				server.active -= 1
+
+	def respond(self):
+		server = self.server
+		if self.path not in server.files:
+			self.send_response(404)
+			self.send_header('Content-Length', '0')
+			self.end_headers()
+			return
+
+		body = server.files[self.path]
+		etag = '"%s"' % hashlib.md5(body).hexdigest()
+		if self.headers.get('If-None-Match') == etag:
+			self.send_response(304)
+			self.send_header('ETag', etag)
+			self.send_header('Content-Length', '0')
+			self.end_headers()
+			return
+
+		self.send_response(200)
+		self.send_header('ETag', etag)
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+
+@pytest.fixture
+def server():
+	httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+	httpd.files = {}
+	httpd.requests = []
+	httpd.lock = threading.Lock()
+	httpd.connections = 0
+	httpd.active = 0
+	httpd.max_active = 0
+	httpd.delay = 0
+	httpd.url = 'http://127.0.0.1:%d' % httpd.server_address[1]
+	thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+	thread.start()
+	yield httpd
+	httpd.shutdown()
+	httpd.server_close()
+
+
+def test_first_fetch_downloads_and_stores_etag(server, tmp_path):
+	server.files['/scriptlets/_common/hello.sh'] = b'hello() { echo hi; }\n'
+	filename = str(tmp_path / 'scriptlets' / '_common' / 'hello.sh')
+
+	assert compile.ScriptletFetcher().fetch(filename, server.url + '/scriptlets/_common/hello.sh')
+
+	with open(filename, 'rb') as f:
+		assert f.read() == b'hello() { echo hi; }\n'
+	assert os.path.exists(str(tmp_path / 'scriptlets' / '_common' / '.etag.hello.sh'))
+	assert server.requests == [('/scriptlets/_common/hello.sh', None)]
+
+
+def test_conditional_fetch_keeps_local_copy_on_304(server, tmp_path):
+	server.files['/hello.sh'] = b'hello() { echo hi; }\n'
+	filename = str(tmp_path / 'hello.sh')
+	fetcher = compile.ScriptletFetcher()
+
+	assert fetcher.fetch(filename, server.url + '/hello.sh')
+	mtime = os.stat(filename).st_mtime_ns
+	assert fetcher.fetch(filename, server.url + '/hello.sh')
+
+	assert os.stat(filename).st_mtime_ns == mtime
+	assert server.requests[1][1] == '"%s"' % hashlib.md5(b'hello() { echo hi; }\n').hexdigest()
+
+	# A modified scriptlet no longer matches the stored ETag and is downloaded again
+	server.files['/hello.sh'] = b'hello() { echo hello; }\n'
+	assert fetcher.fetch(filename, server.url + '/hello.sh')
+	with open(filename, 'rb') as f:
+		assert f.read() == b'hello() { echo hello; }\n'
+
+	# Unconditional fetches, (as used for scriptlets.lock), ignore the stored ETag
+	assert fetcher.fetch(filename, server.url + '/hello.sh', conditional=False)
+	assert server.requests[-1][1] is None
+
+
+def test_fetch_falls_back_to_mirror(server, tmp_path, monkeypatch):
+	server.files['/mirror/_common/hello.sh'] = b'hello() { echo mirror; }\n'
+	monkeypatch.chdir(tmp_path)
+	with open('compile.sources', 'w') as f:
+		f.write('_common=%s/primary\n' % server.url)
+		f.write('_common=%s/mirror\n' % server.url)
+
+	resolver = compile.ScriptletResolver()
+	monkeypatch.setattr(compile, 'scriptlet_lock', compile.ScriptletLock())
+
+	assert resolver.fetch('_common/hello.sh')
+	with open(os.path.join('scriptlets', '_common', 'hello.sh'), 'rb') as f:
+		assert f.read() == b'hello() { echo mirror; }\n'
+	assert [x[0] for x in server.requests] == ['/primary/_common/hello.sh', '/mirror/_common/hello.sh']
+
+
+def test_offline_never_touches_network(server, tmp_path):
+	server.files['/hello.sh'] = b'hello() { echo hi; }\n'
+	filename = str(tmp_path / 'hello.sh')
+	fetcher = compile.ScriptletFetcher()
+	fetcher.offline = True
+
+	# Nothing downloaded yet, so the scriptlet is unavailable
+	assert not fetcher.fetch(filename, server.url + '/hello.sh')
+	assert not os.path.exists(filename)
+
+	# A previous download is used as-is, even if the server has a newer copy
+	with open(filename, 'wb') as f:
+		f.write(b'hello() { echo old; }\n')
+	assert fetcher.fetch(filename, server.url + '/hello.sh')
+	with open(filename, 'rb') as f:
+		assert f.read() == b'hello() { echo old; }\n'
+
+	assert server.requests == []
+
+
+def test_requests_to_one_host_reuse_a_connection(server, tmp_path):
+	for i in range(5):
+		server.files['/hello%d.sh' % i] = b'hello() { echo %d; }\n' % i
+	fetcher = compile.ScriptletFetcher()
+
+	for i in range(5):
+		assert fetcher.fetch(str(tmp_path / ('hello%d.sh' % i)), server.url + '/hello%d.sh' % i)
+	# Conditional requests go over the same connection too
+	assert fetcher.fetch(str(tmp_path / 'hello0.sh'), server.url + '/hello0.sh')
+
+	assert len(server.requests) == 6
+	assert server.connections == 1
+
+
+def test_prefetch_downloads_all_references_concurrently(server, tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	with open('compile.sources', 'w') as f:
+		f.write('_common=%s/scriptlets\n' % server.url)
+
+	os.makedirs('src')
+	with open(os.path.join('src', 'linux_one.sh'), 'w') as f:
+		f.write('#!/bin/bash\n# scriptlet:_common/one.sh\n# scriptlet:_common/two.sh\n')
+	with open(os.path.join('src', 'linux_two.py'), 'w') as f:
+		f.write('from scriptlets._common.three import *\n# import:_common/four.py\n')
+
+	server.files['/scriptlets/_common/one.sh'] = b'# scriptlet:_common/nested.sh\none() { nested; }\n'
+	server.files['/scriptlets/_common/two.sh'] = b'two() { echo two; }\n'
+	server.files['/scriptlets/_common/nested.sh'] = b'nested() { echo nested; }\n'
+	server.files['/scriptlets/_common/three.py'] = b'def three():\n\treturn 3\n'
+	server.files['/scriptlets/_common/four.py'] = b'def four():\n\treturn 4\n'
+	server.delay = 0.3
+
+	fetcher = compile.ScriptletFetcher(workers=4)
+	monkeypatch.setattr(compile, 'fetcher', fetcher)
+	monkeypatch.setattr(compile, 'resolver', compile.ScriptletResolver())
+	monkeypatch.setattr(compile, 'scriptlet_lock', compile.ScriptletLock())
+
+	start = time.monotonic()
+	checked = compile.prefetch_scriptlets([('src/linux_one.sh', 'shell'), ('src/linux_two.py', 'python')])
+	elapsed = time.monotonic() - start
+
+	# Every reference, including the nested one, (found in a downloaded scriptlet), is fetched once
+	assert sorted(checked) == [
+		os.path.join('scriptlets', '_common', x) for x in ('four.py', 'nested.sh', 'one.sh', 'three.py', 'two.sh')
+	]
+	for path in server.files:
+		assert os.path.exists(path.lstrip('/'))
+	assert sorted(x[0] for x in server.requests) == sorted(server.files)
+
+	# The first four run side by side, then the nested one; serially this would take 1.5s
+	assert server.max_active == 4
+	assert elapsed < 1.2
+	# Each worker opens at most one keep-alive connection for both batches
+	assert server.connections <= fetcher.workers
@@ -0,0 +1,101 @@
+"""
+Compile src/ from scratch and compare the output with the committed dist/ and README.md
+
+The committed dist/ and README.md are the golden copy of the compiler's output;
+after any intended change to the output, (of the compiler, a script, or a scriptlet),
+regenerate them with `python3 compile.py --offline` and commit them along with the change.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPO_URL = 'git@github.com:eVAL-Agency/ScriptsCollection.git'
+"""
+Repository the committed dist/ is published from
+"""
+
+SKIP = ('changes.json',)
+"""
+Outputs which depend on the previous build rather than on the sources, (compared by structure only)
+"""
+
+
+def list_files(root: str) -> set:
+	files = set()
+	for dirpath, dirnames, filenames in os.walk(root):
+		dirnames[:] = [x for x in dirnames if x != '__pycache__']
+		for filename in filenames:
+			if not filename.endswith('.pyc'):
+				files.add(os.path.relpath(os.path.join(dirpath, filename), root))
+	return files
+
+
+@pytest.fixture(scope='module')
+def build(tmp_path_factory):
+	work = str(tmp_path_factory.mktemp('build'))
+	for path in ('src', 'scriptlets', '.supplemental', 'compile.py', 'compiler', 'compile.sources', 'scriptlets.lock'):
+		source = os.path.join(ROOT, path)
+		if os.path.isdir(source):
+			shutil.copytree(source, os.path.join(work, path), ignore=shutil.ignore_patterns('__pycache__', '.etag.*'))
+		elif os.path.exists(source):
+			shutil.copy2(source, os.path.join(work, path))
+	# The repository URL is hashed into the GUID of shell scripts,
+	# so the published one is used regardless of the remotes of this checkout
+	os.makedirs(os.path.join(work, '.git'))
+	with open(os.path.join(work, '.git', 'config'), 'w') as f:
+		f.write('[remote "origin"]\n\turl = %s\n\tfetch = +refs/heads/*:refs/remotes/origin/*\n' % REPO_URL)
+
+	process = subprocess.run(
+		[sys.executable, 'compile.py', '--offline'],
+		cwd=work,
+		stdout=subprocess.PIPE,
+		stderr=subprocess.STDOUT,
+		encoding='utf-8'
+	)
+	assert process.returncode == 0, process.stdout
+	return work
+
+
+def test_dist_matches_golden_copy(build):
+	golden = list_files(os.path.join(ROOT, 'dist'))
+	compiled = list_files(os.path.join(build, 'dist'))
+
+	assert sorted(compiled - golden) == [], 'Outputs missing from the committed dist/'
+	assert sorted(golden - compiled) == [], 'Outputs in the committed dist/ which are no longer built'
+
+	different = []
+	for path in sorted(golden):
+		if path in SKIP:
+			continue
+		with open(os.path.join(ROOT, 'dist', path), 'rb') as f:
+			expected = f.read()
+		with open(os.path.join(build, 'dist', path), 'rb') as f:
+			if f.read() != expected:
+				different.append(path)
+	assert different == [], 'Compiled output differs from the committed dist/, (regenerate with compile.py)'
+
+
+def test_readme_matches_golden_copy(build):
+	with open(os.path.join(ROOT, 'README.md'), 'rb') as f:
+		expected = f.read()
+	with open(os.path.join(build, 'README.md'), 'rb') as f:
+		assert f.read() == expected
+
+
+def test_changes_lists_every_script_as_added(build):
+	with open(os.path.join(build, 'dist', 'community_scripts.json'), 'r') as f:
+		meta = json.load(f)
+	with open(os.path.join(build, 'dist', 'changes.json'), 'r') as f:
+		changes = json.load(f)
+
+	# Nothing was built before in the temporary directory
+	assert sorted([x['guid'] for x in changes['added']]) == sorted([x['guid'] for x in meta])
+	assert changes['changed'] == []
+	assert changes['removed'] == []
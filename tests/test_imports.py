@@ -0,0 +1,120 @@
+"""
+Import normalization and lazy imports of compiled Python scripts
+"""
+import compile
+
+
+def test_normalize_merges_from_imports():
+	imports = [
+		'from typing import Union',
+		'import os',
+		'from typing import Union, Optional',
+		'import os, sys',
+		'from os import path as p',
+		'from . import sibling',
+		'from typing import *',
+		'from typing import *',
+		'not valid python',
+	]
+
+	assert compile.normalize_python_imports(imports) == [
+		'from typing import Union, Optional',
+		'import os',
+		'import sys',
+		'from os import path as p',
+		'from . import sibling',
+		'from typing import *',
+		'not valid python',
+	]
+
+
+def test_lazy_import_moves_into_functions_and_blocks():
+	content = (
+		'import sys\n'
+		'import logging\n'
+		'\n'
+		'def debug(message):\n'
+		'\tlogging.debug(message)\n'
+		'\n'
+		'if len(sys.argv) > 1:\n'
+		'\tlogging.basicConfig(level=logging.DEBUG)\n'
+		'\n'
+		'debug("hi")\n'
+	)
+	out, moved = compile.lazy_import_python(content)
+
+	assert moved == ['logging']
+	assert out == (
+		'import sys\n'
+		'\n'
+		'def debug(message):\n'
+		'\timport logging\n'
+		'\tlogging.debug(message)\n'
+		'\n'
+		'if len(sys.argv) > 1:\n'
+		'\timport logging\n'
+		'\tlogging.basicConfig(level=logging.DEBUG)\n'
+		'\n'
+		'debug("hi")\n'
+	)
+
+	# Behaviour is unchanged; the function and the block each import the module when they run
+	namespace = {}
+	exec(out, namespace)
+
+
+def test_lazy_import_keeps_imports_used_at_module_level():
+	content = (
+		'import logging\n'
+		'\n'
+		'def debug(message):\n'
+		'\tlogging.debug(message)\n'
+		'\n'
+		'log = logging.getLogger(__name__)\n'
+	)
+	out, moved = compile.lazy_import_python(content)
+
+	assert moved == []
+	assert out == content
+
+
+def test_lazy_import_keeps_imports_used_in_class_body():
+	content = (
+		'import logging\n'
+		'\n'
+		'class Options:\n'
+		'\tlevel = logging.DEBUG\n'
+		'\n'
+		'\tdef debug(self, message):\n'
+		'\t\tlogging.debug(message)\n'
+	)
+	out, moved = compile.lazy_import_python(content)
+
+	assert moved == []
+	assert out == content
+
+
+def test_lazy_import_keeps_imports_the_script_redefines():
+	for redefinition in ('def logging():\n\tpass\n', 'class logging:\n\tpass\n', 'from os import path as logging\n'):
+		content = (
+			'import logging\n'
+			'\n'
+			'def debug(message):\n'
+			'\tlogging.debug(message)\n'
+			'\n' +
+			redefinition
+		)
+		out, moved = compile.lazy_import_python(content)
+
+		assert moved == [], redefinition
+		assert out == content
+
+	# A function with its own local of the same name cannot have the module imported into it
+	content = (
+		'import logging\n'
+		'\n'
+		'def debug(logging):\n'
+		'\tlogging.debug("hi")\n'
+	)
+	out, moved = compile.lazy_import_python(content)
+	assert moved == []
@@ -0,0 +1,213 @@
+"""
+Searching and refreshing the SQLite metadata index, (failures of which must never fail the build)
+"""
+import json
+import os
+
+import pytest
+
+import compile
+
+
+class NoFts5Index(compile.MetadataIndex):
+	# Same as a build of SQLite without FTS5 compiled in
+	SCHEMA = compile.MetadataIndex.SCHEMA[:-1] + (
+		'CREATE VIRTUAL TABLE IF NOT EXISTS search '
+		'USING no_such_module(path UNINDEXED, name, content)',
+	)
+
+
+def test_update_without_fts5_is_skipped(tmp_path, capsys):
+	index = NoFts5Index(str(tmp_path / 'index.sqlite'))
+	index.update([], [], None)
+
+	assert 'WARNING - Unable to update the metadata index' in capsys.readouterr().out
+
+
+def test_update_of_corrupt_index_is_skipped(tmp_path, capsys):
+	path = tmp_path / 'index.sqlite'
+	path.write_bytes(b'this is not a database' * 100)
+	compile.MetadataIndex(str(path)).update([], [], None)
+
+	assert 'WARNING - Unable to update the metadata index' in capsys.readouterr().out
+
+
+def test_query_of_corrupt_index_exits(tmp_path, capsys):
+	path = tmp_path / 'index.sqlite'
+	path.write_bytes(b'this is not a database' * 100)
+
+	with pytest.raises(SystemExit):
+		compile.query_main(['--index', str(path), 'firewall'])
+	assert 'ERROR - ' in capsys.readouterr().out
+
+
+REPO_URL = 'git@github.com:eVAL-Agency/ScriptsCollection.git'
+
+TREE = {
+	'src/firewall/linux_open_port.sh': (
+		'#!/bin/bash\n'
+		'#\n'
+		'# Open a port in the firewall\n'
+		'#\n'
+		'# Allow inbound connections through nftables\n'
+		'#\n'
+		'# Supports:\n'
+		'#   Debian-All\n'
+		'#\n'
+		'# Category:\n'
+		'#   Firewall\n'
+		'\n'
+		'# scriptlet:_common/firewall.sh\n'
+		'\n'
+		'firewall_allow 22\n'
+	),
+	'src/web/linux_install_nginx.sh': (
+		'#!/bin/bash\n'
+		'#\n'
+		'# Install Nginx\n'
+		'#\n'
+		'# Install the Nginx web server\n'
+		'#\n'
+		'# Supports:\n'
+		'#   Linux-All\n'
+		'#\n'
+		'# Category:\n'
+		'#   Web\n'
+		'\n'
+		'echo nginx\n'
+	),
+	'src/web/windows_install_iis.ps1': (
+		'<#\n'
+		'.TITLE\n'
+		'\tInstall IIS\n'
+		'\n'
+		'.DESCRIPTION\n'
+		'\tInstall the Internet Information Services web server\n'
+		'\n'
+		'.CATEGORY\n'
+		'\tWeb\n'
+		'\n'
+		'.SUPPORTS\n'
+		'\tWindows\n'
+		'#>\n'
+		'\n'
+		'Write-Output "iis"\n'
+	),
+	'scriptlets/_common/firewall.sh': (
+		'##\n'
+		'# Open a port for inbound traffic\n'
+		'firewall_allow() {\n'
+		'\techo "allow $1"\n'
+		'}\n'
+	),
+}
+
+
+def write_tree(root, files: dict):
+	for path, content in files.items():
+		(root / path).parent.mkdir(parents=True, exist_ok=True)
+		(root / path).write_text(content)
+
+
+def build(repo: str = REPO_URL):
+	with open(os.path.join('.git', 'config'), 'w') as f:
+		f.write('[remote "origin"]\n\turl = %s\n' % repo)
+	cache = compile.BuildCache()
+	cache.load()
+	compile.compile_tree(fs=compile.DiskFileSystem(), cache=cache)
+
+
+def query(capsys, *argv) -> dict:
+	capsys.readouterr()
+	compile.query_main(['--json'] + list(argv))
+	return json.loads(capsys.readouterr().out)
+
+
+def files(results: dict) -> list:
+	return sorted([x['file'] for x in results['scripts']])
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	# The scriptlets are all local
+	monkeypatch.setattr(compile.fetcher, 'offline', True)
+	write_tree(tmp_path, TREE)
+	(tmp_path / '.git').mkdir()
+	build()
+	return tmp_path
+
+
+def test_query_filters(tree, capsys):
+	assert files(query(capsys, '--supports', 'ubuntu')) == [
+		'src/firewall/linux_open_port.sh', 'src/web/linux_install_nginx.sh'
+	]
+	# Scripts supporting all of Linux match any distro, but never another platform
+	assert files(query(capsys, '--supports', 'rocky')) == ['src/web/linux_install_nginx.sh']
+	assert files(query(capsys, '--supports', 'windows')) == ['src/web/windows_install_iis.ps1']
+	assert files(query(capsys, '--category', 'web')) == [
+		'src/web/linux_install_nginx.sh', 'src/web/windows_install_iis.ps1'
+	]
+	assert files(query(capsys, '--category', 'web', '--type', 'powershell')) == [
+		'src/web/windows_install_iis.ps1'
+	]
+
+
+def test_query_function(tree, capsys):
+	results = query(capsys, '--function', 'firewall_allow')
+
+	assert files(results) == ['src/firewall/linux_open_port.sh']
+	assert [(x['name'], x['scriptlet'], x['included_by']) for x in results['functions']] == [
+		('firewall_allow', 'scriptlets/_common/firewall.sh', ['src/firewall/linux_open_port.sh'])
+	]
+	assert results['functions'][0]['doc'] == 'Open a port for inbound traffic'
+
+
+def test_query_text(tree, capsys):
+	# Titles and descriptions of scripts
+	assert files(query(capsys, 'install')) == [
+		'src/web/linux_install_nginx.sh', 'src/web/windows_install_iis.ps1'
+	]
+	assert files(query(capsys, 'web', 'server')) == ['src/web/linux_install_nginx.sh']
+	assert files(query(capsys, 'nftables')) == ['src/firewall/linux_open_port.sh']
+
+	# Documentation of scriptlet functions
+	results = query(capsys, 'inbound', 'traffic')
+	assert files(results) == []
+	assert [x['name'] for x in results['functions']] == ['firewall_allow']
+
+	assert query(capsys, 'no-such-thing') == {'scripts': [], 'functions': []}
+
+
+def test_update_refreshes_changed_and_drops_removed(tree, capsys):
+	write_tree(tree, {
+		'src/web/linux_install_nginx.sh': TREE['src/web/linux_install_nginx.sh'].replace(
+			'Install the Nginx web server', 'Install the Nginx reverse proxy'
+		),
+	})
+	os.remove(tree / 'src' / 'web' / 'windows_install_iis.ps1')
+	capsys.readouterr()
+	build()
+
+	# Only the changed script is rewritten
+	assert 'Metadata index: 1 updated, 1 removed' in capsys.readouterr().out
+	assert files(query(capsys, 'proxy')) == ['src/web/linux_install_nginx.sh']
+	assert files(query(capsys, 'server')) == []
+	assert files(query(capsys, '--category', 'web')) == ['src/web/linux_install_nginx.sh']
+	assert files(query(capsys, '--function', 'firewall_allow')) == [
+		'src/firewall/linux_open_port.sh'
+	]
+
+
+def test_update_refreshes_guids_when_the_repository_changes(tree, capsys):
+	before = {x['file']: x['guid'] for x in query(capsys)['scripts']}
+
+	build('git@github.com:example/ScriptsCollection.git')
+	after = {x['file']: x['guid'] for x in query(capsys)['scripts']}
+
+	# GUIDs of shell scripts are derived from the repository URL
+	assert after['src/web/linux_install_nginx.sh'] != before['src/web/linux_install_nginx.sh']
+	assert after['src/web/windows_install_iis.ps1'] == before['src/web/windows_install_iis.ps1']
+	assert after == {
+		x.file: x.guid for x in compile.compile_tree(fs=compile.DiskFileSystem()).scripts
+	}
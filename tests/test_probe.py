@@ -0,0 +1,93 @@
+"""
+Concurrent probes of scriptlets/_common/probe.py
+"""
+import io
+import threading
+import time
+
+from scriptlets._common.probe import ProbeRunner
+
+
+def test_values_of_successful_probes():
+	probes = ProbeRunner()
+	probes.add('one', lambda: 1)
+
+	@probes.probe('two')
+	def probe_two():
+		return 2
+
+	assert probes.run() == {'one': 1, 'two': 2}
+	assert probes.get('two') == 2
+	assert probe_two() == 2
+	assert [x.status for x in probes.probes.values()] == ['ok', 'ok']
+
+
+def test_probes_run_concurrently():
+	probes = ProbeRunner(workers=4)
+	for i in range(4):
+		probes.add('sleep%d' % i, lambda: time.sleep(0.2))
+
+	start = time.monotonic()
+	probes.run()
+	assert time.monotonic() - start < 0.6
+
+
+def test_exception_uses_default():
+	def fail():
+		raise OSError('no such file')
+
+	probes = ProbeRunner()
+	probes.add('fails', fail, default={})
+	probes.add('works', lambda: 'ok')
+
+	assert probes.run() == {'fails': {}, 'works': 'ok'}
+	assert probes.probes['fails'].status == 'error'
+	assert isinstance(probes.probes['fails'].error, OSError)
+
+
+def test_timeout_uses_default_without_waiting_for_probe():
+	release = threading.Event()
+	probes = ProbeRunner(workers=1)
+	probes.add('hangs', lambda: release.wait(10) or 'late', timeout=0.2, default='default')
+	# Only one worker, so this can only run once the hung probe is abandoned
+	probes.add('after', lambda: 'after', timeout=5)
+
+	start = time.monotonic()
+	try:
+		assert probes.run() == {'hangs': 'default', 'after': 'after'}
+		assert time.monotonic() - start < 2
+		assert probes.probes['hangs'].status == 'timeout'
+		assert probes.probes['after'].status == 'ok'
+	finally:
+		release.set()
+
+	# The abandoned probe finishing late does not replace its default
+	time.sleep(0.1)
+	assert probes.get('hangs') == 'default'
+	assert probes.probes['hangs'].status == 'timeout'
+
+
+def test_probe_returning_none_is_not_replaced_by_default():
+	probes = ProbeRunner()
+	probes.add('empty', lambda: None, default=[])
+
+	assert probes.run() == {'empty': None}
+
+
+def test_report_lists_every_probe():
+	def fail():
+		raise ValueError('bad output')
+
+	probes = ProbeRunner()
+	probes.add('works', lambda: 1)
+	probes.add('fails', fail)
+	probes.add('hangs', lambda: time.sleep(1), timeout=0.1)
+	probes.run()
+
+	out = io.StringIO()
+	probes.print_report(out)
+	report = out.getvalue()
+	assert 'works' in report
+	assert 'ValueError: bad output' in report
+	assert 'exceeded 0.1s' in report
+	assert '3 probes in' in report
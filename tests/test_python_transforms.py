@@ -0,0 +1,92 @@
+"""
+Tree shaking of compiled Python scripts
+"""
+import ast
+
+import compile
+
+
+def assert_valid(content: str):
+	ast.parse(content)
+
+
+def test_tree_shake_removes_unused_scriptlet_functions():
+	content = (
+		'import json\n'
+		'\n'
+		'def used():\n'
+		'\treturn 1\n'
+		'\n'
+		'def unused():\n'
+		'\treturn json.dumps({})\n'
+		'\n'
+		'print(used())\n'
+	)
+	out, removed = compile.tree_shake_python(content, {'used', 'unused'})
+
+	assert removed == ['unused']
+	assert 'def unused' not in out
+	assert 'def used' in out
+	# json was only used by the removed function
+	assert 'import json' not in out
+	assert_valid(out)
+
+
+def test_tree_shake_keeps_definitions_the_script_redefines():
+	content = (
+		'def helper():\n'
+		'\treturn "scriptlet"\n'
+		'\n'
+		'def helper():\n'
+		'\treturn "script"\n'
+		'\n'
+		'print(helper())\n'
+	)
+	out, removed = compile.tree_shake_python(content, {'helper'})
+
+	assert removed == []
+	assert out == content
+
+	# A script rebinding the name at the top level also counts as a use
+	content = (
+		'def helper():\n'
+		'\treturn "scriptlet"\n'
+		'\n'
+		'helper = print\n'
+	)
+	out, removed = compile.tree_shake_python(content, {'helper'})
+	assert removed == []
+
+
+def test_tree_shake_keeps_names_used_only_in_class_body():
+	content = (
+		'def helper():\n'
+		'\treturn 1\n'
+		'\n'
+		'def unused():\n'
+		'\treturn 2\n'
+		'\n'
+		'class Options:\n'
+		'\tdefault = helper()\n'
+	)
+	out, removed = compile.tree_shake_python(content, {'helper', 'unused'})
+
+	assert removed == ['unused']
+	assert 'def helper' in out
+	assert_valid(out)
+
+
+def test_tree_shake_keeps_imports_used_at_module_level_and_in_removed_functions():
+	content = (
+		'import os\n'
+		'\n'
+		'def unused():\n'
+		'\treturn os.getcwd()\n'
+		'\n'
+		'print(os.sep)\n'
+	)
+	out, removed = compile.tree_shake_python(content, {'unused'})
+
+	assert removed == ['unused']
+	assert 'import os\n' in out
+	assert_valid(out)
@@ -0,0 +1,65 @@
+"""
+Function documentation extracted from PowerShell scriptlets
+"""
+import compile
+
+
+def parse_powershell(content: str) -> dict:
+	scriptlet = compile.Scriptlet('scriptlets/_common/test.ps1', 'powershell')
+	scriptlet._parse_powershell(content)
+	return {x.name: x.body for x in scriptlet.functions}
+
+
+def test_block_comment_of_each_function():
+	functions = parse_powershell(
+		'# Copyright notice\n'
+		'<# File header #>\n'
+		'\n'
+		'<#\n'
+		'.SYNOPSIS\n'
+		'  Get the first thing\n'
+		'#>\n'
+		'function GetFirst {\n'
+		'\treturn 1\n'
+		'}\n'
+		'\n'
+		'<# Get the second thing #>\n'
+		'\n'
+		'function GetSecond\n'
+		'{\n'
+		'\treturn 2\n'
+		'}\n'
+		'function GetThird {\n'
+		'\treturn 3\n'
+		'}\n'
+	)
+
+	# Each function is documented by its own block rather than the first block of the file
+	assert functions == {
+		'GetFirst': '.SYNOPSIS\n  Get the first thing',
+		'GetSecond': 'Get the second thing',
+		'GetThird': '',
+	}
+
+
+def test_line_comments_of_each_function():
+	functions = parse_powershell(
+		'# Shared helpers\n'
+		'\n'
+		'function GetFirst {\n'
+		'\treturn 1\n'
+		'}\n'
+		'\n'
+		'# Get the second thing\n'
+		'## across two lines\n'
+		'function GetSecond {\n'
+		'\treturn 2\n'
+		'}\n'
+	)
+
+	# A comment at the top of the file documents only the function following it,
+	# and line comments are no longer accumulated over every preceding function
+	assert functions == {
+		'GetFirst': 'Shared helpers',
+		'GetSecond': 'Get the second thing\nacross two lines',
+	}
@@ -0,0 +1,160 @@
+"""
+Tree shaking of compiled shell scripts
+"""
+import compile
+
+
+def test_removes_unused_function_with_its_doc_block():
+	content = (
+		'#!/bin/bash\n'
+		'\n'
+		'##\n'
+		'# Say hello\n'
+		'#\n'
+		'function hello() {\n'
+		'\techo hello\n'
+		'}\n'
+		'\n'
+		'##\n'
+		'# Say goodbye\n'
+		'function goodbye() {\n'
+		'\techo goodbye\n'
+		'}\n'
+		'\n'
+		'hello\n'
+	)
+	out, removed = compile.tree_shake_shell(content, {'hello', 'goodbye'})
+
+	assert removed == ['goodbye']
+	assert out == (
+		'#!/bin/bash\n'
+		'\n'
+		'##\n'
+		'# Say hello\n'
+		'#\n'
+		'function hello() {\n'
+		'\techo hello\n'
+		'}\n'
+		'\n'
+		'hello\n'
+	)
+
+
+def test_keeps_header_comments_directly_above_removed_function():
+	content = (
+		'#!/bin/bash\n'
+		'# Install the thing\n'
+		'#\n'
+		'# Supports:\n'
+		'#   Debian\n'
+		'function unused() {\n'
+		'\techo unused\n'
+		'}\n'
+		'\n'
+		'echo done\n'
+	)
+	out, removed = compile.tree_shake_shell(content, {'unused'})
+
+	assert removed == ['unused']
+	assert out == (
+		'#!/bin/bash\n'
+		'# Install the thing\n'
+		'#\n'
+		'# Supports:\n'
+		'#   Debian\n'
+		'echo done\n'
+	)
+
+
+def test_only_takes_doc_block_below_unrelated_comments():
+	content = (
+		'# Unrelated comment about the section\n'
+		'##\n'
+		'# Unused function\n'
+		'function unused() {\n'
+		'\techo unused\n'
+		'}\n'
+		'echo done\n'
+	)
+	out, removed = compile.tree_shake_shell(content, {'unused'})
+
+	assert removed == ['unused']
+	assert out == (
+		'# Unrelated comment about the section\n'
+		'echo done\n'
+	)
+
+
+def test_takes_comment_block_separated_by_blank_line():
+	content = (
+		'echo start\n'
+		'\n'
+		'# Unused function\n'
+		'unused() {\n'
+		'\techo unused\n'
+		'}\n'
+		'echo done\n'
+	)
+	out, removed = compile.tree_shake_shell(content, {'unused'})
+
+	assert removed == ['unused']
+	assert out == (
+		'echo start\n'
+		'\n'
+		'echo done\n'
+	)
+
+
+def test_heredoc_content_does_not_end_function():
+	content = (
+		'function unused() {\n'
+		'\tcat <<EOF\n'
+		'}\n'
+		'function fake() {\n'
+		'EOF\n'
+		'\tcat <<-\'END\'\n'
+		'}\n'
+		'\tEND\n'
+		'}\n'
+		'\n'
+		'function used() {\n'
+		'\techo used\n'
+		'}\n'
+		'used\n'
+	)
+	out, removed = compile.tree_shake_shell(content, {'unused', 'used'})
+
+	assert removed == ['unused']
+	assert out == (
+		'function used() {\n'
+		'\techo used\n'
+		'}\n'
+		'used\n'
+	)
+
+
+def test_function_named_in_top_level_heredoc_is_kept():
+	content = (
+		'function helper() {\n'
+		'\techo helper\n'
+		'}\n'
+		'cat > /tmp/run.sh <<EOF\n'
+		'helper\n'
+		'EOF\n'
+	)
+	out, removed = compile.tree_shake_shell(content, {'helper'})
+
+	assert removed == []
+	assert out == content
+
+
+def test_unterminated_function_leaves_script_untouched():
+	content = (
+		'function unused() {\n'
+		'\tcat <<EOF\n'
+		'}\n'
+	)
+	out, removed = compile.tree_shake_shell(content, {'unused'})
+
+	assert removed == []
+	assert out == content
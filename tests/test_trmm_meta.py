@@ -0,0 +1,60 @@
+"""
+Content hashes, GUIDs and the changes delta of dist/community_scripts.json
+"""
+import json
+
+import compile
+
+
+SCRIPT = (
+	'#!/bin/bash\n'
+	'#\n'
+	'# Supports:\n'
+	'#   Debian\n'
+	'#\n'
+	'# Category:\n'
+	'#   Demo\n'
+	'\n'
+	'echo %s\n'
+)
+
+REPO_URL = 'git@github.com:eVAL-Agency/ScriptsCollection.git'
+
+
+def build(fs: compile.MemoryFileSystem, message: str) -> dict:
+	compile.compile_tree({'demo/linux_hello.sh': SCRIPT % message}, {}, fs=fs)
+	return json.loads(fs.read_text('dist/changes.json'))
+
+
+def test_changes_are_kept_until_the_next_build_with_changes():
+	fs = compile.MemoryFileSystem()
+
+	changes = build(fs, 'hi')
+	assert [x['filename'] for x in changes['added']] == ['demo/linux_hello.sh']
+	guid = changes['added'][0]['guid']
+
+	# Nothing changed, so the delta of the previous build is still there for sync tooling to pick up
+	assert build(fs, 'hi') == changes
+
+	changes = build(fs, 'hello')
+	assert changes['added'] == []
+	assert [x['guid'] for x in changes['changed']] == [guid]
+	assert changes['changed'][0]['fields'] == ['sha256', 'size']
+	assert changes['removed'] == []
+
+
+def test_shell_guid_is_derived_from_the_repository(capsys):
+	fs = compile.MemoryFileSystem({'.git/config': '[remote "origin"]\n\turl = %s\n' % REPO_URL})
+	result = compile.compile_tree({'demo/linux_hello.sh': SCRIPT % 'hi'}, {}, fs=fs)
+
+	expected = compile.Script('src/demo/linux_hello.sh', 'shell')
+	expected.repo = REPO_URL
+	expected._parse_guid()
+	assert result.get_trmm_meta()[0]['guid'] == expected.guid
+	assert 'WARNING - No git remote' not in capsys.readouterr().out
+
+
+def test_warns_when_the_repository_is_unknown(capsys):
+	compile.compile_tree({'demo/linux_hello.sh': SCRIPT % 'hi'}, {})
+
+	assert 'WARNING - No git remote found in .git/config' in capsys.readouterr().out